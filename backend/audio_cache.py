@@ -0,0 +1,181 @@
+"""
+Content-addressed cache for synthesized narration audio.
+
+Entries are WAV files named by a hash of everything that influences the
+synthesized waveform, each with its word timings sidecar. The cache is
+bounded by a byte budget that counts both files and evicts the least recently
+used entries first; file modification times record recency so the ordering
+survives restarts. Hits are copied out while the cache lock is held, so an
+entry can't be evicted halfway through being read.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+from word_timings import copy_with_word_timings, word_timings_path
+
+
+def normalize_transcript(text):
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def audio_cache_key(text, voice, alpha, beta, diffusion_steps, embedding_scale, seed, checkpoint, profile="default",
+                    style_mode="diffusion", phonemes="sentences", length_tolerance=0.0):
+    """
+    Build the cache key for one synthesized transcript.
+
+    Args:
+        text (str): Transcript text (normalized before hashing)
+        voice (str): Identifier of the voice style, e.g. the voice registry key
+        alpha, beta, diffusion_steps, embedding_scale: StyleTTS2 inference settings
+        seed (int): Random seed used for the diffusion sampler
+        checkpoint (str): Fingerprint of the model checkpoint
+        profile (str): TTS engine profile; quantized profiles produce different audio
+        style_mode (str): How utterance styles are chosen, e.g. "diffusion" or a style bank version
+        phonemes (str): Phoneme cache mode; "words" phonemizes words without sentence context
+        length_tolerance (float): Length bucket padding of the TTS engine; padding changes the audio slightly
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = {
+        "text": normalize_transcript(text),
+        "voice": voice,
+        "alpha": alpha,
+        "beta": beta,
+        "diffusion_steps": diffusion_steps,
+        "embedding_scale": embedding_scale,
+        "seed": seed,
+        "checkpoint": checkpoint,
+    }
+    # Only added when not the default so existing cache entries keep their keys
+    if profile != "default":
+        payload["profile"] = profile
+    if style_mode != "diffusion":
+        payload["style_mode"] = style_mode
+    if phonemes != "sentences":
+        payload["phonemes"] = phonemes
+    if length_tolerance:
+        payload["length_tolerance"] = length_tolerance
+    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class AudioCache:
+    """Disk-backed LRU cache of WAV files with a total size budget"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _size(self, key):
+        """Bytes used by an entry: the WAV file plus its word timings sidecar"""
+        path = self._path(key)
+        size = os.path.getsize(path)
+        if os.path.exists(word_timings_path(path)):
+            size += os.path.getsize(word_timings_path(path))
+        return size
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files already on disk"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".wav"):
+                continue
+            key = name[:-len(".wav")]
+            entries.append((os.stat(self._path(key)).st_mtime, key, self._size(key)))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            for path in (self._path(key), word_timings_path(self._path(key))):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def copy_to(self, key, target_path):
+        """
+        Copy a cached waveform and its word timings sidecar to target_path.
+
+        The copy happens under the cache lock, so a concurrent put can't
+        evict the entry while it is being read.
+
+        Returns:
+            bool: True on a hit, False on a miss
+        """
+        with self._lock:
+            path = self._path(key)
+            if key not in self._entries or not os.path.exists(path):
+                if key in self._entries:
+                    self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return False
+            copy_with_word_timings(path, target_path)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Touch the file so the recency order is kept across restarts
+            os.utime(path)
+        return True
+
+    def _add(self, key):
+        size = self._size(key)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def put_file(self, key, source_path):
+        """
+        Copy an existing WAV file into the cache and return the cached path.
+
+        The word timings sidecar of the file is cached with it, so cache hits
+        keep exact subtitle timing.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if os.path.exists(word_timings_path(source_path)):
+            shutil.copyfile(word_timings_path(source_path), tmp_path)
+            os.replace(tmp_path, word_timings_path(path))
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        self._add(key)
+        return path
+
+    def stats(self):
+        """Hit/miss counters and current size, for logging and status reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "maxBytes": self.max_bytes,
+            }
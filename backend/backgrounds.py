@@ -0,0 +1,124 @@
+"""
+Pre-processed background video library.
+
+Each file in the background directory is transcoded once to the output
+resolution and frame rate with a keyframe every second. Render workers then
+cut segments of any length at random offsets by seeking, so any number of
+outputs can share one long background without decoding it from the start.
+"""
+import hashlib
+import json
+import os
+import random
+import subprocess
+import threading
+
+from ffmpeg_render import FFMPEG_BINARY, probe_media
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+
+class BackgroundLibrary:
+    """
+    Transcoded backgrounds plus a manifest of their durations.
+
+    Args:
+        source_dir (str): Directory with the original background videos
+        library_dir (str): Where transcoded copies and the manifest are kept
+        width, height (int): Output frame size (backgrounds are scaled and center-cropped)
+        fps (int): Output frame rate
+        keyframe_interval (float): Seconds between keyframes, i.e. seek granularity
+    """
+
+    def __init__(self, source_dir, library_dir, width=1080, height=1920, fps=24, keyframe_interval=1.0):
+        self.source_dir = source_dir
+        self.library_dir = library_dir
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval
+        source_id = hashlib.sha1(os.path.abspath(source_dir).encode("utf-8")).hexdigest()[:8]
+        self.manifest_path = os.path.join(library_dir, f"manifest_{source_id}.json")
+        self._entries = None
+        self._lock = threading.Lock()
+        os.makedirs(library_dir, exist_ok=True)
+
+    def _settings_id(self, source_path):
+        """Identify a transcode by its source file and output settings"""
+        stat = os.stat(source_path)
+        key = f"{os.path.abspath(source_path)}:{stat.st_size}:{int(stat.st_mtime)}:" \
+              f"{self.width}x{self.height}@{self.fps}:{self.keyframe_interval}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def _transcode(self, source_path, target_path):
+        gop = max(1, int(round(self.fps * self.keyframe_interval)))
+        scale = (f"scale={self.width}:{self.height}:force_original_aspect_ratio=increase,"
+                 f"crop={self.width}:{self.height},fps={self.fps}")
+        tmp_path = f"{target_path}.{os.getpid()}.tmp.mp4"
+        subprocess.run(
+            [FFMPEG_BINARY, "-y", "-v", "error", "-i", source_path, "-an", "-vf", scale,
+             "-c:v", "libx264", "-preset", "medium", "-crf", "20",
+             "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+             "-movflags", "+faststart", tmp_path],
+            check=True, capture_output=True
+        )
+        os.replace(tmp_path, target_path)
+
+    def prepare(self):
+        """
+        Transcode any new or changed backgrounds and return the library entries.
+
+        Returns:
+            list[dict]: {"path", "source", "duration"} per background
+        """
+        with self._lock:
+            try:
+                with open(self.manifest_path, "r") as f:
+                    manifest = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                manifest = {}
+
+            entries = []
+            updated = {}
+            for name in sorted(os.listdir(self.source_dir)):
+                if not name.lower().endswith(VIDEO_EXTENSIONS):
+                    continue
+                source_path = os.path.join(self.source_dir, name)
+                settings_id = self._settings_id(source_path)
+                target_path = os.path.join(self.library_dir, f"{os.path.splitext(name)[0]}_{settings_id}.mp4")
+
+                entry = manifest.get(settings_id)
+                if entry is None or not os.path.exists(target_path):
+                    print(f"Preparing background video: {name}")
+                    self._transcode(source_path, target_path)
+                    entry = {"path": target_path, "source": source_path, "duration": probe_media(target_path)["duration"]}
+                updated[settings_id] = entry
+                entries.append(entry)
+
+            with open(self.manifest_path, "w") as f:
+                json.dump(updated, f, indent=2)
+
+            self._entries = entries
+            return entries
+
+    def pick_segment(self, duration, rng=None):
+        """
+        Choose a background and a random start offset for a segment.
+
+        Backgrounds at least as long as the segment are preferred; shorter ones
+        are still returned and looped by the renderer.
+
+        Returns:
+            tuple[str, float]: Background path and start offset in seconds
+        """
+        entries = self._entries if self._entries is not None else self.prepare()
+        if not entries:
+            raise FileNotFoundError(f"No background videos found in {self.source_dir}")
+        rng = rng or random
+
+        long_enough = [entry for entry in entries if entry["duration"] >= duration]
+        entry = rng.choice(long_enough or entries)
+        latest_start = entry["duration"] - duration if long_enough else entry["duration"]
+        # Snap to the keyframe grid so seeking never has to decode from an earlier keyframe
+        offset = int(rng.uniform(0, max(latest_start, 0)) / self.keyframe_interval) * self.keyframe_interval
+        return entry["path"], offset
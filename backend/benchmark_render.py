@@ -0,0 +1,69 @@
+"""
+Benchmark the MoviePy and ffmpeg render backends on the bundled background video.
+
+Generates a narration-length test tone, renders the same captioned video with
+each backend and reports wall time and real-time factor (render time divided
+by video duration; lower is better).
+
+Usage:
+    python benchmark_render.py --duration 45 --runs 2
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from ffmpeg_render import FFMPEG_BINARY
+from video_render import RENDER_BACKENDS, render_video
+
+BACKGROUND_VIDEO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "video_files", "background_3.mp4")
+
+SAMPLE_TRANSCRIPT = (
+    "Photosynthesis is how plants turn light into food. Chlorophyll in the leaves absorbs sunlight, "
+    "and the plant uses that energy to combine carbon dioxide from the air with water from the soil. "
+    "The result is glucose, which the plant stores as energy, and oxygen, which it releases for us to breathe. "
+    "So every time you take a breath, thank a plant for doing a little bit of chemistry."
+)
+
+
+def make_test_audio(path, duration):
+    """Write a mono 24kHz tone of the given length to stand in for narration"""
+    subprocess.run(
+        [FFMPEG_BINARY, "-y", "-v", "error", "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=24000:duration={duration}",
+         "-ac", "1", path],
+        check=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=45.0, help="Narration length in seconds")
+    parser.add_argument("--runs", type=int, default=1, help="Renders per backend")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 4, help="Encoder threads")
+    parser.add_argument("--video", default=BACKGROUND_VIDEO, help="Background video to render over")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="studybytes_bench_")
+    audio_path = os.path.join(work_dir, "narration.wav")
+    make_test_audio(audio_path, args.duration)
+
+    print(f"Background: {args.video}")
+    print(f"Narration: {args.duration:.1f}s, {args.runs} run(s) per backend, {args.threads} threads\n")
+    print(f"{'backend':<10}{'best (s)':>12}{'mean (s)':>12}{'RTF':>8}")
+
+    for backend in RENDER_BACKENDS:
+        timings = []
+        for run in range(args.runs):
+            output_path = os.path.join(work_dir, f"{backend}_{run}.mp4")
+            start = time.perf_counter()
+            render_video(args.video, audio_path, SAMPLE_TRANSCRIPT, output_path, threads=args.threads, backend=backend)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{backend:<10}{best:>12.2f}{sum(timings) / len(timings):>12.2f}{best / args.duration:>8.2f}")
+
+    print(f"\nOutputs kept in {work_dir} for visual comparison")
+
+
+if __name__ == "__main__":
+    main()
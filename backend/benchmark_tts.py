@@ -0,0 +1,124 @@
+"""
+Benchmark the StyleTTS2 engine profiles against the fp32 baseline.
+
+Loads the engine once per profile, synthesizes the same transcripts with the
+same seed and reports the real-time factor (synthesis time divided by audio
+duration; lower is better) together with how far each profile's audio is
+from the fp32 output:
+
+- duration: relative difference in total length (the duration predictor is
+  quantized, so speech can get slightly faster or slower)
+- waveform: RMS of the sample difference over the common length, relative to
+  the baseline RMS (strict; sensitive to any phase or timing shift)
+- mel: mean absolute log-mel difference in dB, after stretching the profile's
+  spectrogram to the baseline's frame count (perceptually closer)
+
+Usage:
+    python benchmark_tts.py --profiles default cpu-fast --runs 2 --threads 4
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import torchaudio
+
+from tts_engine import TTS_PROFILES, StyleTTS2Engine
+
+SAMPLE_RATE = 24000
+SETTINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_settings")
+TTS_PARAMS = {"alpha": 0.4, "beta": 0.8, "diffusion_steps": 6, "embedding_scale": 2}
+
+SAMPLE_TRANSCRIPTS = [
+    "Photosynthesis is how plants turn light into food.",
+    "Chlorophyll in the leaves absorbs sunlight, and the plant uses that energy to combine carbon dioxide "
+    "from the air with water from the soil. The result is glucose, which the plant stores as energy, and "
+    "oxygen, which it releases for us to breathe.",
+    "So every time you take a breath, thank a plant for doing a little bit of chemistry.",
+]
+
+_to_mel = torchaudio.transforms.MelSpectrogram(sample_rate=SAMPLE_RATE, n_fft=2048, win_length=1200, hop_length=300, n_mels=80)
+
+
+def log_mel(waveform):
+    """Log-mel spectrogram in dB, shape [80, frames]"""
+    mel = _to_mel(torch.from_numpy(np.asarray(waveform, dtype=np.float32)))
+    return 10 * torch.log10(mel.clamp(min=1e-10))
+
+
+def waveform_distance(reference, candidate):
+    """RMS of the difference over the common length, relative to the reference RMS"""
+    length = min(len(reference), len(candidate))
+    difference = np.sqrt(np.mean((reference[:length] - candidate[:length]) ** 2))
+    return float(difference / max(np.sqrt(np.mean(reference[:length] ** 2)), 1e-8))
+
+
+def mel_distance(reference, candidate):
+    """Mean absolute log-mel difference in dB, with the candidate stretched to the reference's frames"""
+    reference_mel, candidate_mel = log_mel(reference), log_mel(candidate)
+    candidate_mel = F.interpolate(candidate_mel.unsqueeze(0), size=reference_mel.shape[-1], mode="linear",
+                                  align_corners=False).squeeze(0)
+    return float((reference_mel - candidate_mel).abs().mean())
+
+
+def load_engine(profile, threads):
+    model_path = os.path.join(SETTINGS_DIR, "epochs_2nd_00020.pth")
+    config_path = os.path.join(SETTINGS_DIR, "config.yml")
+    if os.path.exists(model_path) or os.path.exists(config_path):
+        return StyleTTS2Engine(model_checkpoint_path=model_path, config_path=config_path, profile=profile,
+                               num_threads=threads)
+    return StyleTTS2Engine(profile=profile, num_threads=threads)
+
+
+def synthesize(engine, ref_s, texts, runs, seed):
+    """Best-of-runs synthesis time and the waveforms of the last run"""
+    # One untimed pass so lazy initialization and allocator warm-up don't count
+    engine.batch_inference(texts[:1], ref_s, seed=seed, **TTS_PARAMS)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        waveforms = engine.batch_inference(texts, ref_s, seed=seed, **TTS_PARAMS)
+        timings.append(time.perf_counter() - start)
+    return min(timings), waveforms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=list(TTS_PROFILES), choices=TTS_PROFILES,
+                        help="Profiles to compare; the first one is the baseline")
+    parser.add_argument("--runs", type=int, default=1, help="Timed runs per profile")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 4, help="Torch intra-op threads")
+    parser.add_argument("--voice", default=None, help="Voice sample to clone (defaults to the packaged voice)")
+    parser.add_argument("--seed", type=int, default=0, help="Diffusion seed shared by all profiles")
+    args = parser.parse_args()
+
+    print(f"{len(SAMPLE_TRANSCRIPTS)} transcripts, {args.runs} run(s) per profile, {args.threads} threads\n")
+    results = {}
+    for profile in args.profiles:
+        start = time.perf_counter()
+        engine = load_engine(profile, args.threads)
+        load_seconds = time.perf_counter() - start
+        # Style from the fp32 style encoder in every profile, so only synthesis differs
+        ref_s = engine.default_style(args.voice)
+        seconds, waveforms = synthesize(engine, ref_s, SAMPLE_TRANSCRIPTS, args.runs, args.seed)
+        results[profile] = (load_seconds, seconds, waveforms)
+        del engine
+
+    baseline = args.profiles[0]
+    baseline_waveforms = results[baseline][2]
+    print(f"{'profile':<10}{'load (s)':>10}{'synth (s)':>11}{'audio (s)':>11}{'RTF':>7}{'duration':>10}{'waveform':>10}{'mel (dB)':>10}")
+    for profile, (load_seconds, seconds, waveforms) in results.items():
+        audio_seconds = sum(len(waveform) for waveform in waveforms) / SAMPLE_RATE
+        baseline_seconds = sum(len(waveform) for waveform in baseline_waveforms) / SAMPLE_RATE
+        duration_delta = audio_seconds / baseline_seconds - 1
+        waveform_delta = np.mean([waveform_distance(ref, out) for ref, out in zip(baseline_waveforms, waveforms)])
+        mel_delta = np.mean([mel_distance(ref, out) for ref, out in zip(baseline_waveforms, waveforms)])
+        print(f"{profile:<10}{load_seconds:>10.1f}{seconds:>11.2f}{audio_seconds:>11.2f}{seconds / audio_seconds:>7.2f}"
+              f"{duration_delta:>+10.1%}{waveform_delta:>10.3f}{mel_delta:>10.2f}")
+    print(f"\nDistances are relative to the {baseline} profile")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Cached, parallel text extraction for uploaded study material.
+
+Extracted text only depends on the file's bytes, so it is cached on disk
+keyed by the file's SHA-256: uploading the same textbook again skips
+extraction entirely. Large PDFs are split into page ranges that are
+extracted by a pool of worker processes (PDF parsing is CPU bound and holds
+the GIL), and the pages are joined once at the end.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+from hashing import file_sha256
+
+# Bump when extraction output changes so stale cache entries are not reused
+EXTRACTOR_VERSION = 1
+
+
+def _extract_page_range(pdf_path, start, end):
+    """Extract the text of pages [start, end) of a PDF; runs in a worker process"""
+    reader = PdfReader(pdf_path)
+    return [reader.pages[page_num].extract_text() or "" for page_num in range(start, end)]
+
+
+class TextExtractor:
+    """
+    Extract text from PDFs and plain-text files, caching PDF text by content hash.
+
+    Args:
+        cache_dir (str): Directory for cached extracted text
+        workers (int): Worker processes used for large PDFs
+        pages_per_task (int): Pages extracted per worker task
+        parallel_min_pages (int): PDFs with fewer pages are extracted in the calling thread
+    """
+
+    def __init__(self, cache_dir, workers=None, pages_per_task=20, parallel_min_pages=40):
+        self.cache_dir = cache_dir
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.pages_per_task = max(1, pages_per_task)
+        self.parallel_min_pages = parallel_min_pages
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}_v{EXTRACTOR_VERSION}.txt")
+
+    def _pool(self):
+        """Start the worker pool on first use and share it between jobs"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def extract_pdf(self, pdf_path):
+        """
+        Return the text of a PDF, one line break after every page.
+
+        Args:
+            pdf_path (str): Path to the PDF
+
+        Returns:
+            str: Extracted text (empty if the PDF has no text layer)
+        """
+        digest = file_sha256(pdf_path)
+        cache_path = self._cache_path(digest)
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                print(f"Using cached text for {os.path.basename(pdf_path)}")
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        page_count = len(PdfReader(pdf_path).pages)
+        if page_count < self.parallel_min_pages:
+            pages = _extract_page_range(pdf_path, 0, page_count)
+        else:
+            ranges = [(start, min(start + self.pages_per_task, page_count))
+                      for start in range(0, page_count, self.pages_per_task)]
+            print(f"Extracting {page_count} pages of {os.path.basename(pdf_path)} in {len(ranges)} parallel tasks")
+            pool = self._pool()
+            futures = [pool.submit(_extract_page_range, pdf_path, start, end) for start, end in ranges]
+            # Results are collected in page order, so pages are joined exactly once
+            pages = [page for future in futures for page in future.result()]
+
+        text = "".join(f"{page}\n" for page in pages)
+
+        # Write to a temporary file and rename, so concurrent jobs never read a partial entry
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+        return text
+
+    def extract(self, file_path):
+        """Return the text content of a PDF or plain-text file"""
+        if file_path.lower().endswith('.pdf'):
+            return self.extract_pdf(file_path)
+        with open(file_path, 'r', errors='replace') as file:
+            return file.read()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
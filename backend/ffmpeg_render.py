@@ -0,0 +1,152 @@
+"""
+Direct ffmpeg render backend.
+
+Instead of decoding every frame into Python, compositing captions with
+MoviePy and piping frames back to ffmpeg, this backend writes the subtitles
+as an ASS file and builds a single ffmpeg invocation that loops the
+background, trims it to the narration, burns in the captions and muxes the
+audio. No per-frame work happens in Python.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from previews import ffmpeg_preview_outputs, preview_layout, write_manifest
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+
+def probe_media(path):
+    """
+    Read duration and video size from the container header with ffprobe.
+
+    Returns:
+        dict: {"duration": float, "width": int or None, "height": int or None}
+    """
+    result = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-print_format", "json",
+         "-show_entries", "format=duration:stream=codec_type,width,height", path],
+        check=True, capture_output=True, text=True
+    )
+    info = json.loads(result.stdout)
+    video_streams = [stream for stream in info.get("streams", []) if stream.get("codec_type") == "video"]
+    return {
+        "duration": float(info.get("format", {}).get("duration", 0.0)),
+        "width": video_streams[0].get("width") if video_streams else None,
+        "height": video_streams[0].get("height") if video_streams else None,
+    }
+
+
+def _ass_time(seconds):
+    """Format seconds as an ASS timestamp (H:MM:SS.cc)"""
+    centiseconds = int(round(max(seconds, 0) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def _ass_text(text):
+    """Escape characters that ASS treats as markup"""
+    return text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+
+
+def write_ass_subtitles(subtitles, path, width, height, font="Arial", font_size=70, stroke_width=2):
+    """
+    Write subtitles from convert_transcription_to_subtitles as an ASS file.
+
+    The style mirrors the MoviePy captions: white text with a black outline,
+    centered on screen and wrapped to 90% of the frame width.
+    """
+    margin = int(width * 0.05)
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Caption,{font},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,"
+        f"0,0,0,0,100,100,0,0,1,{stroke_width},0,5,{margin},{margin},0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for start_time, end_time, text in subtitles:
+        lines.append(f"Dialogue: 0,{_ass_time(start_time)},{_ass_time(end_time)},Caption,,0,0,0,,{_ass_text(text)}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def _filter_path(path):
+    """Escape a file path for use inside an ffmpeg filter argument"""
+    path = path.replace("\\", "/")
+    return "'" + path.replace("'", "\\'").replace(":", "\\:") + "'"
+
+
+def create_tiktok_style_video_ffmpeg(video_path, audio_path, subtitles, output_path, threads=4, fps=24, video_offset=0.0):
+    """
+    Render a captioned, narrated video with a single ffmpeg process.
+
+    Args:
+        video_path (str): Background video (looped if shorter than the narration)
+        audio_path (str): Narration audio
+        subtitles (list): [start_time, end_time, text] entries
+        output_path (str): Where to write the MP4
+        threads (int): libx264 encoder threads
+        video_offset (float): Where in the background to start, in seconds
+
+    Returns:
+        str: Path of the written video
+    """
+    print(f"Rendering with ffmpeg: {video_path} + {audio_path} -> {output_path}")
+
+    # Ensure the output path is safe for ffmpeg
+    if ":" in os.path.basename(output_path):
+        output_path = os.path.join(os.path.dirname(output_path), os.path.basename(output_path).replace(":", "_"))
+
+    video_info = probe_media(video_path)
+    audio_duration = probe_media(audio_path)["duration"]
+
+    work_dir = tempfile.mkdtemp(prefix="studybytes_ass_")
+    try:
+        subtitle_path = write_ass_subtitles(
+            subtitles,
+            os.path.join(work_dir, "captions.ass"),
+            width=video_info["width"],
+            height=video_info["height"]
+        )
+        # The poster and sprite sheet are extra outputs of the same pass, split off the final frames
+        layout = preview_layout(audio_duration, video_info["width"], video_info["height"])
+        preview_graph, video_label, preview_outputs = ffmpeg_preview_outputs("v", output_path, layout)
+        command = [
+            FFMPEG_BINARY, "-y", "-v", "error",
+            "-ss", f"{video_offset:.3f}",
+            "-stream_loop", "-1", "-i", video_path,  # loop the background indefinitely...
+            "-i", audio_path,
+            "-filter_complex", f"[0:v]ass={_filter_path(subtitle_path)},fps={fps}[v]{preview_graph}",
+            "-map", f"[{video_label}]", "-map", "1:a",
+            "-t", f"{audio_duration:.3f}",  # ...and cut it at the end of the narration
+            "-c:v", "libx264", "-preset", "medium", "-threads", str(threads),
+            "-c:a", "aac",
+            "-movflags", "+faststart",  # moov atom first so playback starts before the download ends
+            output_path,
+            *preview_outputs
+        ]
+        subprocess.run(command, check=True, capture_output=True)
+        write_manifest(output_path, layout)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Video successfully saved to: {output_path}")
+    return output_path
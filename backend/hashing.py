@@ -0,0 +1,13 @@
+"""
+Content hashing helpers shared by the on-disk caches.
+"""
+import hashlib
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the hex SHA-256 digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
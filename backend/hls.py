@@ -0,0 +1,88 @@
+"""
+HLS packaging for rendered videos.
+
+Each rendered MP4 can additionally be packaged as an HLS ladder of phone-sized
+renditions, so mobile players start after the first few seconds of the
+smallest stream and adapt to the connection instead of downloading the full
+1080p file. Renditions share keyframe-aligned segment boundaries so players
+can switch between them at any segment. The MP4 itself stays in place (written
+with +faststart) as the fallback for players without HLS support.
+"""
+import os
+import shutil
+import subprocess
+
+from ffmpeg_render import FFMPEG_BINARY
+
+# (name, output height, video bitrate); widths follow the source aspect ratio
+HLS_RENDITIONS = (
+    ("720p", 1280, "2500k"),
+    ("540p", 960, "1400k"),
+    ("360p", 640, "700k"),
+)
+HLS_SEGMENT_SECONDS = 4
+MASTER_PLAYLIST = "master.m3u8"
+
+
+def hls_dir(video_path):
+    """Directory holding the HLS playlists and segments of a video"""
+    return f"{os.path.splitext(video_path)[0]}_hls"
+
+
+def hls_master_path(video_path):
+    """Return the master playlist of a video, or None if it hasn't been packaged"""
+    path = os.path.join(hls_dir(video_path), MASTER_PLAYLIST)
+    return path if os.path.exists(path) else None
+
+
+def package_hls(video_path, renditions=HLS_RENDITIONS, segment_seconds=HLS_SEGMENT_SECONDS, fps=24, threads=4):
+    """
+    Package a rendered MP4 as HLS with one single-pass encode of all renditions.
+
+    Args:
+        video_path (str): Rendered MP4
+        renditions (tuple): (name, height, video bitrate) per rendition
+        segment_seconds (int): Target segment length; keyframes are forced on segment boundaries
+        fps (int): Frame rate of the rendered video, used to place keyframes
+        threads (int): Encoder threads
+
+    Returns:
+        str: Path of the master playlist
+    """
+    output_dir = hls_dir(video_path)
+    tmp_dir = f"{output_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for name, _, _ in renditions:
+        os.makedirs(os.path.join(tmp_dir, name), exist_ok=True)
+
+    gop = fps * segment_seconds
+    split = f"[0:v]split={len(renditions)}" + "".join(f"[s{i}]" for i in range(len(renditions)))
+    scales = "".join(f";[s{i}]scale=-2:{height}[v{i}]" for i, (_, height, _) in enumerate(renditions))
+    command = [
+        FFMPEG_BINARY, "-y", "-v", "error", "-i", video_path,
+        "-filter_complex", split + scales,
+    ]
+    for i, (_, _, bitrate) in enumerate(renditions):
+        kbps = int(bitrate.rstrip("k"))
+        command += [
+            "-map", f"[v{i}]", "-map", "0:a",
+            f"-b:v:{i}", bitrate, f"-maxrate:v:{i}", f"{int(kbps * 1.07)}k", f"-bufsize:v:{i}", f"{int(kbps * 1.5)}k",
+        ]
+    command += [
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main", "-threads", str(threads),
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-c:a", "aac", "-b:a", "96k",
+        "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", os.path.join(tmp_dir, "%v", "segment_%03d.ts"),
+        "-master_pl_name", MASTER_PLAYLIST,
+        "-var_stream_map", " ".join(f"v:{i},a:{i},name:{name}" for i, (name, _, _) in enumerate(renditions)),
+        os.path.join(tmp_dir, "%v", "index.m3u8"),
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+
+    # Swap the finished ladder in, so a re-render never serves a half-written playlist
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    print(f"HLS renditions saved to: {output_dir}")
+    return os.path.join(output_dir, MASTER_PLAYLIST)
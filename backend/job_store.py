@@ -0,0 +1,239 @@
+"""
+Durable job store backed by SQLite.
+
+Processing jobs used to live in a module-level dict, so a restart lost them
+and every API worker process saw a different set. Jobs are now rows in an
+SQLite database in WAL mode: readers never block the writer, any number of
+worker processes can share it, and state survives redeploys.
+
+Frequently read fields (status, progress, complete) have their own columns;
+everything else (transcripts, filename mapping, videos, stage timings) is kept
+in a JSON document per job.
+
+Each job also records the server process that owns it and a heartbeat that
+process refreshes while it is alive. A job whose owner stopped heartbeating
+(the server was restarted or killed mid-job) is marked failed, so clients
+following it see an error instead of waiting forever.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    processing_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT '',
+    progress INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+"""
+
+# Columns added after the first release; added to existing databases on open
+MIGRATIONS = {
+    "owner": "TEXT",
+    "heartbeat_at": "REAL",
+}
+
+INTERRUPTED_STATUS = "ERROR: Interrupted by a server restart"
+
+
+class JobStore:
+    """
+    Processing job state persisted in SQLite, safe to share across threads and processes.
+
+    Args:
+        db_path (str): SQLite database file
+        owner (str): Identifies this server process as the owner of the jobs it creates
+            (hostname, pid and a random suffix by default)
+    """
+
+    def __init__(self, db_path, owner=None):
+        self.db_path = db_path
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._heartbeat_stop = None
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            # Several workers may open the database at once; the write lock keeps migrations from racing
+            conn.execute("BEGIN IMMEDIATE")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, declaration in MIGRATIONS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_complete_heartbeat ON jobs (complete, heartbeat_at)")
+
+    def _connection(self):
+        """One connection per thread; sqlite3 connections must not be shared between threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def create(self, processing_id, fields):
+        """Insert a new job with its initial fields, owned by this process"""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (processing_id, status, progress, complete, data, created_at, updated_at, "
+                "owner, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (processing_id, fields.get("status", ""), int(fields.get("progress", 0)),
+                 int(bool(fields.get("complete", False))), json.dumps(fields), now, now, self.owner, now)
+            )
+
+    def exists(self, processing_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT 1 FROM jobs WHERE processing_id = ?", (processing_id,)).fetchone()
+        return row is not None
+
+    def unfinished_ids(self):
+        """Ids of the jobs that haven't completed yet, in any worker process"""
+        with self._connection() as conn:
+            return [row[0] for row in conn.execute("SELECT processing_id FROM jobs WHERE complete = 0")]
+
+    def get(self, processing_id):
+        """
+        Return the job's full state, or None when the job doesn't exist.
+
+        Returns:
+            dict or None: All fields stored for the job
+        """
+        with self._connection() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE processing_id = ?", (processing_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_if_updated(self, processing_id, since):
+        """
+        Return the job's state only if it changed after the given version.
+
+        Args:
+            since (float): updated_at value from an earlier call (0 for the first)
+
+        Returns:
+            tuple[float, dict or None]: Current version and the job's fields,
+            or (since, None) when the job is unchanged or doesn't exist
+        """
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT updated_at, data FROM jobs WHERE processing_id = ? AND updated_at > ?", (processing_id, since)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else (since, None)
+
+    def _modify(self, processing_id, modify):
+        """Apply modify(data) to a job's state inside a single write transaction"""
+        with self._connection() as conn:
+            # BEGIN IMMEDIATE takes the write lock up front so concurrent read-modify-writes serialize
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT data FROM jobs WHERE processing_id = ?", (processing_id,)).fetchone()
+            if row is None:
+                return False
+            data = json.loads(row[0])
+            modify(data)
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, complete = ?, data = ?, updated_at = ? WHERE processing_id = ?",
+                (data.get("status", ""), int(data.get("progress", 0)), int(bool(data.get("complete", False))),
+                 json.dumps(data), time.time(), processing_id)
+            )
+        return True
+
+    def update(self, processing_id, fields):
+        """
+        Merge fields into a job. Only the given fields are modified.
+
+        Returns:
+            bool: False if the job doesn't exist
+        """
+        return self._modify(processing_id, lambda data: data.update(fields))
+
+    def heartbeat(self):
+        """Mark every unfinished job owned by this process as still alive"""
+        with self._connection() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND complete = 0", (time.time(), self.owner))
+
+    def fail_orphaned(self, stale_after):
+        """
+        Mark unfinished jobs whose owner stopped heartbeating as failed.
+
+        Args:
+            stale_after (float): Seconds without a heartbeat after which the owner is considered gone
+
+        Returns:
+            list[str]: Ids of the jobs marked failed
+        """
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT processing_id, data FROM jobs WHERE complete = 0 AND (owner IS NULL OR owner != ?) "
+                "AND (heartbeat_at IS NULL OR heartbeat_at < ?)", (self.owner, now - stale_after)
+            ).fetchall()
+            for processing_id, data in rows:
+                data = json.loads(data)
+                data.update({"status": INTERRUPTED_STATUS, "progress": 100, "complete": True,
+                             "error": "interrupted by restart"})
+                conn.execute(
+                    "UPDATE jobs SET status = ?, progress = ?, complete = 1, data = ?, updated_at = ? WHERE processing_id = ?",
+                    (data["status"], data["progress"], json.dumps(data), now, processing_id)
+                )
+        return [processing_id for processing_id, _ in rows]
+
+    def start_heartbeat(self, interval, stale_after):
+        """
+        Heartbeat this process's jobs and fail orphaned ones every interval seconds, in a daemon thread.
+
+        The sweep runs periodically and not only at startup, because after a quick
+        restart the previous owner's last heartbeat may still be recent.
+        """
+        if self._heartbeat_stop is not None:
+            return
+        self._heartbeat_stop = stop = threading.Event()
+
+        def run():
+            while True:
+                try:
+                    self.heartbeat()
+                    interrupted = self.fail_orphaned(stale_after)
+                    if interrupted:
+                        print(f"Marked {len(interrupted)} interrupted job(s) as failed: {', '.join(interrupted)}")
+                except sqlite3.Error as e:
+                    print(f"Job heartbeat failed: {e}")
+                if stop.wait(interval):
+                    return
+
+        threading.Thread(target=run, name="job-heartbeat", daemon=True).start()
+
+    def stop_heartbeat(self):
+        if self._heartbeat_stop is not None:
+            self._heartbeat_stop.set()
+            self._heartbeat_stop = None
+
+    def record_stage_timing(self, processing_id, stage, seconds):
+        """Store how long a pipeline stage took, under the job's "stageTimings" field"""
+        def set_timing(data):
+            data.setdefault("stageTimings", {})[stage] = round(seconds, 3)
+
+        return self._modify(processing_id, set_timing)
+
+
+class _Transaction:
+    """Context manager that commits on success and rolls back on error"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
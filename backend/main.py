@@ -1,11 +1,12 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import StreamingResponse
 from typing import List, Optional
 import uvicorn
 import time
 import os
+import posixpath
 import uuid
 import glob
 import io
@@ -14,38 +15,128 @@ import re
 import json
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from moviepy import VideoFileClip, TextClip, CompositeVideoClip, AudioFileClip
 import google.generativeai as genai
-from PyPDF2 import PdfReader
 # import styletts2 # Might need this to make file path handling of ASR and F0 models work
-from styletts2 import tts
-from moviepy import concatenate_videoclips
 import traceback
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import shutil
-import scipy.io.wavfile
+from audio_cache import AudioCache, audio_cache_key
+from phoneme_cache import PHONEME_MODES, PhonemeCache
+from model_loader import BackgroundModel
+from video_render import render_video, RENDER_BACKENDS, OUTPUT_FORMATS
+from backgrounds import BackgroundLibrary
+from ffmpeg_render import probe_media
+from job_store import JobStore
+from video_index import VideoIndex
+from static_files import CachedStaticFiles
+from extraction import TextExtractor
+from transcripts import ChunkResponseCache, StubTranscriptModel, TranscriptGenerator
+from scheduler import JobScheduler
+from pipeline import NarrationRenderPipeline
+from progress_events import ProgressBroker, job_event_stream
+from workspace import JobWorkspace
+from word_timings import move_with_word_timings, save_word_timings
+from uploads import BlobStore, UploadSizeLimit, UploadTooLarge, sanitize_filename
+from wav_stream import WavWriter
 
 load_dotenv()
 
 # Default directories (can be overridden when calling process_files)
-DEFAULT_AUDIO_DIR = "./backend/mp3s"     # Directory for TTS audio files
 DEFAULT_VIDEO_DIR = "../video_files"     # Directory for background videos, STATIC
-DEFAULT_OUTPUT_DIR = "./output_videos"   # Directory for output videos
 # Voice sample to use for cloning and better voice quality
 VOICE_SAMPLE_PATH = "./tts_settings/faster_Perfect_Your_British_Pronunciation_UK_Cities_and_Towns_Ep_744_b9a222.mp3"
 
 UPLOAD_DIR = "backend/uploads"         # Directory for user uploaded files
 MP3_DIR = "backend/mp3s"               # Directory for TTS audio files
 PROCESSED_VIDEOS_DIR = "output_videos" # Directory for output videos
+JOBS_DIR = "backend/jobs"              # Per-job workspaces (uploads, narration, transcripts)
+CACHE_DIR = "backend/cache"            # Directory for reusable computed artifacts
+BLOB_DIR = os.path.join(CACHE_DIR, "blobs")  # Uploaded file contents stored once per SHA-256
+BLOB_MAX_IDLE_SECONDS = float(os.getenv("BLOB_MAX_IDLE_HOURS", "24")) * 3600  # Unreferenced blobs not uploaded for this long are removed by /api/cleanup
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "backend/jobs.db")  # SQLite database holding processing job state
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))  # uvicorn worker processes sharing the job database
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "4"))  # Jobs processed at once per API worker
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024  # Largest single uploaded file
+MAX_JOB_UPLOAD_BYTES = int(os.getenv("MAX_JOB_UPLOAD_MB", "500")) * 1024 * 1024  # Largest total upload per job
+MAX_REQUEST_BYTES = MAX_JOB_UPLOAD_BYTES + 1024 * 1024  # Request body limit: a job's uploads plus room for multipart headers and form fields
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "1.0"))  # Seconds between job store checks for jobs run by other workers
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))  # Seconds between heartbeats of a worker's running jobs
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))  # Unfinished jobs without a heartbeat this long are marked interrupted
+# How many jobs may be in each pipeline stage at once
+STAGE_CONCURRENCY = {
+    "llm": int(os.getenv("LLM_CONCURRENCY", "2")),        # Bounded by Gemini quotas
+    "tts": int(os.getenv("TTS_CONCURRENCY", "1")),        # One shared StyleTTS2 model
+    "render": int(os.getenv("RENDER_CONCURRENCY", "2"))   # Each render stage uses RENDER_WORKERS processes
+}
+VOICE_CACHE_DIR = os.path.join(CACHE_DIR, "voices")  # Cached voice style vectors
+WEIGHTS_CACHE_DIR = os.path.join(CACHE_DIR, "weights")  # Memory-mappable copies of TTS checkpoints
+TTS_MMAP_WEIGHTS = os.getenv("TTS_MMAP_WEIGHTS", "1") == "1"  # Load checkpoint weights memory-mapped and shared between workers
+AUDIO_CACHE_DIR = os.path.join(CACHE_DIR, "audio")   # Cached narration audio
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "2048")) * 1024 * 1024
+BACKGROUND_LIBRARY_DIR = os.path.join(CACHE_DIR, "backgrounds")  # Transcoded, keyframe-dense backgrounds
+BACKGROUND_SIZE = os.getenv("BACKGROUND_SIZE", "1080x1920")  # Output frame size for backgrounds (WxH)
+TEXT_CACHE_DIR = os.path.join(CACHE_DIR, "text")  # Extracted document text keyed by file SHA-256
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))  # Processes for large PDFs
+LLM_CACHE_DIR = os.path.join(CACHE_DIR, "llm")  # Parsed Gemini responses per material chunk
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")  # TODO: get better model that's still free; "stub" runs offline
+LLM_CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", "24000"))  # Approximate material tokens per prompt
+LLM_CHUNK_WORKERS = int(os.getenv("LLM_CHUNK_WORKERS", "4"))  # Chunk prompts in flight per job
+LLM_STREAM = os.getenv("LLM_STREAM", "1") == "1"  # Stream Gemini responses and narrate each transcript as it completes
+SUBTITLE_CACHE_DIR = os.path.join(CACHE_DIR, "subtitles")  # Rasterized caption images shared by render workers
+# Render workers are separate processes; they pick the persisted caption cache up from the environment
+os.environ.setdefault("SUBTITLE_CACHE_DIR", SUBTITLE_CACHE_DIR)
+
+# StyleTTS2 settings used for every narration (also part of the audio cache key)
+TTS_PARAMS = {
+    "alpha": 0.4,            # Determines timbre of speech
+    "beta": 0.8,             # Determines prosody of speech
+    "diffusion_steps": int(os.getenv("TTS_DIFFUSION_STEPS", "6")),  # Higher = more diverse but slower; 3 is a cheaper fallback
+    "embedding_scale": 2     # Higher = more emotional/expressive
+}
+TTS_SEED = int(os.getenv("TTS_SEED", "0"))  # Fixed seed so identical transcripts give identical audio
+TTS_BATCH_SIZE = int(os.getenv("TTS_BATCH_SIZE", "4"))  # Transcripts synthesized per StyleTTS2 forward pass
+TTS_LENGTH_TOLERANCE = float(os.getenv("TTS_LENGTH_TOLERANCE", "0.1"))  # Padding that lets similar-length segments share the sampler/decoder pass (0 = exact lengths only)
+TTS_STYLE_MODE = os.getenv("TTS_STYLE_MODE", "diffusion")  # "diffusion" samples a style per segment, "bank" reuses a cached style bank per voice
+PHONEME_CACHE_MODE = os.getenv("PHONEME_CACHE_MODE", "sentences")  # "sentences" (exact) or "words" (also reuses per-word phonemes)
+if PHONEME_CACHE_MODE not in PHONEME_MODES:
+    raise ValueError(f"Unknown PHONEME_CACHE_MODE: {PHONEME_CACHE_MODE}")
+PHONEME_CACHE_PATH = os.getenv("PHONEME_CACHE_PATH", os.path.join(CACHE_DIR, "phonemes.json"))  # Phoneme cache persisted across restarts ("" to keep it in memory)
+TTS_PROFILE = os.getenv("TTS_PROFILE", "default")  # "default" (fp32) or "cpu-fast" (int8 dynamic quantization on CPU hosts)
+TTS_THREADS = int(os.getenv("TTS_THREADS", str(max(1, (os.cpu_count() or 1) // (2 * API_WORKERS)))))  # Cores reserved for TTS per API worker (half by default)
+TTS_PIN_THREADS = "TTS_THREADS" in os.environ or TTS_PROFILE == "cpu-fast"  # Limit torch to TTS_THREADS; otherwise torch picks its own thread count
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "moviepy")  # Default render backend: "moviepy" or "ffmpeg"
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "mp4")  # "mp4" (faststart) or "hls" (phone-sized HLS renditions plus the MP4)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))  # Narrations allowed to wait for a render slot
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(max(1, (os.cpu_count() or 1) // 4))))  # Videos rendered concurrently
+# Encoder threads per render process: the cores left after the TTS share are split between
+# every render process of every API worker
+RENDER_THREADS = max(1, ((os.cpu_count() or 1) - TTS_THREADS * API_WORKERS)
+                     // (API_WORKERS * STAGE_CONCURRENCY["render"] * RENDER_WORKERS))
 
 # Create directories (this should happen once)
 directories = [
     UPLOAD_DIR,
+    BLOB_DIR,
     MP3_DIR,
-    PROCESSED_VIDEOS_DIR
+    PROCESSED_VIDEOS_DIR,
+    JOBS_DIR,
+    VOICE_CACHE_DIR,
+    WEIGHTS_CACHE_DIR,
+    AUDIO_CACHE_DIR,
+    TEXT_CACHE_DIR,
+    LLM_CACHE_DIR,
+    SUBTITLE_CACHE_DIR,
+    BACKGROUND_LIBRARY_DIR
 ]
 
 app = FastAPI(title="StudyBytes API")
 
+# Reject oversized uploads before the multipart parser spools them (added first so CORS headers wrap the 413)
+app.add_middleware(UploadSizeLimit, max_bytes=MAX_REQUEST_BYTES)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -53,6 +144,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
 for directory in directories:
@@ -61,9 +153,7 @@ for directory in directories:
 # Mount static files directory
 ABSOLUTE_PROCESSED_VIDEOS_DIR = os.path.abspath(PROCESSED_VIDEOS_DIR)
 print(f"Mounting videos from: {ABSOLUTE_PROCESSED_VIDEOS_DIR}")
-app.mount("/videos", StaticFiles(directory=ABSOLUTE_PROCESSED_VIDEOS_DIR), name="videos")
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+app.mount("/videos", CachedStaticFiles(directory=ABSOLUTE_PROCESSED_VIDEOS_DIR), name="videos")
 
 # Video data model
 class Video(BaseModel):
@@ -73,67 +163,130 @@ class Video(BaseModel):
     thumbnail: str
     duration: int  # in seconds
     description: str = ""
-
-# Initialize StyleTTS2 once as a global object for better performance
+    sprite: Optional[dict] = None  # Hover-preview sprite sheet: url, columns, rows, frames, interval, tileWidth, tileHeight
+    hlsUrl: Optional[str] = None  # HLS master playlist when the video was packaged for adaptive streaming
+
+# Services shared by every request and job. They are built by init_services() when the app
+# starts rather than at import: render and PDF extraction workers are spawned processes that
+# re-import this module (as __mp_main__ when the server is started with `py main.py`), and
+# they must not load StyleTTS2, configure Gemini, open the job database or read the caches.
+transcript_model = None
+chunk_response_cache = None
+checkpoint_id = None
+phoneme_cache = None
+tts_model = None
+voice_registry = None
+audio_cache = None
+blob_store = None
+text_extractor = None
+job_store = None
+video_index = None
+progress_broker = None
+job_scheduler = None
+narration_style_mode = None
+
+# StyleTTS2 is loaded once per process, in the background after startup (see /api/ready)
 os.makedirs('./tts_settings', exist_ok=True)
 model_path = './tts_settings/epochs_2nd_00020.pth'
 config_path = './tts_settings/config.yml'
 
-if os.path.exists(model_path) or os.path.exists(config_path):
-    print("TTS: Using custom model checkpoint and config...")
-    tts_instance = tts.StyleTTS2(
-        model_checkpoint_path=model_path,
-        config_path=config_path
-    )
-else:
+def load_tts_engine():
+    from tts_engine import StyleTTS2Engine
+    
+    weights_path = os.path.join(WEIGHTS_CACHE_DIR, f"{checkpoint_id}.pt") if TTS_MMAP_WEIGHTS else None
+    if os.path.exists(model_path) or os.path.exists(config_path):
+        print("TTS: Using custom model checkpoint and config...")
+        return StyleTTS2Engine(
+            model_checkpoint_path=model_path,
+            config_path=config_path,
+            weights_path=weights_path,
+            profile=TTS_PROFILE,
+            num_threads=TTS_THREADS if TTS_PIN_THREADS else None,
+            phoneme_cache=phoneme_cache,
+            length_tolerance=TTS_LENGTH_TOLERANCE
+        )
     print("TTS: Model files not found. Using default models (will be downloaded)...")
-    tts_instance = tts.StyleTTS2()  # Uses default paths
+    return StyleTTS2Engine(weights_path=weights_path, profile=TTS_PROFILE,
+                           num_threads=TTS_THREADS if TTS_PIN_THREADS else None,
+                           phoneme_cache=phoneme_cache, length_tolerance=TTS_LENGTH_TOLERANCE)  # Uses default paths
+
+def init_services():
+    """Build the models, caches and stores used by the API; called once per server process on startup"""
+    global transcript_model, chunk_response_cache, checkpoint_id, phoneme_cache, tts_model, voice_registry
+    global audio_cache, blob_store, text_extractor, job_store, video_index, progress_broker, job_scheduler
+    global narration_style_mode
+    # Imported here because they import torch; worker processes never need them
+    from style_bank import STYLE_BANK_VERSION, STYLE_MODES
+    from voices import VoiceRegistry, checkpoint_fingerprint
+    
+    if TTS_STYLE_MODE not in STYLE_MODES:
+        raise ValueError(f"Unknown TTS_STYLE_MODE: {TTS_STYLE_MODE}")
+    narration_style_mode = f"bank-v{STYLE_BANK_VERSION}" if TTS_STYLE_MODE == "bank" else TTS_STYLE_MODE
+    
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    # Model used for transcript generation; the stub needs no API key
+    transcript_model = StubTranscriptModel() if GEMINI_MODEL == "stub" else genai.GenerativeModel(GEMINI_MODEL)
+    chunk_response_cache = ChunkResponseCache(LLM_CACHE_DIR)
+    
+    checkpoint_id = checkpoint_fingerprint(model_path)
+    # Phonemized sentences and words, shared by every synthesis in this process
+    phoneme_cache = PhonemeCache(word_level=PHONEME_CACHE_MODE == "words", persist_path=PHONEME_CACHE_PATH or None)
+    tts_model = BackgroundModel("StyleTTS2", load_tts_engine)
+    
+    # Voice style vectors are computed once per voice file and checkpoint, then reused
+    voice_registry = VoiceRegistry(
+        tts_model.get,
+        cache_dir=VOICE_CACHE_DIR,
+        checkpoint_id=checkpoint_id
+    )
+    
+    # Synthesized narrations keyed by transcript text and TTS settings
+    audio_cache = AudioCache(AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES)
+    
+    # Uploaded files are stored once per content and linked into job workspaces
+    blob_store = BlobStore(BLOB_DIR)
+    
+    # Uploaded documents are extracted once per file content
+    text_extractor = TextExtractor(TEXT_CACHE_DIR, workers=EXTRACTION_WORKERS)
+    
+    # Store processing tasks and their status (shared by all API worker processes)
+    job_store = JobStore(JOB_DB_PATH)
+    
+    # Duration, size and resolution of rendered videos, kept in the same database
+    video_index = VideoIndex(JOB_DB_PATH, PROCESSED_VIDEOS_DIR)
+    
+    # Pushes job progress to Server-Sent Events clients
+    progress_broker = ProgressBroker()
+    
+    # Runs several jobs at once while bounding how many are in each stage
+    job_scheduler = JobScheduler(MAX_CONCURRENT_JOBS, STAGE_CONCURRENCY)
+
 
-def process_files_with_gemini(upload_dir, max_retries=3):
+def extract_file_contents(upload_dir, files=None):
     """
-    Process all files in the upload directory using a single Gemini API call
-    and generate easy-to-understand transcripts in JSON format.
-    Will retry on JSON parsing failures.
+    Extract the text of every uploaded file.
+    
+    PDF text is cached by file content and large PDFs are split across worker
+    processes, see extraction.TextExtractor.
     
     Args:
         upload_dir (str): Path to the directory containing uploaded files
-        max_retries (int): Maximum number of retry attempts for JSON parsing failures
+        files (list): File names to extract; defaults to every file in upload_dir
         
     Returns:
-        dict: JSON response containing simplified transcripts
+        dict: File name -> extracted text (or a placeholder describing the error)
     """
-    # Check if upload directory exists
-    if not os.path.exists(upload_dir):
-        print(f"Error: Upload directory not found at {upload_dir}")
-        return None
+    if files is None:
+        files = [f for f in os.listdir(upload_dir) if os.path.isfile(os.path.join(upload_dir, f))]
     
-    # Get list of files in the upload directory
-    files = [f for f in os.listdir(upload_dir) if os.path.isfile(os.path.join(upload_dir, f))]
-    
-    if not files:
-        print(f"Error: No files found in {upload_dir}")
-        return None
-    
-    print(f"Found {len(files)} files in upload directory")
-    
-    # Collect content from all files
     file_contents = {}
-    
     for file_name in files:
         file_path = os.path.join(upload_dir, file_name)
         print(f"Reading file: {file_name}")
         
-        # Check if file is a PDF
         if file_name.lower().endswith('.pdf'):
             try:
-                # Extract text from PDF using PyPDF2
-                text_content = ""
-                with open(file_path, 'rb') as pdf_file:
-                    pdf_reader = PdfReader(pdf_file)
-                    for page_num in range(len(pdf_reader.pages)):
-                        page = pdf_reader.pages[page_num]
-                        text_content += page.extract_text() + "\n"
-                
+                text_content = text_extractor.extract_pdf(file_path)
                 if text_content.strip():
                     file_contents[file_name] = text_content
                 else:
@@ -145,183 +298,90 @@ def process_files_with_gemini(upload_dir, max_retries=3):
         else:
             # Handle text files
             try:
-                with open(file_path, 'r', errors='replace') as file:
-                    file_contents[file_name] = file.read()
+                file_contents[file_name] = text_extractor.extract(file_path)
             except Exception as e:
                 print(f"Warning: Could not read {file_name}: {str(e)}")
                 file_contents[file_name] = f"[File: {file_name} - Error: {str(e)}]"
     
-    # Create a single prompt with all file contents
-    files_content = ""
-    print(f"Processing {len(file_contents)} files")
-    for file_name, content in file_contents.items():
-        files_content += f"\n\n--- FILE: {file_name} ---\n{content}\n--- END OF FILE: {file_name} ---"
-    
-    # TODO: get better model that's still free
-    model = genai.GenerativeModel('gemini-1.5-pro')
+    return file_contents
+
+
+def make_transcript_generator(max_retries=3):
+    """Transcript generator with one prompt per token-budgeted chunk; only failed or changed chunks hit the API"""
+    return TranscriptGenerator(
+        transcript_model,
+        GEMINI_MODEL,
+        cache=chunk_response_cache,
+        max_chunk_tokens=LLM_CHUNK_TOKENS,
+        max_workers=LLM_CHUNK_WORKERS,
+        max_retries=max_retries,
+        stream=LLM_STREAM
+    )
+
+
+def stream_transcripts(processing_id, workspace, file_contents):
+    """
+    Yield (concept name, transcript) pairs while Gemini is still generating.
     
-    # Retry loop for handling JSON parsing failures
-    for attempt in range(max_retries + 1):  # +1 to include the initial attempt
-        try:
-            if attempt == 0:
-                prompt = f"""
-                Please analyze all the following files and provide transcripts that explain 
-                the material in each file in an easy-to-understand way. You should create as many videos as required to explain the important concepts in the material.
-                You are expected to usually create multiple video transcripts per file as there will be many concepts to explain.
-                Each video should focus on a specific concept or topic. The transcripts are for short form video content usually ranging around 30 seconds to a minute.
-
-                Return ONLY a valid JSON object with the following structure - do not include any markdown formatting, explanations, or code blocks, follow the exact structure:
-
-                {{
-                    "transcripts": [
-                        {{
-                            "Video name": "name_of_video_1",
-                            "transcript": "your transcript here...",
-                        }},
-                        {{
-                            "Video name": "name_of_video_2",
-                            "transcript": "your transcript here...",
-                        }}
-                        // Include entries for as many transcripts required to explain the content
-                    ],
-                }}
-
-                Files to analyze:{files_content}
-                """
-            else:
-                # prevent rate limiting
-                time.sleep(2)
-                prompt = f"""
-                IMPORTANT: Your response MUST be a valid JSON object and NOTHING ELSE. No markdown, no explanations, no code blocks.
-                
-                Please analyze these files and create transcripts explaining the material in an easy-to-understand way.
-                Create multiple video transcripts focusing on specific concepts from the material.
-                
-                Your response must EXACTLY follow this JSON structure:
-                
-                {{
-                    "transcripts": [
-                        {{
-                            "Video name": "name_of_video_1",
-                            "transcript": "your transcript here...",
-                        }},
-                        {{
-                            "Video name": "name_of_video_2",
-                            "transcript": "your transcript here...",
-                        }}
-                    ],
-                }}
-                
-                DO NOT include any explanations, comments, or text outside of this exact JSON structure.
-                DO NOT use markdown code blocks or any other formatting.
-
-                Files to analyze:{files_content}
-                """
-            
-            print(f"Attempt {attempt+1}/{max_retries+1}: Sending files to Gemini API...")
-            response = model.generate_content(prompt)
-            response_text = response.text
-            
-            # Extract JSON content with improved handling
-            json_content = response_text
-            
-            # Try to extract if it's in a code block
-            if "```json" in response_text:
-                json_content = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_content = response_text.split("```")[1].strip()
-            
-            # Remove any leading/trailing characters that might invalidate JSON
-            json_content = json_content.strip()
-            if json_content.startswith('`') and json_content.endswith('`'):
-                json_content = json_content[1:-1].strip()
-                
-            # Try to parse the JSON
-            results = json.loads(json_content)
-            
-            # If we got here, JSON parsing succeeded
-            # Convert array to dictionary with file_name as key for easier access
-            formatted_results = {}
-            if "transcripts" in results:
-                for transcript in results["transcripts"]:
-                    if "Video name" in transcript:
-                        formatted_results[transcript["Video name"]] = transcript
-            
-            # Add the overall theme if it exists
-            if "overall_theme" in results:
-                formatted_results["overall_theme"] = results["overall_theme"]
-            
-            print(f"Successfully processed all files on attempt {attempt+1}")
-            
-            # Save results to a JSON file
-            output_path = os.path.join(upload_dir, "gemini_transcripts.json")
-            with open(output_path, 'w') as f:
-                json.dump(formatted_results, f, indent=2)
-            
-            print(f"Transcripts saved to {output_path}")
-            return formatted_results
-            
-        except json.JSONDecodeError as e:
-            # JSON parsing failed
-            print(f"Attempt {attempt+1}/{max_retries+1}: JSON parse error: {str(e)}")
-            
-            # Save the problematic response for debugging
-            error_path = os.path.join(upload_dir, f"gemini_error_response_attempt_{attempt+1}.txt")
-            with open(error_path, 'w') as f:
-                f.write(response_text)
-            
-            print(f"Raw response saved to {error_path}")
-            
-            # If this was our last attempt, return an error
-            if attempt >= max_retries:
-                print("All retry attempts failed")
-                return {"error": "Failed to parse response after multiple attempts"}
-            
-            print(f"Retrying... (Attempt {attempt+2}/{max_retries+1})")
-        
-        except Exception as e:
-            # For other exceptions (network issues, API errors, etc.)
-            print(f"Attempt {attempt+1}/{max_retries+1}: Error calling Gemini API: {str(e)}")
-            
-            if attempt == max_retries:
-                print("All retry attempts failed")
-                return {"error": f"API Error: {str(e)}"}
-            
-            print(f"Retrying... (Attempt {attempt+2}/{max_retries+1})")
+    Each transcript is passed on as soon as its JSON object is complete, so
+    narration starts long before the full response has arrived. The collected
+    transcripts are stored on the job and written to the workspace once the
+    stream ends.
+    """
+    transcripts = {}
+    with job_scheduler.stage("llm"):
+        stage_start = time.time()
+        for entry in make_transcript_generator().iter_generate(file_contents, debug_dir=workspace.work_dir):
+            concept_key = entry["Video name"]
+            transcripts[concept_key] = entry
+            job_store.update(processing_id, {"Transcripts": transcripts})
+            yield concept_key, entry["transcript"]
+        job_store.record_stage_timing(processing_id, "transcripts", time.time() - stage_start)
     
-    return {"error": "Failed to process files after multiple attempts"}
+    with open(workspace.transcripts_path, 'w') as f:
+        json.dump(transcripts, f, indent=2)
+    print(f"Transcripts saved to {workspace.transcripts_path}")
+
 
 # Processing function to return real videos from processed_videos folder
-def process_files(assignment_files, material_files):
-    """Process files and return list of processed video objects"""
+def process_files(assignment_files, material_files, video_dir=PROCESSED_VIDEOS_DIR, offset=0, limit=None):
+    """
+    Process files and return list of processed video objects
     
-    videos = []
-    video_files = glob.glob(os.path.join(PROCESSED_VIDEOS_DIR, "*.mp4"))
+    Metadata comes from the video index, so only new or modified files are probed.
     
-    # Process real video files
-    for i, video_path in enumerate(video_files):
-        filename = os.path.basename(video_path)
-        video_id = str(uuid.uuid4())
-        
-        # Extract title from filename (remove extension)
-        title = os.path.splitext(filename)[0].replace("-", " ").replace("_", " ").title()
-        
+    Returns:
+        tuple[int, list[Video]]: Total number of videos in video_dir and the requested page
+    """
+    # Videos of jobs that are still rendering may be half written; they are indexed as each render finishes
+    in_progress_dirs = [os.path.join(PROCESSED_VIDEOS_DIR, job_id) for job_id in job_store.unfinished_ids()]
+    total, rows = video_index.list(video_dir, offset=offset, limit=limit, in_progress_dirs=in_progress_dirs)
+    
+    videos = []
+    for row in rows:
+        title = row["title"]
+        # Poster and sprite sheet are written next to the video by the renderer
+        preview = row["preview"]
+        folder = posixpath.dirname(row["path"])
+        preview_url = lambda name: "/videos/" + posixpath.join(folder, name)
         # Create video object with relative URL path for the frontend
         videos.append(
             Video(
-                id=video_id,
+                id=row["video_id"],
                 title=title,
-                url=f"/videos/{filename}",  # Relative URL - will be served by our static files mount
-                thumbnail=f"https://picsum.photos/id/{i+40}/400/225",
-                duration=get_video_duration(video_path),    
-                description=f"This video explains {title.lower()} from your learning with detailed examples."
+                url=f"/videos/{row['path']}",  # Relative URL - will be served by our static files mount
+                thumbnail=preview_url(preview["poster"]) if preview else "",
+                duration=int(row["duration"]),
+                description=f"This video explains {title.lower()} from your learning with detailed examples.",
+                sprite=dict(
+                    {key: value for key, value in preview.items() if key not in ("poster", "sprite")},
+                    url=preview_url(preview["sprite"])
+                ) if preview else None,
+                hlsUrl=f"/videos/{row['hls']}" if row["hls"] else None
             )
         )
     # Return the existing videos in the processed_videos directory
-    return videos
-
-# Store processing tasks and their status
-processing_tasks = {}
+    return total, videos
 
 def update_tasks(
     processing_id: str,
@@ -331,7 +391,9 @@ def update_tasks(
     complete: Optional[bool] = None,
     total_audios: Optional[int] = None,
     current_audio: Optional[int] = None,
-    total_videos: Optional[int] = None
+    total_videos: Optional[int] = None,
+    completed_videos: Optional[int] = None,
+    pipeline: Optional[dict] = None
 ) -> None:
     """
     Update the status of a processing task. Only specified fields are modified.
@@ -344,184 +406,186 @@ def update_tasks(
         total_audios: Total audio files (optional)
         current_audio: Current audio file index (optional)
         total_videos: Total video files (optional)
+        completed_videos: Number of videos finished rendering (optional)
+        pipeline: Queue depth and stage utilization of the narration/render pipeline (optional)
     """
-    if processing_id in processing_tasks:
-        update_data = {}
-        if status is not None:
-            update_data["status"] = status
-        if progress is not None:
-            update_data["progress"] = progress
-        if total_audios is not None:
-            update_data["totalAudios"] = total_audios
-        if current_audio is not None:
-            update_data["currentAudio"] = current_audio
-        if total_videos is not None:
-            update_data["totalVideos"] = total_videos
-        if complete is not None:
-            update_data["complete"] = complete
-        
-        processing_tasks[processing_id].update(update_data)
-
+    update_data = {}
+    if status is not None:
+        update_data["status"] = status
+    if progress is not None:
+        update_data["progress"] = progress
+    if total_audios is not None:
+        update_data["totalAudios"] = total_audios
+    if current_audio is not None:
+        update_data["currentAudio"] = current_audio
+    if total_videos is not None:
+        update_data["totalVideos"] = total_videos
+    if completed_videos is not None:
+        update_data["completedVideos"] = completed_videos
+    if pipeline is not None:
+        update_data["pipeline"] = pipeline
+    if complete is not None:
+        update_data["complete"] = complete
+    
+    job_store.update(processing_id, update_data)
+    # Wake any event streams following this job
+    progress_broker.notify(processing_id)
+
+
+def safe_concept_name(concept_key):
+    """Sanitize a concept name for use as a file name"""
+    return concept_key.replace(":", "_").replace("/", "_").replace("\\", "_").replace(" ", "_")
+
+def run_narration_render_pipeline(processing_id, workspace, concepts, render_backend, total=None, output_format=OUTPUT_FORMAT):
+    """
+    Narrate concepts and render their videos with the two stages overlapped.
+    
+    A producer thread synthesizes narrations in batches of up to TTS_BATCH_SIZE and
+    hands each one to a pool of RENDER_WORKERS render processes through a bounded
+    queue (PIPELINE_QUEUE_SIZE). Queue depth and per-stage utilization are reported
+    in the job status under "pipeline".
+    
+    Args:
+        concepts (iterable): (concept name, transcript) pairs; may be a generator
+            that yields them as they are produced
+        total (int): Number of concepts, or None when it is only known once the
+            generator is exhausted
+        output_format (str): "mp4" or "hls", see video_render.render_video
+    
+    Returns:
+        list[str]: Paths of the rendered videos
+    """
+    counts = {"total": total or 0, "progress": 30}
+    filename_mapping = {}
+    library = get_background_library(DEFAULT_VIDEO_DIR)
+    library.prepare()
+    rng = random.Random()
+    
+    def counted(concepts):
+        for concept in concepts:
+            if total is None:
+                counts["total"] += 1
+                update_tasks(processing_id, total_audios=counts["total"], total_videos=counts["total"])
+            yield concept
+    
+    def narrate(batch):
+        with job_scheduler.stage("tts"):
+            audio_paths = synthesize_transcripts(
+                [transcript for _, transcript in batch],
+                output_dir=workspace.audio_dir
+            )
+        narrated = []
+        for (concept_key, transcript), audio_path in zip(batch, audio_paths):
+            # Rename the file to match the sanitized concept key
+            final_path = os.path.join(workspace.audio_dir, f"{safe_concept_name(concept_key)}.wav")
+            move_with_word_timings(audio_path, final_path)
+            filename_mapping[concept_key] = safe_concept_name(concept_key)
+            narrated.append((concept_key, final_path, transcript))
+        return narrated
+    
+    def on_update(event, result, stats):
+        total_count = max(counts["total"], 1)
+        narrated, rendered = stats["narrated"], stats["rendered"] + stats["failed"]
+        concept_key = result[0]
+        if event == "narrated":
+            status = f"Creating audio narration ({narrated}/{counts['total']}): {concept_key}..."
+        else:
+            status = f"Creating video {rendered}/{counts['total']}: {safe_concept_name(concept_key)}.mp4 complete"
+        # The total can still grow while transcripts stream in; never let progress move backwards
+        counts["progress"] = max(counts["progress"], int(30 + 20 * narrated / total_count + 45 * rendered / total_count))
+        update_tasks(
+            processing_id,
+            status=status,
+            progress=counts["progress"],
+            current_audio=narrated,
+            completed_videos=stats["rendered"],
+            pipeline=stats
+        )
+    
+    def submit_render(narrated):
+        concept_key, audio_path, transcript = narrated
+        video_path, video_offset = library.pick_segment(probe_media(audio_path)["duration"], rng=rng)
+        output_path = os.path.join(workspace.output_dir, f"{safe_concept_name(concept_key)}.mp4")
+        # Renders run in the shared worker pool; each job keeps at most RENDER_WORKERS of them in flight
+        future = submit_render_task(video_path, audio_path, transcript, output_path, RENDER_THREADS,
+                                    render_backend, video_offset, output_format)
+        future.add_done_callback(index_rendered_video)
+        return future
+    
+    pipeline = NarrationRenderPipeline(
+        narrate,
+        submit_render,
+        render_slots=RENDER_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        batch_size=TTS_BATCH_SIZE,
+        on_update=on_update
+    )
+    stage_start = time.time()
+    completed = pipeline.run(counted(concepts), render_stage=job_scheduler.stage("render"))
+    
+    job_store.update(processing_id, {"filename_mapping": filename_mapping})
+    job_store.record_stage_timing(processing_id, "audio", pipeline.stats.tts_busy)
+    job_store.record_stage_timing(processing_id, "video", pipeline.stats.render_busy)
+    job_store.record_stage_timing(processing_id, "narrationAndVideo", time.time() - stage_start)
+    return [output_path for _, output_path in completed]
 
 # Background task for processing files
-def process_files_task(processing_id: str, saved_files: List[str]):
+def process_files_task(processing_id: str, saved_files: List[str], render_backend: str = RENDER_BACKEND,
+                       output_format: str = OUTPUT_FORMAT):
     """
     Background task to process files and update progress
     """
+    workspace = JobWorkspace(JOBS_DIR, PROCESSED_VIDEOS_DIR, processing_id).create()
     try:
         update_tasks(processing_id, status="Extracting key concepts...", progress=20)
         
         # Actually process the files
-        if "Transcripts" in processing_tasks[processing_id]:
-            transcripts = processing_tasks[processing_id]["Transcripts"]
+        job = job_store.get(processing_id)
+        if "Transcripts" in job:
+            transcripts = job["Transcripts"]
             print("WARNING/ERROR: Using existing transcripts from processing task")
+            with open(workspace.transcripts_path, 'w') as f:
+                json.dump(transcripts, f, indent=2)
+            concepts = [(k, v["transcript"]) for k, v in transcripts.items() if isinstance(v, dict) and "transcript" in v]
+            total_concepts = len(concepts)
         else:
-            transcripts = process_files_with_gemini(UPLOAD_DIR)
-            processing_tasks[processing_id]["Transcripts"] = transcripts
-            print("Transcripts:", transcripts)
+            # Extraction runs outside the LLM slot; cached files return immediately
+            stage_start = time.time()
+            file_contents = extract_file_contents(workspace.upload_dir)
+            job_store.record_stage_timing(processing_id, "extraction", time.time() - stage_start)
+            
+            # Transcripts are narrated as they stream out of Gemini; the total is known at the end
+            concepts = stream_transcripts(processing_id, workspace, file_contents)
+            total_concepts = None
         
-        # Step 4: Audio narration generation (30-50%)
+        # Steps 4-5: Audio narration (30-50%) and video creation (50-95%), pipelined so each
+        # narration is rendered as soon as it is ready instead of after all TTS has finished
         update_tasks(processing_id, status="Creating audio narration...", progress=30)
         
-        # Generate audio files with progress updates
-        audio_files = []
-        valid_concepts = [k for k, v in transcripts.items() if isinstance(v, dict) and "transcript" in v]
-        total_concepts = len(valid_concepts)
-        
-        update_tasks(processing_id, status=f"Preparing to create {total_concepts} audio files...", total_audios=total_concepts)
-        
-        if total_concepts > 0:
-            # Allocate 20% of progress (30-50%) for audio generation
-            audio_progress_increment = 20 / total_concepts
-            current_progress = 30
-            
-            for i, concept_key in enumerate(valid_concepts):
-                concept_data = transcripts[concept_key]
-                update_tasks(processing_id, status=f"Creating audio narration ({i+1}/{total_concepts}): {concept_key}...", progress=int(current_progress), current_audio=i+1)
-                
-                request = TextToSpeechRequest(text=concept_data["transcript"])
-                audio_file_path = text_to_speech(request)
-                
-                safe_concept_key = concept_key.replace(":", "_").replace("/", "_").replace("\\", "_").replace(" ", "_")
-                
-                # Rename the file to match the sanitized concept key
-                final_path = os.path.join(MP3_DIR, f"{safe_concept_key}.wav")
-                os.rename(audio_file_path, final_path)
-                audio_files.append(final_path)
-                
-                # Store mapping between original concept key and safe filename
-                if "filename_mapping" not in processing_tasks[processing_id]:
-                    processing_tasks[processing_id]["filename_mapping"] = {}
-                processing_tasks[processing_id]["filename_mapping"][concept_key] = safe_concept_key
-                
-                current_progress += audio_progress_increment
-                update_tasks(processing_id, progress=int(current_progress))
-        else:
+        if total_concepts == 0:
             # If no concepts (unlikely), still advance progress
             print("WARNING/ERROR: No valid concepts found for audio generation")
-            update_tasks(processing_id, progress=50)
-        
-        # Step 5: Video creation (50-95%) - most time-consuming part with detailed updates
-        update_tasks(processing_id, status="Building videos with background visuals...", progress=50)
-        
-        # Monkey patch the create_videos function to provide status updates
-        original_create_tiktok_style_video = create_tiktok_style_video
-        
-        def create_tiktok_style_video_with_progress(video_path, audio_path, subtitles, output_path):
-            """Wrapped version of create_tiktok_style_video that updates progress"""
-            # Extract video name from path
-            video_name = os.path.basename(output_path)
-            update_tasks(processing_id, status=f"Generating video: {video_name}...")
-            
-            # Call original function
-            return original_create_tiktok_style_video(video_path, audio_path, subtitles, output_path)
-        
-        # Replace the function temporarily
-        create_tiktok_style_video_backup = create_tiktok_style_video
-        globals()['create_tiktok_style_video'] = create_tiktok_style_video_with_progress
-        
-        # Set up progress monitoring for video creation
-        total_audio_files = len(audio_files) if audio_files else len(glob.glob(os.path.join(MP3_DIR, "*.mp3")))
-        
-        if total_audio_files > 0:
-            # If we have audio files, we'll create that many videos
-            # Allocate the remaining 50% (from 50-100%) equally among videos
-            video_progress_increment = 45 / total_audio_files  # Save last 5% for finalization
-            current_video_progress = 50
-            
-            # Override the original create_tiktok_style_video function to track individual video progress
-            def create_tiktok_style_video_with_progress(video_path, audio_path, subtitles, output_path):
-                """Wrapped version of create_tiktok_style_video that updates progress"""
-                # Keep using the original variables in the outer scope
-                nonlocal current_video_progress
-                
-                # Extract video name from path for status updates and sanitize it
-                video_name = os.path.basename(output_path)
-                
-                # Ensure output path is safe for ffmpeg
-                safe_output_path = output_path
-                base_dir = os.path.dirname(output_path)
-                base_name = os.path.basename(output_path)
-                if ":" in base_name:
-                    # Sanitize the filename
-                    safe_name = base_name.replace(":", "_").replace("/", "_").replace("\\", "_")
-                    safe_output_path = os.path.join(base_dir, safe_name)
-                    # Log the replacement
-                    print(f"Sanitizing video filename: {base_name} -> {safe_name}")
-                
-                # Update status to show which video is currently being processed
-                current_video_number = int((current_video_progress - 50) / video_progress_increment) + 1
-                update_tasks(processing_id, status=f"Creating video {current_video_number}/{total_audio_files}: {video_name}...", progress=int(current_video_progress))
-                
-                # Call original function to create the video with sanitized path
-                result = original_create_tiktok_style_video(video_path, audio_path, subtitles, safe_output_path)
-                
-                # Update progress after video is complete
-                current_video_progress += video_progress_increment
-                update_tasks(processing_id, progress=int(min(95, current_video_progress)))
-                
-                return result
-            
-            # Replace the function temporarily for individual video tracking
-            globals()['create_tiktok_style_video'] = create_tiktok_style_video_with_progress
-            
-            # We also need to modify create_videos to set initial status
-            original_create_videos = create_videos
-            
-            def create_videos_with_progress(*args, **kwargs):
-                """Wrapper for create_videos that sets initial video processing status"""
-                # Get audio files from directory
-                mp3_dir = args[0] if len(args) > 0 else "./backend/mp3s"
-                mp3_files = glob.glob(os.path.join(mp3_dir, "*.mp3"))
-                total_videos = len(mp3_files)
-                
-                # Set initial status before processing any videos
-                update_tasks(processing_id, status=f"Preparing to create {total_videos} videos...", progress=50, total_videos=total_videos)
-                
-                # Call original function - each video will update progress individually
-                return original_create_videos(*args, **kwargs)
-            
-            # Replace the function temporarily
-            globals()['create_videos'] = create_videos_with_progress
-        
-        # Generate videos from audio and material files
-        print("Creating videos...")
-        create_videos()
-        
-        # Restore original functions
-        globals()['create_tiktok_style_video'] = create_tiktok_style_video_backup
-        if 'original_create_videos' in locals():
-            globals()['create_videos'] = original_create_videos
+            update_tasks(processing_id, progress=95)
+        else:
+            if total_concepts is not None:
+                update_tasks(
+                    processing_id,
+                    status=f"Preparing to create {total_concepts} audio files and videos...",
+                    total_audios=total_concepts,
+                    total_videos=total_concepts
+                )
+            run_narration_render_pipeline(processing_id, workspace, concepts, render_backend, total=total_concepts,
+                                          output_format=output_format)
         
         # Step 6: Finalizing (95-100%)
         update_tasks(processing_id, status="Finalizing your videos...", progress=95)
         
         # Get processed videos
-        videos = process_files([], saved_files)
+        _, videos = process_files([], saved_files, video_dir=workspace.output_dir)
         
         # Update processing status as complete with video data
+        job_store.update(processing_id, {"videos": [video.model_dump() for video in videos]})
         update_tasks(processing_id, status="Processing complete!", progress=100, complete=True)
-        processing_tasks[processing_id]["videos"] = videos
         
     except Exception as e:
         print(f"ERROR in processing task {processing_id}: {str(e)}")
@@ -530,360 +594,189 @@ def process_files_task(processing_id: str, saved_files: List[str]):
         return None
 
 
-def get_video_duration(video_path):
-    """Extract the actual duration of a video file in seconds"""
-    try:
-        clip = VideoFileClip(video_path)
-        duration = int(clip.duration)
-        clip.close()
-        return duration
-    except Exception as e:
-        print(f"Error getting duration for {video_path}: {e}")
-        return 60  # fallback duration
-
 # voicetts.py methods below
 
-class TextToSpeechRequest(BaseModel):
-    text: str
+def narration_cache_key(text):
+    """Audio cache key for a transcript under the current voice and TTS settings"""
+    return audio_cache_key(
+        text,
+        voice=voice_registry.style_key(VOICE_SAMPLE_PATH),
+        seed=TTS_SEED,
+        checkpoint=voice_registry.checkpoint_id,
+        profile=TTS_PROFILE,
+        style_mode=narration_style_mode,
+        phonemes=PHONEME_CACHE_MODE,
+        length_tolerance=TTS_LENGTH_TOLERANCE,
+        **TTS_PARAMS
+    )
 
-def text_to_speech(request: TextToSpeechRequest):
-    """
-    Convert text to speech using StyleTTS2
-    :param request: TextToSpeechRequest containing the text to convert
-    :return: Path to the generated audio file
-    """
-    try:
-        print(f"Converting text to speech with StyleTTS2: {request.text[:50]}...")
-        
-        # file_name = f"{uuid.uuid4()}.mp3"
-        file_name = f"{uuid.uuid4()}.wav"
-        file_path = os.path.join(MP3_DIR, file_name)
-        
-        # Generate audio using StyleTTS2
-        audio_output = tts_instance.inference(
-            text=request.text,
-            target_voice_path=VOICE_SAMPLE_PATH,
-            # output_wav_file="./backend/mp3s/test.wav",
-            output_wav_file=file_path,
-            alpha=0.4,  # Determines timbre of speech
-            beta=0.8,   # Determines prosody of speech
-            diffusion_steps=6,  # Higher = more diverse but slower
-            embedding_scale=2   # Higher = more emotional/expressive
-        )
-        
-        # Save the audio directly to a WAV file (StyleTTS2 outputs at 24kHz)
-        scipy.io.wavfile.write(file_path, rate=24000, data=audio_output)
-        
-        # Convert to MP3 if needed using ffmpeg
-        # try:
-        #     import subprocess
-        #     subprocess.run(['ffmpeg', '-i', temp_wav_path, '-codec:a', 'libmp3lame', '-qscale:a', '2', file_path], 
-        #                    check=True, capture_output=True)
-        #     os.remove(temp_wav_path)  # Clean up temp WAV file
-        # except (ImportError, subprocess.SubprocessError):
-        #     # Fallback: just rename the WAV file if ffmpeg fails
-        #     os.rename(temp_wav_path, file_path)
-        #     print("Warning: Could not convert to MP3, returning WAV file instead")
-        
-        return file_path
-    except Exception as e:
-        print(f"Error converting text to speech with StyleTTS2: {str(e)}")
-        # import traceback
-        # traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
-
-def add_tiktok_emphasis(text):
-    """Add TikTok-style emphasis to certain words"""
-    emphasis_patterns = [
-        (r'\b(never|always|every|all|none)\b', r'NEVER'),
-        (r'\b(amazing|awesome|incredible|terrible|horrible)\b', r'AMAZING'),
-        (r'\b(best|worst|most|least)\b', r'BEST'),
-        (r'\b(literally|actually|seriously|absolutely)\b', r'LITERALLY'),
-        (r'\b(wait|omg|wow|what|why|how|who)\b', r'WAIT')
-    ]
-    
-    # Randomly capitalize about 20% of emphasis candidates
-    for pattern, replacement in emphasis_patterns:
-        if random.random() < 0.2:  # 20% chance to apply emphasis
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                text = re.sub(r'\b' + re.escape(match) + r'\b', match.upper(), text, flags=re.IGNORECASE)
-    
-    return text
-
-def convert_transcription_to_subtitles(transcription, video_duration, words_per_chunk=3):
-    """Convert transcription text into timed subtitles based on video duration"""
-    # Clean up transcription
-    cleaned_text = re.sub(r'\s+', ' ', transcription).strip()
-    words = cleaned_text.split()
-    
-    if not words:
-        return []
-    
-    total_words = len(words)
-    subtitles = []
-    
-    # Calculate estimated time per word based on video duration
-    # This assumes that speech is relatively evenly distributed
-    time_per_word = video_duration / total_words
-    
-    # Create subtitle chunks with better timing estimates
-    for i in range(0, total_words, words_per_chunk):
-        chunk_words = words[i:i + words_per_chunk]
-        chunk_text = " ".join(chunk_words)
-        
-        # Calculate timing based on word position
-        start_time = i * time_per_word
-        end_time = min((i + len(chunk_words)) * time_per_word, video_duration)
-        
-        # Add emphasis to make it more TikTok-like
-        chunk_text = add_tiktok_emphasis(chunk_text)
-        
-        subtitles.append([start_time, end_time, chunk_text])
-    
-    return subtitles
-
-def create_tiktok_style_video(video_path, audio_path, subtitles, output_path):
-    print(f"Loading video from: {video_path}")
-    print(f"Loading audio from: {audio_path}")
-    print(f"Output path: {output_path}")
-    
-    # Ensure the output path is safe for ffmpeg
-    if ":" in output_path:
-        safe_output_path = output_path.replace(":", "_")
-        print(f"Sanitizing output path: {output_path} -> {safe_output_path}")
-        output_path = safe_output_path
-    
-    # Load video and audio
-    video = VideoFileClip(video_path)
-    audio = AudioFileClip(audio_path)
-    
-    # Make video loop if it's shorter than audio
-    if video.duration < audio.duration:
-        print(f"Video duration ({video.duration}s) is shorter than audio ({audio.duration}s). Creating looped video.")
-        # Calculate how many times we need to loop the video
-        repeat_count = int(audio.duration / video.duration) + 1
-        # Create a list of repeated video clips
-        video_clips = [video] * repeat_count
-        # Concatenate the clips
-        looped_video = concatenate_videoclips(video_clips)
-        # Now use the looped video
-        video = looped_video.subclipped(0, audio.duration)
-    else:
-        # If video is longer, just cut it to audio length
-        video = video.subclipped(0, audio.duration)
-     
-    # Set video audio to the provided audio file
-    video = video.with_audio(audio)
-    
-    # Create text clips with TikTok style
-    txt_clips = []
-    
-    for sub in subtitles:
-        start_time, end_time, text = sub
-        
-        # Skip if the subtitles go beyond video duration
-        if start_time >= video.duration:
-            continue
-            
-        # Adjust end_time if it exceeds video duration
-        end_time = min(end_time, video.duration)
-        
-        txt_clip = TextClip(
-            text=text,
-            font="arial",
-            font_size=70,
-            color='white',
-            stroke_color='black',
-            stroke_width=2,
-            method='caption',
-            size=(int(video.w*0.9), None),
-            bg_color=None,
-            horizontal_align='center',
-            vertical_align='center'
-        )
-        
-        txt_clip = txt_clip.with_position(('center', 'center'))
-        txt_clip = txt_clip.with_start(start_time).with_end(end_time)
-        txt_clips.append(txt_clip)
-    
-    # Combine everything
-    print("Creating final video with subtitles and audio...")
-    final_video = CompositeVideoClip([video] + txt_clips)
-    
-    # Write the output file
-    print(f"Rendering video to: {output_path}")
-    try:
-        # Use sanitized output path for writing
-        final_video.write_videofile(
-            output_path, 
-            fps=24, 
-            codec="libx264",
-            audio_codec="aac",
-            threads=4,
-            temp_audiofile=f"temp_audio_{uuid.uuid4()}.m4a"  # Use unique temp filename to avoid conflicts
-        )
-    except Exception as e:
-        # If there's still an error, try with even more sanitization
-        print(f"Error writing video file: {str(e)}")
-        sanitized_path = re.sub(r'[^\w\-_\. /\\]', '_', output_path)
-        print(f"Attempting again with fully sanitized path: {sanitized_path}")
-        final_video.write_videofile(
-            sanitized_path, 
-            fps=24, 
-            codec="libx264",
-            audio_codec="aac",
-            threads=4,
-            temp_audiofile=f"temp_audio_{uuid.uuid4()}.m4a"
-        )
-    
-    print(f"Video successfully saved to: {output_path}")
-    final_video.close()
-    video.close()
-    return output_path
-
-def get_supported_files(directory, extensions):
-    """Get list of files with specified extensions in a directory"""
-    files = []
-    for file in os.listdir(directory):
-        for ext in extensions:
-            if file.lower().endswith(ext.lower()):
-                files.append(os.path.join(directory, file))
-                break
-    return files
-
-def create_videos(audio_dir=DEFAULT_AUDIO_DIR, video_dir=DEFAULT_VIDEO_DIR, 
-                 output_dir=DEFAULT_OUTPUT_DIR):
+def narration_style_bank():
+    """Style bank for the narrator voice, or None when styles are sampled per segment"""
+    if TTS_STYLE_MODE != "bank":
+        return None
+    return voice_registry.get_style_bank(
+        VOICE_SAMPLE_PATH,
+        embedding_scale=TTS_PARAMS["embedding_scale"],
+        diffusion_steps=TTS_PARAMS["diffusion_steps"],
+        seed=TTS_SEED
+    )
+
+def synthesize_transcripts(texts, output_dir=MP3_DIR):
     """
-    Process audio and video files to create TikTok-style videos with subtitles.
+    Convert several transcripts to speech, batching every cache miss through StyleTTS2
     
-    Parameters:
-        audio_dir (str): Directory containing audio files
-        video_dir (str): Directory containing video files
-        output_dir (str): Directory to save output videos
+    Args:
+        texts (list[str]): Transcripts to narrate
+        output_dir (str): Directory to write the WAV files to
     
     Returns:
-        int: Number of videos processed
+        list[str]: Paths to the generated WAV files, in input order; each has a
+        word timings sidecar used to time the subtitles
     """
-    if not os.path.isdir(audio_dir):
-        print(f"Error: Audio directory '{audio_dir}' does not exist")
-        return 0
-    
-    if not os.path.isdir(video_dir):
-        print(f"Error: Video directory '{video_dir}' does not exist")
-        return 0
-    
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Created output directory: {output_dir}")
-    
-    transcripts_path = os.path.join("backend/uploads", "gemini_transcripts.json")
-    try:
-        with open(transcripts_path, 'r') as f:
-            transcripts = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: Transcript file not found at {transcripts_path}")
-        return 0
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON in transcript file at {transcripts_path}")
-        return 0
-    
-    audio_files = get_supported_files(audio_dir, ['.mp3', '.wav', '.m4a', '.flac', '.aac'])
-    video_files = get_supported_files(video_dir, ['.mp4', '.mov', '.avi', '.mkv', '.webm'])
-    
-    if not audio_files:
-        print(f"No audio files found in {audio_dir}")
-        return 0
-        
-    if not video_files:
-        print(f"No video files found in {video_dir}")
-        return 0
-    
-    print(f"Found {len(audio_files)} audio files and {len(video_files)} video files")
-    
-    # Process files
-    processed = 0
-    
-    # Create a mapping between audio filenames and their paths
-    audio_dict = {os.path.splitext(os.path.basename(f))[0]: f for f in audio_files}
-    
-    video_index = 0
-    
-    for audio_name, audio_path in audio_dict.items():
-        # Find the matching transcript by comparing with sanitized filename
-        transcript_text = None
-        for transcript_name, transcript_data in transcripts.items():
-            # Compare the sanitized transcript name with the audio filename
-            safe_transcript_name = transcript_name.replace(":", "_").replace("/", "_").replace("\\", "_").replace(" ", "_")
-            if safe_transcript_name == audio_name or transcript_name == audio_name:
-                if isinstance(transcript_data, dict) and "transcript" in transcript_data:
-                    transcript_text = transcript_data["transcript"]
-                    break
-        
-        if not transcript_text:
-            print(f"No transcript found for audio file: {audio_name}, skipping...")
-            continue
-            
-        # Select the next video file in sequence
-        video_path = video_files[video_index]
-        video_name = os.path.splitext(os.path.basename(video_path))[0]
-        
-        # video_index = (video_index + 1) % len(video_files)
-        video_index += 1
-        
-        output_filename = f"{audio_name}.mp4"
-        output_path = os.path.join(output_dir, output_filename)
-        
+    file_paths = [os.path.join(output_dir, f"{uuid.uuid4()}.wav") for _ in texts]
+    cache_keys = [narration_cache_key(text) for text in texts]
+    
+    # Serve repeated transcripts from the cache and only synthesize the rest
+    pending = []
+    for i, cache_key in enumerate(cache_keys):
+        if not audio_cache.copy_to(cache_key, file_paths[i]):
+            pending.append(i)
+    
+    print(f"TTS: {len(texts) - len(pending)}/{len(texts)} transcripts served from cache, synthesizing {len(pending)}")
+    
+    if pending:
+        tts_instance = tts_model.get()
+        ref_s = voice_registry.get_style(VOICE_SAMPLE_PATH)
+        style_bank = narration_style_bank()
+    
+    for start in range(0, len(pending), TTS_BATCH_SIZE):
+        batch = pending[start:start + TTS_BATCH_SIZE]
+        # Each segment is appended to its narration file as soon as it is decoded,
+        # so only the segments of the current round are ever held in memory
+        writers = [WavWriter(file_paths[i], sample_rate=24000) for i in batch]
+        words = [[] for _ in batch]
         try:
-            print(f"\nProcessing: Audio '{audio_name}' with Video '{video_name}'")
-            
-            audio = AudioFileClip(audio_path)
-            audio_duration = audio.duration
-            
-            subtitles = convert_transcription_to_subtitles(transcript_text, audio_duration, words_per_chunk=3)
-            
-            create_tiktok_style_video(video_path, audio_path, subtitles, output_path)
-            
-            audio.close()
-            
-            processed += 1
-            print(f"Processed {processed}/{len(audio_dict)} audio files")
-            
-        except Exception as e:
-            print(f"Error processing {audio_name}: {str(e)}")
-    
-    print(f"\nDone! {processed} TikTok-style videos were created in {output_dir}")
-    return processed
+            for position, waveform, segment_words in tts_instance.iter_batch_inference(
+                [texts[i] for i in batch],
+                ref_s,
+                max_batch_size=TTS_BATCH_SIZE,
+                seed=TTS_SEED,
+                return_word_timings=True,
+                style_bank=style_bank,
+                **TTS_PARAMS
+            ):
+                writers[position].write(waveform)
+                words[position].extend(segment_words)
+        finally:
+            for writer in writers:
+                writer.close()
+        for i, narration_words in zip(batch, words):
+            save_word_timings(file_paths[i], narration_words)
+            audio_cache.put_file(cache_keys[i], file_paths[i])
+    
+    if pending:
+        phoneme_stats = phoneme_cache.stats()
+        print(f"TTS: phoneme cache {phoneme_stats['sentenceHitRate']:.0%} sentence / "
+              f"{phoneme_stats['wordHitRate']:.0%} word hit rate")
+    return file_paths
+
+background_libraries = {}
+
+render_pool = None
+render_pool_lock = threading.Lock()
+
+def get_render_pool():
+    """Render worker processes, started on first use and shared by every job"""
+    global render_pool
+    with render_pool_lock:
+        if render_pool is None:
+            # Every render stage that may run at once gets RENDER_WORKERS processes
+            render_pool = ProcessPoolExecutor(
+                max_workers=STAGE_CONCURRENCY["render"] * RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return render_pool
+
+def submit_render_task(*args):
+    """Queue a render_video call on the shared pool, replacing the pool if a worker died"""
+    global render_pool
+    pool = get_render_pool()
+    try:
+        return pool.submit(render_video, *args)
+    except BrokenProcessPool:
+        with render_pool_lock:
+            if render_pool is pool:
+                render_pool = None
+        return get_render_pool().submit(render_video, *args)
+
+def index_rendered_video(future):
+    """Done callback of a render task: index the finished video right away so listings never have to probe it"""
+    if future.exception() is None:
+        video_index.record(future.result())
+
+def get_background_library(video_dir):
+    """Shared BackgroundLibrary for a source directory of background videos"""
+    if video_dir not in background_libraries:
+        width, height = (int(v) for v in BACKGROUND_SIZE.split("x"))
+        background_libraries[video_dir] = BackgroundLibrary(video_dir, BACKGROUND_LIBRARY_DIR, width=width, height=height)
+    return background_libraries[video_dir]
 
 @app.post("/api/process-materials", response_model=dict)
 async def process_materials(
-    background_tasks: BackgroundTasks,
-    material_files: List[UploadFile] = File(...)
+    material_files: List[UploadFile] = File(...),
+    render_backend: str = Form(RENDER_BACKEND),
+    output_format: str = Form(OUTPUT_FORMAT)
 ):
+    if render_backend not in RENDER_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown render backend: {render_backend}")
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown output format: {output_format}")
+    
     # Generate a processing ID
     processing_id = str(uuid.uuid4())
     
-    # Save material files
+    # Stream material files into the blob store and link them into this job's own workspace
+    workspace = JobWorkspace(JOBS_DIR, PROCESSED_VIDEOS_DIR, processing_id).create()
     saved_material_files = []
-    for file in material_files:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        saved_material_files.append(file_path)
+    uploads = []
+    total_bytes = 0
+    try:
+        for file in material_files:
+            remaining = MAX_JOB_UPLOAD_BYTES - total_bytes
+            digest, size, existed = await blob_store.ingest(file, max_bytes=min(MAX_UPLOAD_BYTES, remaining))
+            total_bytes += size
+            
+            file_name = sanitize_filename(file.filename)
+            stem, extension = os.path.splitext(file_name)
+            counter = 1
+            while os.path.exists(os.path.join(workspace.upload_dir, file_name)):
+                counter += 1
+                file_name = f"{stem}_{counter}{extension}"
+            file_path = blob_store.link(digest, os.path.join(workspace.upload_dir, file_name))
+            
+            saved_material_files.append(file_path)
+            uploads.append({"name": file_name, "sha256": digest, "size": size, "deduplicated": existed})
+            print(f"Stored upload {file_name} ({size} bytes, sha256 {digest[:12]}{', already stored' if existed else ''})")
+    except UploadTooLarge as e:
+        workspace.remove_intermediate()
+        shutil.rmtree(workspace.output_dir, ignore_errors=True)
+        raise HTTPException(status_code=413, detail=str(e))
     
     # Initialize processing task
-    processing_tasks[processing_id] = {
+    job_store.create(processing_id, {
         "processingId": processing_id,
         "startTime": time.time(),
         "files": saved_material_files,
+        "uploads": uploads,
         "progress": 0,
         "status": "Initializing...",
+        "renderBackend": render_backend,
+        "outputFormat": output_format,
         "complete": False
-    }
+    })
     
-    # Start background task to process files
-    background_tasks.add_task(process_files_task, processing_id, saved_material_files)
+    # Queue the job; the scheduler runs several jobs at once with per-stage limits
+    job_scheduler.submit(process_files_task, processing_id, saved_material_files, render_backend, output_format)
     
     return {"processingId": processing_id}
 
@@ -892,30 +785,89 @@ async def get_processing_status(processing_id: str):
     """
     Get the status of a processing task
     """
-    if processing_id not in processing_tasks:
+    job = job_store.get(processing_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Processing task not found")
+    
+    return job
+@app.get("/api/processing-events/{processing_id}")
+async def processing_events(processing_id: str, request: Request):
+    """
+    Stream progress of a processing task as Server-Sent Events
+    
+    Sends a compact "snapshot" event on connect, then "update" events with only
+    the fields that changed. The stream ends once the task is complete.
+    """
+    if not job_store.exists(processing_id):
         raise HTTPException(status_code=404, detail="Processing task not found")
     
-    return processing_tasks[processing_id]
+    return StreamingResponse(
+        job_event_stream(job_store, progress_broker, processing_id, request.is_disconnected,
+                         poll_interval=PROGRESS_POLL_INTERVAL),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/videos", response_model=List[Video])
-async def list_videos():
+async def list_videos(response: Response, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1, le=1000)):
     """
     List all available processed videos
+    
+    Supports pagination with offset/limit; the total count is returned in the
+    X-Total-Count header. The index is read in a worker thread so probing new
+    files never blocks the event loop.
     """
-    return process_files([], [])
+    total, videos = await run_in_threadpool(process_files, [], [], offset=offset, limit=limit)
+    response.headers["X-Total-Count"] = str(total)
+    return videos
+
+@app.on_event("startup")
+async def warm_up_models():
+    # Only the served app builds its services and loads the model; processes that merely import this module don't
+    init_services()
+    # Fails jobs left unfinished by a previous run (or a dead worker) and keeps this worker's jobs alive
+    job_store.start_heartbeat(JOB_HEARTBEAT_INTERVAL, JOB_STALE_AFTER)
+    tts_model.start()
+
+@app.on_event("shutdown")
+def save_caches():
+    # Running jobs finish (and keep heartbeating) before the pools they use go away; queued jobs
+    # are dropped and marked interrupted by the next server's orphan sweep
+    job_scheduler.shutdown(cancel_pending=True)
+    text_extractor.shutdown()
+    if render_pool is not None:
+        render_pool.shutdown()
+    job_store.stop_heartbeat()
+    phoneme_cache.save()
 
 @app.get("/api/health")
 async def health_check():
+    """Liveness: the server is up, whether or not the models have loaded"""
     return {"status": "healthy"}
 
+@app.get("/api/ready")
+async def readiness_check(response: Response):
+    """Readiness: 200 once the TTS model can synthesize, 503 while it is loading or if it failed"""
+    status = tts_model.status()
+    if status["state"] != "ready":
+        response.status_code = 503
+    return {"status": status["state"], "models": [status]}
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Hit rates of the narration audio cache and the TTS phoneme cache"""
+    return {"audio": audio_cache.stats(), "phonemes": phoneme_cache.stats()}
+
 @app.post("/api/cleanup")
 async def cleanup_directories():
-    """Clean up temporary directories: uploads, mp3s, and output_videos"""
+    """Clean up temporary directories (uploads, mp3s, job workspaces, output_videos) and unused upload blobs"""
     print("Cleaning up directories...")
     try:
         # Get directories to clean up
         directories = [
             "./backend/uploads",
             "./backend/mp3s",
+            JOBS_DIR,
             "output_videos"
         ]
         
@@ -931,6 +883,11 @@ async def cleanup_directories():
                             shutil.rmtree(file)
                     except Exception as e:
                         print(f"Error removing {file}: {e}")
+
+        # Workspaces held the blobs' other links, so blobs they used are now unreferenced
+        removed, freed = blob_store.collect_garbage(BLOB_MAX_IDLE_SECONDS)
+        if removed:
+            print(f"Removed {removed} unused upload blobs ({freed // (1024 * 1024)} MB)")
         
         return {"status": "success", "message": "Directories cleaned up successfully"}
     except Exception as e:
@@ -940,5 +897,9 @@ if __name__ == "__main__":
     # uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
     print("Starting web server")
     # uvicorn.run("main:app", host="0.0.0.0", port=8000)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if API_WORKERS > 1:
+        # Several workers can serve one port because job state lives in the shared database
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
     print("Ended web server")
\ No newline at end of file
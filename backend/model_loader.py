@@ -0,0 +1,97 @@
+"""
+Background loading for models that are too slow to load at import time.
+
+Loading StyleTTS2 (and downloading the default checkpoint on first run) used
+to happen while main.py was imported, so the server accepted no requests
+until it finished, and every process that imported main.py paid for it.
+``BackgroundModel`` starts the load in a daemon thread when the app starts;
+callers that need the model wait for it, everything else (listing videos,
+uploads, cached narrations) is served right away. The load state is reported
+by the /api/ready probe.
+"""
+import threading
+import time
+
+
+class ModelNotReady(Exception):
+    """Raised when a model is still loading after the caller's timeout, or failed to load"""
+
+
+class BackgroundModel:
+    """
+    A model loaded once in a background thread.
+
+    Args:
+        name (str): Name used in logs and status reports
+        factory (callable): Builds and returns the model; called once
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self._model = None
+        self._error = None
+        self._started_at = None
+        self._load_seconds = None
+        self._loaded = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start loading if it hasn't started yet; returns immediately"""
+        with self._lock:
+            if self._started_at is not None:
+                return
+            self._started_at = time.time()
+        threading.Thread(target=self._load, name=f"{self.name}-warmup", daemon=True).start()
+
+    def _load(self):
+        print(f"{self.name}: loading in the background...")
+        try:
+            self._model = self.factory()
+            self._load_seconds = time.time() - self._started_at
+            print(f"{self.name}: ready after {self._load_seconds:.1f}s")
+        except Exception as e:
+            self._error = e
+            print(f"{self.name}: failed to load: {e}")
+        finally:
+            self._loaded.set()
+
+    @property
+    def ready(self):
+        return self._model is not None
+
+    def get(self, timeout=None):
+        """
+        Return the model, starting the load if needed and waiting for it.
+
+        Args:
+            timeout (float): Seconds to wait (None waits until the load finishes)
+
+        Raises:
+            ModelNotReady: If the model is still loading after timeout seconds, or failed to load
+        """
+        self.start()
+        if not self._loaded.wait(timeout):
+            raise ModelNotReady(f"{self.name} is still loading")
+        if self._error is not None:
+            raise ModelNotReady(f"{self.name} failed to load: {self._error}")
+        return self._model
+
+    def status(self):
+        """Load state for the readiness probe"""
+        if self._started_at is None:
+            state = "idle"
+        elif not self._loaded.is_set():
+            state = "loading"
+        elif self._error is not None:
+            state = "failed"
+        else:
+            state = "ready"
+        status = {"name": self.name, "state": state}
+        if state == "loading":
+            status["elapsedSeconds"] = round(time.time() - self._started_at, 1)
+        if self._load_seconds is not None:
+            status["loadSeconds"] = round(self._load_seconds, 1)
+        if self._error is not None:
+            status["error"] = str(self._error)
+        return status
@@ -0,0 +1,209 @@
+"""
+Memo cache for the StyleTTS2 text front-end.
+
+Every synthesized segment is phonemized with gruut and re-tokenized with
+NLTK before it reaches the model. Course material repeats the same sentences
+and technical terms across transcripts and jobs, so the resulting phoneme
+strings are cached:
+
+- sentence level (always on): segments are split into sentences and each
+  sentence's phoneme string is cached. Gruut phonemizes sentence by sentence
+  anyway, so the output is the same as phonemizing the whole segment, as
+  long as the split matches gruut's. Boundaries are only trusted when they
+  are unambiguous (see split_sentences); otherwise the whole segment is
+  phonemized and cached as one unit.
+- word level (optional): sentences are built from per-word phoneme strings,
+  so a new sentence made of known words needs no gruut call at all. Words
+  are phonemized without their sentence context, which loses gruut's
+  part-of-speech based choice for heteronyms ("read", "lead"), so this is
+  opt-in and changes the audio cache key.
+
+Both levels are LRU-bounded and can be persisted to a JSON file so later
+runs and other workers start warm.
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+PHONEME_MODES = ("sentences", "words")
+
+# Bump when the cached strings change format so persisted entries are dropped
+PHONEME_CACHE_VERSION = 1
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Words ending in a period that usually don't end a sentence
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "no", "fig", "eq", "vol", "ch", "sec",
+    "approx", "dept", "est", "inc", "ltd", "co", "corp", "jan", "feb", "mar", "apr", "jun", "jul", "aug",
+    "sep", "sept", "oct", "nov", "dec", "mt", "ft", "al",
+}
+
+
+def _is_sentence_end(previous, following):
+    """Whether a boundary between two sentences is certain to be one for gruut too"""
+    word = previous.rsplit(' ', 1)[-1]
+    if not following[:1].isupper():
+        return False
+    if word.endswith(('!', '?')):
+        return True
+    stem = word.rstrip('.')
+    # Initials, numbers, "e.g.", "U.S." and known abbreviations may not end a sentence
+    return stem.isalpha() and len(stem) > 1 and stem.lower() not in ABBREVIATIONS
+
+
+def split_sentences(text):
+    """
+    Split text into sentences, or not at all when any boundary is uncertain.
+
+    A boundary is only trusted when the sentence before it ends in a plain
+    word (no initials, numbers, abbreviations or internal periods) and the
+    next sentence starts with an uppercase letter. Otherwise the whole text
+    is returned as one unit, so caching never changes the phonemes.
+
+    Args:
+        text (str): Whitespace-normalized text
+
+    Returns:
+        list[str]: Non-empty sentences
+    """
+    sentences = [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence]
+    if all(_is_sentence_end(previous, following) for previous, following in zip(sentences, sentences[1:])):
+        return sentences
+    return [text] if text else []
+
+
+class PhonemeCache:
+    """
+    LRU caches of phoneme strings per sentence and per word.
+
+    Args:
+        max_sentences (int): Sentences kept in memory
+        max_words (int): Words kept in memory
+        word_level (bool): Build sentences from cached per-word phonemes
+        persist_path (str): Optional JSON file the caches are loaded from and saved to
+        save_every (int): Save after this many new entries (when persisted)
+    """
+
+    def __init__(self, max_sentences=20000, max_words=50000, word_level=False, persist_path=None, save_every=500):
+        self.max_sentences = max_sentences
+        self.max_words = max_words
+        self.word_level = word_level
+        self.persist_path = persist_path
+        self.save_every = save_every
+        self.sentence_hits = 0
+        self.sentence_misses = 0
+        self.word_hits = 0
+        self.word_misses = 0
+        self._sentences = OrderedDict()
+        self._words = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if persist_path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.persist_path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"TTS: Ignoring unreadable phoneme cache {self.persist_path}: {e}")
+            return
+        if data.get("version") != PHONEME_CACHE_VERSION:
+            return
+        self._words.update(list(data.get("words", {}).items())[-self.max_words:])
+        # Sentences built from words differ from whole-sentence phonemization; only reuse matching ones
+        if data.get("wordLevel") == self.word_level:
+            self._sentences.update(list(data.get("sentences", {}).items())[-self.max_sentences:])
+        print(f"TTS: Loaded {len(self._sentences)} sentences and {len(self._words)} words into the phoneme cache")
+
+    def save(self):
+        """Write the caches to persist_path (no-op when not persisted)"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            data = {
+                "version": PHONEME_CACHE_VERSION,
+                "wordLevel": self.word_level,
+                "sentences": dict(self._sentences),
+                "words": dict(self._words),
+            }
+            self._unsaved = 0
+        tmp_path = f"{self.persist_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.persist_path)
+
+    def _get(self, level, entries, key):
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+                setattr(self, f"{level}_hits", getattr(self, f"{level}_hits") + 1)
+            else:
+                setattr(self, f"{level}_misses", getattr(self, f"{level}_misses") + 1)
+            return value
+
+    def _put(self, entries, key, value, max_entries):
+        with self._lock:
+            entries[key] = value
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+            self._unsaved += 1
+            due = self.persist_path and self._unsaved >= self.save_every
+        if due:
+            self.save()
+
+    def _word(self, word, phonemize):
+        value = self._get("word", self._words, word)
+        if value is not None:
+            return value
+        value = phonemize(word)
+        self._put(self._words, word, value, self.max_words)
+        return value
+
+    def _sentence(self, sentence, phonemize):
+        value = self._get("sentence", self._sentences, sentence)
+        if value is not None:
+            return value
+        if self.word_level:
+            value = ' '.join(filter(None, (self._word(word, phonemize) for word in sentence.split(' '))))
+        else:
+            value = phonemize(sentence)
+        self._put(self._sentences, sentence, value, self.max_sentences)
+        return value
+
+    def phonemize(self, text, phonemize):
+        """
+        Phoneme string for some text, computed with phonemize only for uncached parts.
+
+        Args:
+            text (str): Text to convert
+            phonemize (callable): Uncached text -> phoneme string conversion
+
+        Returns:
+            str: Space-separated phoneme string
+        """
+        sentences = split_sentences(re.sub(r'\s+', ' ', text).strip())
+        return ' '.join(filter(None, (self._sentence(sentence, phonemize) for sentence in sentences)))
+
+    def stats(self):
+        """Hit/miss counters and sizes, for logging and status reporting"""
+        with self._lock:
+            sentence_lookups = self.sentence_hits + self.sentence_misses
+            word_lookups = self.word_hits + self.word_misses
+            return {
+                "wordLevel": self.word_level,
+                "sentenceHits": self.sentence_hits,
+                "sentenceMisses": self.sentence_misses,
+                "sentenceHitRate": self.sentence_hits / sentence_lookups if sentence_lookups else 0.0,
+                "wordHits": self.word_hits,
+                "wordMisses": self.word_misses,
+                "wordHitRate": self.word_hits / word_lookups if word_lookups else 0.0,
+                "sentences": len(self._sentences),
+                "words": len(self._words),
+            }
@@ -0,0 +1,185 @@
+"""
+Producer/consumer pipeline that overlaps narration with rendering.
+
+TTS is bound by the model and rendering by the video encoder, so running them
+in strict phases leaves one resource idle at a time. Here a producer thread
+narrates transcripts in small batches and hands each finished narration to the
+render side through a bounded queue; renders start as soon as a narration and
+a render slot are available. The queue bound applies backpressure so TTS never
+runs far ahead of rendering.
+"""
+import queue
+import threading
+import time
+from contextlib import ExitStack
+
+_DONE = object()
+
+
+class PipelineStats:
+    """Counters and busy time per stage, reported in the job status"""
+
+    def __init__(self, render_slots):
+        self.render_slots = render_slots
+        self.started = time.time()
+        self.narrated = 0
+        self.rendered = 0
+        self.failed = 0
+        self.tts_busy = 0.0
+        self.render_busy = 0.0
+        self.lock = threading.Lock()
+
+    def snapshot(self, queue_depth):
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-6)
+            return {
+                "queueDepth": queue_depth,
+                "narrated": self.narrated,
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "ttsUtilization": round(min(self.tts_busy / elapsed, 1.0), 3),
+                "renderUtilization": round(min(self.render_busy / (elapsed * self.render_slots), 1.0), 3),
+            }
+
+
+class NarrationRenderPipeline:
+    """
+    Narrate items in batches on a producer thread and render them as they arrive.
+
+    Args:
+        narrate (callable): narrate(list of items) -> list of narrated results
+        submit_render (callable): submit_render(result) -> concurrent.futures.Future
+        render_slots (int): Renders allowed in flight at once
+        queue_size (int): Narrations allowed to wait for a render slot
+        batch_size (int): Most items narrated per call to narrate
+        on_update (callable): on_update(event, result, stats_snapshot) after each narration/render
+    """
+
+    def __init__(self, narrate, submit_render, render_slots=1, queue_size=2, batch_size=1, on_update=None):
+        self.narrate = narrate
+        self.submit_render = submit_render
+        self.render_slots = max(1, render_slots)
+        self.batch_size = max(1, batch_size)
+        self.on_update = on_update
+        self.stats = PipelineStats(self.render_slots)
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._producer_error = None
+        self._stop = threading.Event()
+
+    def _notify(self, event, result):
+        if self.on_update:
+            self.on_update(event, result, self.stats.snapshot(self._queue.qsize()))
+
+    def _feed(self, items, inbox):
+        """Move items into the inbox as the (possibly slow) iterable yields them"""
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    break
+                inbox.put(item)
+        except Exception as e:
+            self._producer_error = e
+        finally:
+            inbox.put(_DONE)
+
+    def _produce(self, items):
+        inbox = queue.Queue()
+        feeder = threading.Thread(target=self._feed, args=(items, inbox), name="pipeline-feed", daemon=True)
+        feeder.start()
+        try:
+            done = False
+            while not done:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                batch = [item]
+                # Batch whatever else is already available instead of waiting for a full batch,
+                # so streamed items start narrating as soon as they arrive
+                while len(batch) < self.batch_size:
+                    try:
+                        item = inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        done = True
+                        break
+                    batch.append(item)
+                self._narrate_batch(batch)
+        except Exception as e:
+            self._producer_error = e
+            self._stop.set()
+        finally:
+            self._queue.put(_DONE)
+
+    def _narrate_batch(self, batch):
+        start = time.time()
+        results = self.narrate(batch)
+        with self.stats.lock:
+            self.stats.tts_busy += time.time() - start
+            self.stats.narrated += len(results)
+        for result in results:
+            # Blocks while the queue is full, so TTS waits for rendering to catch up
+            self._queue.put(result)
+            self._notify("narrated", result)
+
+    def run(self, items, render_stage=None):
+        """
+        Process every item and block until all renders have finished.
+
+        Args:
+            items (iterable): Work items; may be a generator that yields as items become available
+            render_stage: Optional context manager held while renders are in flight
+
+        Returns:
+            list: (result, output) for every successful render, in completion order
+        """
+        producer = threading.Thread(target=self._produce, args=(items,), name="pipeline-tts", daemon=True)
+        producer.start()
+
+        slots = threading.BoundedSemaphore(self.render_slots)
+        completed = []
+
+        def on_render_done(future, result, start):
+            with self.stats.lock:
+                self.stats.render_busy += time.time() - start
+                if future.exception() is None:
+                    self.stats.rendered += 1
+                    completed.append((result, future.result()))
+                else:
+                    self.stats.failed += 1
+                    print(f"Error rendering {result}: {future.exception()}")
+            slots.release()
+            self._notify("rendered" if future.exception() is None else "failed", result)
+
+        stage_entered = False
+        with ExitStack() as stack:
+            while True:
+                # Take a render slot before dequeuing so waiting narrations stay visible as queue depth
+                slots.acquire()
+                result = self._queue.get()
+                if result is _DONE:
+                    slots.release()
+                    break
+                if render_stage is not None and not stage_entered:
+                    stack.enter_context(render_stage)
+                    stage_entered = True
+                start = time.time()
+                try:
+                    future = self.submit_render(result)
+                except Exception as e:
+                    print(f"Error starting render for {result}: {e}")
+                    with self.stats.lock:
+                        self.stats.failed += 1
+                    slots.release()
+                    self._notify("failed", result)
+                    continue
+                future.add_done_callback(lambda f, result=result, start=start: on_render_done(f, result, start))
+
+            # Wait for the renders still in flight; every done callback returns its slot
+            for _ in range(self.render_slots):
+                slots.acquire()
+
+        producer.join()
+        if self._producer_error is not None:
+            raise self._producer_error
+        return completed
@@ -0,0 +1,155 @@
+"""
+Poster frames and hover-preview sprite sheets for rendered videos.
+
+Both are captured from frames the render already produces, so no extra
+decode pass is needed: the MoviePy backend samples frames as they are
+written, and the ffmpeg backend splits its filter graph into extra image
+outputs. Every video gets three files next to it:
+
+    <name>.jpg            poster frame
+    <name>_sprite.jpg     grid of small frames sampled evenly over the video
+    <name>_preview.json   sprite layout, read by the video index
+"""
+import json
+import os
+
+from PIL import Image
+
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 5
+SPRITE_TILE_WIDTH = 120   # Each tile is 120px wide; height follows the video's aspect ratio
+POSTER_WIDTH = 540
+POSTER_TIME = 1.0         # Seconds into the video for the poster, once the first caption is on screen
+
+
+def preview_paths(video_path):
+    """Return (poster, sprite, manifest) paths for a video"""
+    base = os.path.splitext(video_path)[0]
+    return f"{base}.jpg", f"{base}_sprite.jpg", f"{base}_preview.json"
+
+
+def _even(value):
+    return max(2, int(round(value / 2)) * 2)
+
+
+def preview_layout(duration, width, height, columns=SPRITE_COLUMNS, rows=SPRITE_ROWS):
+    """
+    Work out sample times and image sizes for a video.
+
+    Returns:
+        dict: Sprite layout as stored in the manifest, plus poster size and time
+    """
+    frames = columns * rows
+    return {
+        "columns": columns,
+        "rows": rows,
+        "frames": frames,
+        "interval": duration / frames if duration > 0 else 0.0,
+        "tileWidth": SPRITE_TILE_WIDTH,
+        "tileHeight": _even(SPRITE_TILE_WIDTH * height / width),
+        "posterWidth": POSTER_WIDTH,
+        "posterHeight": _even(POSTER_WIDTH * height / width),
+        "posterTime": min(POSTER_TIME, duration / 2),
+    }
+
+
+def write_manifest(video_path, layout):
+    """Record the sprite layout next to the video; the image paths are stored relative to it"""
+    poster_path, sprite_path, manifest_path = preview_paths(video_path)
+    manifest = {
+        "poster": os.path.basename(poster_path),
+        "sprite": os.path.basename(sprite_path),
+        "columns": layout["columns"],
+        "rows": layout["rows"],
+        "frames": layout["frames"],
+        "interval": round(layout["interval"], 3),
+        "tileWidth": layout["tileWidth"],
+        "tileHeight": layout["tileHeight"],
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def load_manifest(video_path):
+    """Return the preview manifest of a video, or None if it has no previews"""
+    poster_path, sprite_path, manifest_path = preview_paths(video_path)
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not os.path.exists(poster_path) or not os.path.exists(sprite_path):
+        return None
+    return manifest
+
+
+class PreviewCollector:
+    """
+    Collect the poster and sprite frames while MoviePy writes a video.
+
+    Wrap the final clip with ``clip.transform(collector.frame_filter)``; every
+    frame passes through unchanged and the ones at sample times are kept as
+    downscaled images.
+    """
+
+    def __init__(self, duration, width, height):
+        self.layout = preview_layout(duration, width, height)
+        self.tiles = [None] * self.layout["frames"]
+        self.poster = None
+
+    def frame_filter(self, get_frame, t):
+        frame = get_frame(t)
+        interval = self.layout["interval"]
+        index = min(int(t / interval), len(self.tiles) - 1) if interval > 0 else 0
+        if self.tiles[index] is None:
+            self.tiles[index] = Image.fromarray(frame[:, :, :3]).resize(
+                (self.layout["tileWidth"], self.layout["tileHeight"]), Image.BILINEAR)
+        if self.poster is None and t >= self.layout["posterTime"]:
+            self.poster = Image.fromarray(frame[:, :, :3]).resize(
+                (self.layout["posterWidth"], self.layout["posterHeight"]), Image.LANCZOS)
+        return frame
+
+    def save(self, video_path):
+        """Write the poster, sprite sheet and manifest for the finished video"""
+        poster_path, sprite_path, _ = preview_paths(video_path)
+        columns, tile_width, tile_height = self.layout["columns"], self.layout["tileWidth"], self.layout["tileHeight"]
+        sprite = Image.new("RGB", (columns * tile_width, self.layout["rows"] * tile_height))
+        for index, tile in enumerate(self.tiles):
+            if tile is not None:
+                sprite.paste(tile, ((index % columns) * tile_width, (index // columns) * tile_height))
+        sprite.save(sprite_path, quality=70)
+
+        poster = self.poster or next((tile for tile in self.tiles if tile is not None), None)
+        if poster is not None:
+            poster.save(poster_path, quality=80)
+        return write_manifest(video_path, self.layout)
+
+
+def ffmpeg_preview_outputs(video_label, video_path, layout):
+    """
+    Extra filter graph and outputs that make ffmpeg write the previews in the render pass.
+
+    Args:
+        video_label (str): Filter graph label of the final video stream, e.g. "v"
+        video_path (str): Output video path the preview paths are derived from
+        layout (dict): Result of preview_layout
+
+    Returns:
+        tuple[str, str, list[str]]: Filter graph suffix that splits the stream,
+        the label to map for the video output, and the extra output arguments
+    """
+    poster_path, sprite_path, _ = preview_paths(video_path)
+    frames_per_second = 1 / layout["interval"] if layout["interval"] > 0 else 1
+    graph = (
+        f";[{video_label}]split=3[{video_label}_out][{video_label}_poster][{video_label}_sprite]"
+        f";[{video_label}_poster]trim=start={layout['posterTime']:.3f},setpts=PTS-STARTPTS,"
+        f"scale={layout['posterWidth']}:{layout['posterHeight']}[poster]"
+        f";[{video_label}_sprite]fps={frames_per_second:.6f},scale={layout['tileWidth']}:{layout['tileHeight']},"
+        f"tile={layout['columns']}x{layout['rows']}[sprite]"
+    )
+    outputs = [
+        "-map", "[poster]", "-frames:v", "1", "-q:v", "3", poster_path,
+        "-map", "[sprite]", "-frames:v", "1", "-q:v", "5", sprite_path,
+    ]
+    return graph, f"{video_label}_out", outputs
@@ -0,0 +1,132 @@
+"""
+Push-based job progress over Server-Sent Events.
+
+Instead of clients polling the full job document (transcripts, filename
+mapping and all), a client opens one event stream per job. It receives a
+compact snapshot on connect and afterwards only the fields that changed.
+
+update_tasks notifies the broker, which wakes the streams of that job in
+this process. Jobs can run in another API worker process, so streams also
+re-check the job store on a short interval; either way the job store is the
+source of truth and the delta is computed against what this client was last
+sent.
+"""
+import asyncio
+import json
+import threading
+
+# Large fields that progress displays don't need; fetch /api/processing-status for them
+EXCLUDED_FIELDS = {"Transcripts", "filename_mapping", "files", "uploads"}
+
+_MISSING = object()
+
+
+def compact_job(job):
+    """Return the job fields that are sent over the event stream"""
+    return {key: value for key, value in job.items() if key not in EXCLUDED_FIELDS}
+
+
+def changed_fields(previous, current):
+    """Fields of current whose value differs from previous (or that previous lacks)"""
+    return {key: value for key, value in current.items() if previous.get(key, _MISSING) != value}
+
+
+def format_event(event, data, event_id=None):
+    """Serialize one SSE message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class ProgressBroker:
+    """Wakes the event streams of a job when its state changes in this process"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, processing_id):
+        """
+        Register a stream; must be called from the event loop that will wait on it.
+
+        Returns:
+            asyncio.Event: Set whenever the job is updated
+        """
+        wake = asyncio.Event()
+        with self._lock:
+            self._subscribers.setdefault(processing_id, set()).add((asyncio.get_running_loop(), wake))
+        return wake
+
+    def unsubscribe(self, processing_id, wake):
+        with self._lock:
+            subscribers = self._subscribers.get(processing_id, set())
+            subscribers = {entry for entry in subscribers if entry[1] is not wake}
+            if subscribers:
+                self._subscribers[processing_id] = subscribers
+            else:
+                self._subscribers.pop(processing_id, None)
+
+    def notify(self, processing_id):
+        """Wake every stream of the job; safe to call from any thread"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(processing_id, ()))
+        for loop, wake in subscribers:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # The stream's event loop has shut down
+                pass
+
+
+async def job_event_stream(job_store, broker, processing_id, is_disconnected, poll_interval=1.0, keepalive=15.0):
+    """
+    Yield SSE messages for a job until it completes or the client disconnects.
+
+    The first message is a "snapshot" with every compact field; later
+    "update" messages carry only the fields that changed.
+
+    Args:
+        job_store (JobStore): Store holding the job
+        broker (ProgressBroker): Wakes the stream on in-process updates
+        processing_id (str): Job to follow
+        is_disconnected (callable): Coroutine function returning True once the client is gone
+        poll_interval (float): Seconds between store checks without a notification
+        keepalive (float): Seconds between comment lines that keep proxies from closing the stream
+    """
+    wake = broker.subscribe(processing_id)
+    loop = asyncio.get_running_loop()
+    try:
+        sent = None
+        version = 0.0
+        event_id = 0
+        idle = 0.0
+        while True:
+            # Clear before reading so an update landing during the read wakes the next wait
+            wake.clear()
+            updated_at, job = await loop.run_in_executor(None, job_store.get_if_updated, processing_id, version)
+            if job is not None:
+                version = updated_at
+                current = compact_job(job)
+                delta = current if sent is None else changed_fields(sent, current)
+                if delta:
+                    event_id += 1
+                    yield format_event("snapshot" if sent is None else "update", delta, event_id)
+                    idle = 0.0
+                sent = current
+                if current.get("complete"):
+                    return
+
+            if await is_disconnected():
+                return
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                idle += poll_interval
+                if idle >= keepalive:
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(processing_id, wake)
@@ -0,0 +1,50 @@
+"""
+Job scheduler with per-stage concurrency limits.
+
+Several jobs run at once, but each pipeline stage has its own limit: LLM
+calls are bounded by API quotas, TTS by the single shared model, and
+rendering by CPU cores. A job waits only for the stage it is entering, so
+one job can render while another is generating transcripts.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class JobScheduler:
+    """
+    Run processing jobs concurrently with bounded stages.
+
+    Args:
+        max_jobs (int): Maximum number of jobs in flight
+        stage_limits (dict): Maximum concurrent jobs per stage name, e.g. {"llm": 2, "tts": 1}
+    """
+
+    def __init__(self, max_jobs, stage_limits):
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+        self._stages = {name: threading.BoundedSemaphore(limit) for name, limit in stage_limits.items()}
+        self.stage_limits = dict(stage_limits)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a job; it starts as soon as a job slot is free"""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    @contextmanager
+    def stage(self, name):
+        """Hold one of the stage's slots for the duration of the block"""
+        semaphore = self._stages[name]
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stop accepting jobs.
+
+        Args:
+            wait (bool): Block until running jobs have finished
+            cancel_pending (bool): Drop jobs that are still waiting for a slot
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
@@ -0,0 +1,48 @@
+"""
+Static file serving for rendered videos and their previews.
+
+Starlette's StaticFiles derives its ETag from mtime and size but sends no
+Cache-Control, so browsers and CDNs revalidate or refetch on every view.
+CachedStaticFiles sends a strong ETag and a Cache-Control policy per file
+type: playlists and manifests are always revalidated, media and images are
+cached and revalidated cheaply with If-None-Match.
+"""
+import os
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+CACHE_CONTROL = {
+    ".m3u8": "no-cache",
+    ".json": "no-cache",
+    ".ts": "public, max-age=86400",
+    ".mp4": "public, max-age=86400",
+    ".jpg": "public, max-age=86400",
+}
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+
+def strong_etag(stat_result):
+    """
+    ETag from inode, size and nanosecond mtime.
+
+    Rendered files are never modified in place; a re-render replaces the
+    file, which changes its size or mtime, so these identify the exact bytes.
+    """
+    return f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with strong ETags and Cache-Control headers"""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, method=scope["method"])
+        response.headers["etag"] = strong_etag(stat_result)
+        extension = os.path.splitext(str(full_path))[1].lower()
+        response.headers["cache-control"] = CACHE_CONTROL.get(extension, DEFAULT_CACHE_CONTROL)
+
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,87 @@
+"""
+Precomputed style vectors that stand in for the per-segment diffusion sampler.
+
+StyleTTS2 samples a style vector for every utterance with a diffusion model
+conditioned on the utterance's BERT embedding, then blends it toward the
+reference voice with alpha/beta. For a single narrator most of that variety
+is unwanted, and the sampler is a large share of per-segment latency.
+
+A style bank samples styles once, for a fixed set of prompts that cover the
+sentence shapes narrations use (statements, questions, lists, emphasis), and
+stores them with the prompts' mean BERT embeddings. At synthesis time the
+sampler is skipped: each utterance takes the style of the prompt whose
+embedding is closest to its own, which keeps questions sounding like
+questions without running diffusion. Banks are cached per voice and preset
+by the voice registry.
+"""
+import torch.nn.functional as F
+
+STYLE_MODES = ("diffusion", "bank")
+
+# Bump when the prompts or the selection change so cached banks and narrations are rebuilt
+STYLE_BANK_VERSION = 1
+
+STYLE_BANK_PROMPTS = [
+    "Photosynthesis is the process plants use to turn sunlight into chemical energy.",
+    "So why does this matter for the exam?",
+    "Here is the key idea: energy is never created or destroyed, only transformed.",
+    "First the cell copies its DNA, then it splits the copies, and finally it divides in two.",
+    "This is honestly one of the most surprising results in all of biology!",
+    "In short, supply rises when prices go up, and demand falls.",
+    "Remember, the mitochondria is where most of the cell's energy is produced.",
+    "Now let's look at what happens when the temperature drops below zero.",
+]
+
+
+def pooled_embeddings(embeddings, mask):
+    """
+    Mean BERT embedding of each utterance, ignoring padding.
+
+    Args:
+        embeddings (torch.Tensor): Token embeddings of shape [B, T, C]
+        mask (torch.Tensor): True at padding positions, shape [B, T]
+
+    Returns:
+        torch.Tensor: Shape [B, C]
+    """
+    weights = (~mask).unsqueeze(-1).to(embeddings.dtype)
+    return (embeddings * weights).sum(dim=1) / weights.sum(dim=1).clamp(min=1)
+
+
+class StyleBank:
+    """
+    Sampled styles and the pooled embeddings of the prompts they were sampled for.
+
+    Args:
+        styles (torch.Tensor): Raw sampler outputs (before alpha/beta blending), shape [N, 256]
+        keys (torch.Tensor): Pooled prompt embeddings, shape [N, C]
+    """
+
+    def __init__(self, styles, keys):
+        self.styles = styles
+        self.keys = F.normalize(keys, dim=-1)
+
+    def __len__(self):
+        return len(self.styles)
+
+    def select(self, embeddings, mask):
+        """
+        Style for each utterance in a batch, from the most similar prompt.
+
+        Args:
+            embeddings (torch.Tensor): BERT token embeddings of the batch, shape [B, T, C]
+            mask (torch.Tensor): True at padding positions, shape [B, T]
+
+        Returns:
+            torch.Tensor: Shape [B, 256], on the embeddings' device
+        """
+        query = F.normalize(pooled_embeddings(embeddings, mask), dim=-1)
+        nearest = (query @ self.keys.to(query.device).T).argmax(dim=-1)
+        return self.styles.to(query.device)[nearest].clone()
+
+    def state_dict(self):
+        return {"styles": self.styles, "keys": self.keys}
+
+    @classmethod
+    def from_state_dict(cls, state):
+        return cls(state["styles"], state["keys"])
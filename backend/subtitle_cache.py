@@ -0,0 +1,104 @@
+"""
+Cache of rasterized subtitle images.
+
+Rendering a caption with ``TextClip`` rasterizes the font every time. Chunks
+like "in this video" repeat across transcripts, so the rendered RGBA image is
+cached by its text and styling and reused as a plain NumPy array. The cache is
+shared by every video rendered in a process and can optionally be persisted
+to disk so other render workers and later runs reuse it too.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from moviepy import TextClip
+
+
+class SubtitleImageCache:
+    """LRU cache of caption images keyed by (text, font, size, stroke, width)"""
+
+    def __init__(self, cache_dir=None, max_entries=4096):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.npy")
+
+    def get(self, text, font="arial", font_size=70, stroke_width=2, width=None,
+            color="white", stroke_color="black"):
+        """
+        Return the caption image for some text.
+
+        Returns:
+            np.ndarray: uint8 RGBA image of shape [height, width, 4]
+        """
+        key = (text, font, font_size, stroke_width, width, color, stroke_color)
+
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+
+        image = None
+        if self.cache_dir:
+            try:
+                image = np.load(self._disk_path(key))
+            except (FileNotFoundError, ValueError):
+                image = None
+
+        if image is None:
+            image = self._render(text, font, font_size, stroke_width, width, color, stroke_color)
+            if self.cache_dir:
+                # Save to a temporary file first so concurrent workers never read a partial image
+                path = self._disk_path(key)
+                tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, image)
+                os.replace(tmp_path, path)
+
+        with self._lock:
+            self.misses += 1
+            self._images[key] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    @staticmethod
+    def _render(text, font, font_size, stroke_width, width, color, stroke_color):
+        clip = TextClip(
+            text=text,
+            font=font,
+            font_size=font_size,
+            color=color,
+            stroke_color=stroke_color,
+            stroke_width=stroke_width,
+            method='caption',
+            size=(width, None),
+            bg_color=None,
+            horizontal_align='center',
+            vertical_align='center'
+        )
+        rgb = clip.get_frame(0)
+        alpha = clip.mask.get_frame(0) if clip.mask is not None else np.ones(rgb.shape[:2])
+        clip.close()
+        return np.dstack([rgb, alpha * 255]).astype(np.uint8)
+
+
+_shared_cache = None
+
+
+def get_subtitle_cache():
+    """Process-wide cache instance; persisted when SUBTITLE_CACHE_DIR is set"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = SubtitleImageCache(cache_dir=os.getenv("SUBTITLE_CACHE_DIR") or None)
+    return _shared_cache
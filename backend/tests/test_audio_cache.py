@@ -0,0 +1,66 @@
+import os
+
+from audio_cache import AudioCache, audio_cache_key
+from word_timings import load_word_timings, save_word_timings
+
+KEY_ARGS = dict(voice="voice", alpha=0.3, beta=0.7, diffusion_steps=5, embedding_scale=1, seed=0, checkpoint="default")
+
+
+def write_narration(path, size, words=None):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    if words is not None:
+        save_word_timings(str(path), words)
+    return str(path)
+
+
+def test_key_ignores_whitespace_and_keeps_default_keys_stable():
+    key = audio_cache_key("Hello   world.\n", **KEY_ARGS)
+    assert key == audio_cache_key("Hello world.", **KEY_ARGS)
+    assert key == audio_cache_key("Hello world.", **KEY_ARGS, length_tolerance=0.0)
+    assert key != audio_cache_key("Hello world.", **KEY_ARGS, length_tolerance=0.1)
+    assert key != audio_cache_key("Hello world.", **dict(KEY_ARGS, seed=1))
+
+
+def test_hit_copies_audio_and_word_timings(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=10_000)
+    words = [{"word": "Hello", "start": 0.0, "end": 0.5}]
+    cache.put_file("key", write_narration(tmp_path / "source.wav", 100, words))
+
+    target = str(tmp_path / "target.wav")
+    assert cache.copy_to("key", target)
+    assert os.path.getsize(target) == 100
+    assert load_word_timings(target) == words
+    assert not cache.copy_to("missing", str(tmp_path / "missing.wav"))
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_budget_counts_sidecars_and_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.put_file("a", write_narration(tmp_path / "a.wav", 100))
+    cache.put_file("b", write_narration(tmp_path / "b.wav", 100))
+    assert cache.stats()["bytes"] == 200
+
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.copy_to("a", str(tmp_path / "out.wav"))
+    cache.put_file("c", write_narration(tmp_path / "c.wav", 40, words=[{"word": "x", "start": 0, "end": 1}]))
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 250
+    assert stats["bytes"] > 140  # the sidecar is counted too
+    assert not cache.copy_to("b", str(tmp_path / "out.wav"))
+    assert cache.copy_to("c", str(tmp_path / "out.wav"))
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir, max_bytes=10_000).put_file("a", write_narration(tmp_path / "a.wav", 100))
+
+    reopened = AudioCache(cache_dir, max_bytes=10_000)
+    assert reopened.stats()["entries"] == 1
+    assert reopened.copy_to("a", str(tmp_path / "out.wav"))
+
+    # A smaller budget evicts on load
+    assert AudioCache(cache_dir, max_bytes=50).stats()["entries"] == 0
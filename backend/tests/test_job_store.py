@@ -0,0 +1,83 @@
+import sqlite3
+
+from job_store import INTERRUPTED_STATUS, JobStore
+
+
+def test_create_update_and_get(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create("job", {"status": "Queued", "progress": 0, "complete": False})
+
+    assert store.exists("job")
+    assert not store.exists("other")
+    assert store.update("job", {"status": "Rendering", "progress": 50})
+    assert not store.update("other", {"status": "Rendering"})
+    assert store.get("job") == {"status": "Rendering", "progress": 50, "complete": False}
+    assert store.get("other") is None
+
+
+def test_get_if_updated_only_returns_changes(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create("job", {"status": "Queued"})
+
+    version, data = store.get_if_updated("job", 0)
+    assert data == {"status": "Queued"}
+    assert store.get_if_updated("job", version) == (version, None)
+
+    store.update("job", {"status": "Done"})
+    newer, data = store.get_if_updated("job", version)
+    assert newer > version
+    assert data["status"] == "Done"
+
+
+def test_unfinished_ids(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create("running", {"complete": False})
+    store.create("done", {"complete": True})
+    assert store.unfinished_ids() == ["running"]
+    store.update("running", {"complete": True})
+    assert store.unfinished_ids() == []
+
+
+def test_record_stage_timing(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create("job", {})
+    store.record_stage_timing("job", "tts", 1.23456)
+    assert store.get("job")["stageTimings"] == {"tts": 1.235}
+
+
+def test_orphaned_jobs_of_other_owners_are_failed(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    old = JobStore(db_path, owner="old")
+    old.create("running", {"status": "Rendering", "complete": False})
+    old.create("finished", {"status": "Done", "complete": True})
+
+    current = JobStore(db_path, owner="new")
+    current.create("mine", {"status": "Rendering", "complete": False})
+
+    # The old owner heartbeated recently, so its job isn't orphaned yet
+    assert current.fail_orphaned(stale_after=60) == []
+    assert current.fail_orphaned(stale_after=-1) == ["running"]
+
+    job = current.get("running")
+    assert job["status"] == INTERRUPTED_STATUS
+    assert job["complete"] is True
+    assert job["error"] == "interrupted by restart"
+    assert current.get("finished")["status"] == "Done"
+    assert current.get("mine")["status"] == "Rendering"
+
+
+def test_opening_an_old_database_adds_owner_columns(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE jobs (processing_id TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT '', "
+        "progress INTEGER NOT NULL DEFAULT 0, complete INTEGER NOT NULL DEFAULT 0, "
+        "data TEXT NOT NULL DEFAULT '{}', created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs VALUES ('legacy', 'Rendering', 10, 0, '{}', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    store = JobStore(db_path, owner="new")
+    # Jobs from before owners were recorded have no heartbeat and count as orphaned
+    assert store.fail_orphaned(stale_after=60) == ["legacy"]
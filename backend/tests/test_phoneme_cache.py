@@ -0,0 +1,25 @@
+import pytest
+
+from phoneme_cache import split_sentences
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", []),
+    ("One sentence.", ["One sentence."]),
+    ("First sentence. Second one! Third?", ["First sentence.", "Second one!", "Third?"]),
+    ("Really? Yes.", ["Really?", "Yes."]),
+])
+def test_unambiguous_boundaries_are_split(text, expected):
+    assert split_sentences(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Ask Dr. Smith about it. He knows.",
+    "Use e.g. Python here. It works.",
+    "The U.S. Army arrived. Then it left.",
+    "It costs 3. More later.",
+    "Written by J. Doe. Published later.",
+    "Ends here. then lowercase continues.",
+])
+def test_uncertain_boundaries_keep_the_text_whole(text):
+    assert split_sentences(text) == [text]
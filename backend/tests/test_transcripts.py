@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from transcripts import (ChunkResponseCache, StubTranscriptModel, TranscriptGenerator, TranscriptStreamParser,
+                         chunk_material)
+
+
+class CountingModel(StubTranscriptModel):
+    """Stub model that records the prompts it was sent"""
+
+    def __init__(self, fail_files=()):
+        super().__init__(words_per_transcript=5)
+        self.prompts = []
+        self.fail_files = set(fail_files)
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        if any(f"FILE: {name}" in prompt for name in self.fail_files):
+            raise RuntimeError("API unavailable")
+        return super().generate_content(prompt, stream=stream)
+
+
+def generate(generator, file_contents):
+    return {entry["Video name"]: entry for entry in generator.iter_generate(file_contents)}
+
+
+def test_chunk_material_splits_by_paragraph_within_budget():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 20 for i in range(6))
+    chunks = chunk_material({"notes.txt": text, "short.txt": "Just one line."}, max_tokens=40)
+
+    notes = [chunk for chunk in chunks if chunk["file"] == "notes.txt"]
+    assert len(notes) > 1
+    assert all(len(chunk["text"]) <= 40 * 4 for chunk in notes)
+    assert [chunk["part"] for chunk in notes] == list(range(1, len(notes) + 1))
+    assert all(chunk["parts"] == len(notes) for chunk in notes)
+    # Paragraphs are never cut while they fit the budget
+    assert all(chunk["text"].startswith("Paragraph") for chunk in notes)
+    assert chunks[-1] == {"file": "short.txt", "part": 1, "parts": 1, "text": "Just one line."}
+
+
+def test_chunk_material_cuts_long_lines_at_spaces():
+    chunks = chunk_material({"a.txt": "alpha " * 100}, max_tokens=10)
+    assert all(len(chunk["text"]) <= 40 for chunk in chunks)
+    assert " ".join(chunk["text"].strip() for chunk in chunks).split() == ["alpha"] * 100
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_generator_produces_one_transcript_per_chunk(stream):
+    generator = TranscriptGenerator(StubTranscriptModel(words_per_transcript=3), "stub", max_chunk_tokens=10,
+                                    retry_delay=0, stream=stream)
+    transcripts = generate(generator, {"a.txt": "one two three four", "b.txt": "five six seven"})
+
+    assert transcripts == {
+        "a.txt": {"Video name": "a.txt", "transcript": "one two three"},
+        "b.txt": {"Video name": "b.txt", "transcript": "five six seven"},
+    }
+
+
+def test_generator_merges_duplicates_and_renames_clashing_names():
+    class SameNameModel(StubTranscriptModel):
+        def generate_content(self, prompt, stream=False):
+            response = super().generate_content(prompt)
+            entry = json.loads(response.text)["transcripts"][0]
+            text = json.dumps({"transcripts": [
+                {"Video name": "Overview", "transcript": entry["transcript"]},
+                {"Video name": "Shared", "transcript": "The same text in every chunk."},
+            ]})
+            response.text = text
+            return response
+
+    generator = TranscriptGenerator(SameNameModel(), "stub", max_workers=1, retry_delay=0, stream=False)
+    transcripts = generate(generator, {"a.txt": "first file", "b.txt": "second file"})
+
+    assert sorted(transcripts) == ["Overview", "Overview (2)", "Shared"]
+    assert {transcripts["Overview"]["transcript"], transcripts["Overview (2)"]["transcript"]} == {
+        "first file", "second file"}
+
+
+def test_cached_chunks_skip_the_model(tmp_path):
+    cache = ChunkResponseCache(str(tmp_path))
+    files = {"a.txt": "alpha beta", "b.txt": "gamma delta"}
+
+    first = CountingModel()
+    generate(TranscriptGenerator(first, "stub", cache=cache, retry_delay=0), files)
+    assert len(first.prompts) == 2
+
+    # Only the changed file is requested again
+    second = CountingModel()
+    transcripts = generate(TranscriptGenerator(second, "stub", cache=cache, retry_delay=0),
+                           dict(files, **{"b.txt": "gamma epsilon"}))
+    assert len(second.prompts) == 1
+    assert "gamma epsilon" in second.prompts[0]
+    assert transcripts["a.txt"]["transcript"] == "alpha beta"
+
+
+def test_retry_only_requests_failed_chunks(tmp_path):
+    cache = ChunkResponseCache(str(tmp_path))
+    files = {"a.txt": "alpha beta", "b.txt": "gamma delta"}
+
+    flaky = CountingModel(fail_files={"b.txt"})
+    transcripts = generate(TranscriptGenerator(flaky, "stub", cache=cache, max_retries=1, retry_delay=0), files)
+    assert list(transcripts) == ["a.txt"]
+
+    retry = CountingModel()
+    transcripts = generate(TranscriptGenerator(retry, "stub", cache=cache, retry_delay=0), files)
+    assert len(retry.prompts) == 1
+    assert "FILE: b.txt" in retry.prompts[0]
+    assert sorted(transcripts) == ["a.txt", "b.txt"]
+
+
+def test_generator_raises_when_every_chunk_fails():
+    generator = TranscriptGenerator(CountingModel(fail_files={"a.txt"}), "stub", max_retries=0, retry_delay=0)
+    with pytest.raises(RuntimeError, match="All 1 chunks failed"):
+        generate(generator, {"a.txt": "alpha"})
+
+
+def test_stream_parser_yields_entries_as_they_complete():
+    text = json.dumps({"transcripts": [
+        {"Video name": "One", "transcript": "Braces {like these} and \"quotes\" stay inside strings."},
+        {"Video name": "Two", "transcript": "Second."},
+    ]})
+    parser = TranscriptStreamParser()
+    completed = []
+    for i in range(0, len(text), 7):
+        completed.extend(parser.feed(text[i:i + 7]))
+        if len(completed) == 1:
+            # The first entry is available before the second one has arrived
+            assert "Second." not in parser.text
+    assert [entry["Video name"] for entry in completed] == ["One", "Two"]
+    assert completed[0]["transcript"] == "Braces {like these} and \"quotes\" stay inside strings."
+    assert parser.text == text
+
+
+def test_stream_parser_tolerates_trailing_commas_and_skips_other_objects():
+    parser = TranscriptStreamParser()
+    completed = parser.feed('{"transcripts": [{"Video name": "A", "transcript": "x",}, {"note": "ignored"}]}')
+    assert completed == [{"Video name": "A", "transcript": "x"}]
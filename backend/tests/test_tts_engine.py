@@ -0,0 +1,44 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("styletts2")
+
+from tts_engine import expand_by_durations, length_bucket, pad_frames  # noqa: E402
+
+
+def test_expand_by_durations_matches_alignment_matmul():
+    features = torch.randn(2, 3, 4)
+    durations = torch.tensor([[2, 0, 1, 3], [1, 2, 0, 0]])
+
+    expanded = expand_by_durations(features, durations)
+
+    for i in range(2):
+        frames = int(durations[i].sum())
+        alignment = torch.zeros(4, frames)
+        start = 0
+        for token, duration in enumerate(durations[i].tolist()):
+            alignment[token, start:start + duration] = 1
+            start += duration
+        assert torch.allclose(expanded[i, :, :frames], features[i] @ alignment)
+        # Past the utterance's own end, frames are zero
+        assert not expanded[i, :, frames:].any()
+    assert expanded.shape == (2, 3, 6)
+
+
+@pytest.mark.parametrize("length", [1, 2, 7, 50, 63, 64, 100, 511, 1000, 4097])
+def test_length_bucket_pads_within_tolerance(length):
+    bucket = length_bucket(length, 0.1)
+    assert length <= bucket <= length * 1.1
+    assert length_bucket(length, 0.0) == length
+    assert length <= length_bucket(length, 0.1, limit=512) <= max(length, 512)
+
+
+def test_length_bucket_groups_nearby_lengths():
+    assert len({length_bucket(length, 0.1) for length in range(200, 256)}) < 10
+
+
+def test_pad_frames_pads_and_cuts():
+    features = torch.ones(1, 2, 5)
+    assert pad_frames(features, 8).shape == (1, 2, 8)
+    assert pad_frames(features, 8)[..., 5:].abs().sum() == 0
+    assert pad_frames(features, 3).shape == (1, 2, 3)
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import FastAPI, File, UploadFile  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from uploads import BlobStore, UploadSizeLimit, sanitize_filename  # noqa: E402
+
+
+def store_blob(store, digest, content=b"data"):
+    path = store.blob_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    os.utime(path, (0, 0))
+    return path
+
+
+def test_sanitize_filename():
+    assert sanitize_filename("../../etc/passwd") == "passwd"
+    assert sanitize_filename("C:\\Users\\me\\notes v2.pdf") == "notes v2.pdf"
+    assert sanitize_filename(".hidden") == "hidden"
+    assert sanitize_filename("...") == "upload"
+
+
+def test_collect_garbage_removes_idle_unlinked_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    unused = store_blob(store, "aa" * 32)
+    linked = store_blob(store, "bb" * 32)
+    store.link("bb" * 32, str(tmp_path / "job_upload.pdf"))
+    recent = store_blob(store, "cc" * 32)
+    os.utime(recent)
+    # Blobs written by older versions were read-only
+    os.chmod(unused, 0o444)
+
+    assert store.collect_garbage(max_idle_seconds=3600) == (1, 4)
+    assert not os.path.exists(unused)
+    assert os.path.exists(linked)
+    assert os.path.exists(recent)
+
+
+def make_client(max_bytes):
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit, max_bytes=max_bytes)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return TestClient(app)
+
+
+def test_upload_size_limit_checks_content_length():
+    client = make_client(max_bytes=1000)
+    assert client.post("/upload", files={"file": ("a.txt", b"x" * 100)}).json() == {"size": 100}
+    assert client.post("/upload", files={"file": ("a.txt", b"x" * 5000)}).status_code == 413
+
+
+def test_upload_size_limit_stops_chunked_bodies():
+    def body():
+        for _ in range(10):
+            yield b"x" * 500
+
+    response = make_client(max_bytes=1000).post(
+        "/upload", content=body(), headers={"content-type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
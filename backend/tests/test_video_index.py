@@ -0,0 +1,100 @@
+import os
+import struct
+import time
+
+from video_index import VideoIndex, probe_mp4_header
+
+
+def box(box_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def write_mp4(path, duration=12.5, width=1080, height=1920, version=0, mdat_size=4096):
+    timescale = 1000
+    if version == 1:
+        mvhd = struct.pack(">B3xQQIQ", 1, 0, 0, timescale, int(duration * timescale))
+        tkhd = struct.pack(">B3xQQI4xQ", 1, 0, 0, 1, 0)
+    else:
+        mvhd = struct.pack(">B3xIIII", 0, 0, 0, timescale, int(duration * timescale))
+        tkhd = struct.pack(">B3xIII4xI", 0, 0, 0, 1, 0)
+    mvhd += b"\0" * 80
+    # reserved, layer, alternate group, volume, reserved, then the 3x3 matrix
+    tkhd += b"\0" * 16 + b"\0" * 36 + struct.pack(">II", width << 16, height << 16)
+    moov = box(b"moov", box(b"mvhd", mvhd) + box(b"trak", box(b"tkhd", tkhd)))
+    with open(path, "wb") as f:
+        f.write(box(b"ftyp", b"isom\0\0\0\0isom") + box(b"mdat", b"\0" * mdat_size) + moov)
+    return str(path)
+
+
+def test_probe_reads_duration_and_size_from_header(tmp_path):
+    assert probe_mp4_header(write_mp4(tmp_path / "v0.mp4")) == {"duration": 12.5, "width": 1080, "height": 1920}
+    assert probe_mp4_header(write_mp4(tmp_path / "v1.mp4", duration=3.0, width=640, height=360, version=1)) == {
+        "duration": 3.0, "width": 640, "height": 360}
+
+
+def test_probe_rejects_files_without_a_movie_header(tmp_path):
+    path = tmp_path / "partial.mp4"
+    path.write_bytes(box(b"ftyp", b"isom\0\0\0\0isom") + box(b"mdat", b"\0" * 64))
+    assert probe_mp4_header(str(path)) is None
+    path.write_bytes(b"not a video")
+    assert probe_mp4_header(str(path)) is None
+
+
+def test_list_indexes_new_files_and_drops_deleted_ones(tmp_path):
+    root = tmp_path / "videos"
+    (root / "job").mkdir(parents=True)
+    first = write_mp4(root / "job" / "first_video.mp4", duration=5.0)
+    write_mp4(root / "job" / "second.mp4", duration=7.0)
+    index = VideoIndex(str(tmp_path / "index.db"), str(root))
+
+    total, page = index.list()
+    assert total == 2
+    assert [row["path"] for row in page] == ["job/first_video.mp4", "job/second.mp4"]
+    assert page[0]["title"] == "First Video"
+    assert page[0]["duration"] == 5.0
+    # Ids are derived from the path, so they are stable across listings
+    assert index.list()[1][0]["video_id"] == page[0]["video_id"]
+
+    assert index.list(offset=1, limit=1) == (2, page[1:])
+
+    os.remove(first)
+    total, page = index.list()
+    assert total == 1
+    assert page[0]["path"] == "job/second.mp4"
+
+
+def test_list_skips_unrecorded_files_of_running_jobs(tmp_path):
+    root = tmp_path / "videos"
+    (root / "running").mkdir(parents=True)
+    partial = root / "running" / "partial.mp4"
+    partial.write_bytes(box(b"ftyp", b"isom\0\0\0\0isom") + box(b"mdat", b"\0" * 64))
+    done = write_mp4(root / "running" / "done.mp4")
+    index = VideoIndex(str(tmp_path / "index.db"), str(root))
+    index.record(done)
+
+    total, page = index.list(in_progress_dirs=[str(root / "running")])
+    assert total == 1
+    assert page[0]["path"] == "running/done.mp4"
+
+
+def test_list_only_rescans_changed_directories(tmp_path, monkeypatch):
+    import video_index
+
+    root = tmp_path / "videos"
+    (root / "job").mkdir(parents=True)
+    write_mp4(root / "job" / "a.mp4")
+    old = time.time() - 60
+    for directory in (root, root / "job"):
+        os.utime(directory, (old, old))
+    index = VideoIndex(str(tmp_path / "index.db"), str(root))
+    assert index.list()[0] == 1
+
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(video_index.os, "scandir", lambda path: scans.append(path) or real_scandir(path))
+    assert index.list()[0] == 1
+    assert scans == []
+
+    write_mp4(root / "job" / "b.mp4")
+    assert index.list()[0] == 2
+    assert scans == [str(root / "job")]
@@ -0,0 +1,520 @@
+"""
+Map-reduce transcript generation with Gemini.
+
+Uploaded material is split into chunks that fit a token budget, by file
+first and then by section (paragraphs, then lines). Every chunk is sent as
+its own prompt, concurrently, and the per-chunk transcripts are merged and
+deduplicated. Parsed chunk responses are cached on disk keyed by the chunk's
+content and PROMPT_VERSION, so a retry or a re-upload only re-requests the
+chunks that failed or changed. Responses are streamed and parsed
+incrementally, so each transcript is available the moment it is complete.
+
+Any object with ``generate_content(prompt)`` returning something with a
+``.text`` attribute can serve as the model; StubTranscriptModel is a local
+stand-in for running the pipeline without an API key.
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# Bump whenever the prompts or response parsing change, so cached chunk responses are not reused
+PROMPT_VERSION = 1
+
+# Rough characters-per-token ratio for English prose; only used to size chunks
+CHARS_PER_TOKEN = 4
+
+MATERIAL_MARKER = "Material to analyze:"
+
+_CHUNK_DONE = object()
+
+RESPONSE_FORMAT = """
+                {{
+                    "transcripts": [
+                        {{
+                            "Video name": "name_of_video_1",
+                            "transcript": "your transcript here...",
+                        }},
+                        {{
+                            "Video name": "name_of_video_2",
+                            "transcript": "your transcript here...",
+                        }}
+                        // Include entries for as many transcripts required to explain the content
+                    ],
+                }}
+"""
+
+
+def _split_to_budget(text, max_chars):
+    """
+    Split text into pieces of at most max_chars, preferring section boundaries.
+
+    Paragraphs (blank-line separated) are packed together first; a paragraph
+    that is too long on its own is split by lines, and a line that is still too
+    long is cut at the nearest space.
+    """
+    pieces = []
+
+    def pack(units, separator, split_unit):
+        current = ""
+        for unit in units:
+            if len(unit) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                split_unit(unit)
+                continue
+            candidate = f"{current}{separator}{unit}" if current else unit
+            if len(candidate) > max_chars:
+                pieces.append(current)
+                current = unit
+            else:
+                current = candidate
+        if current:
+            pieces.append(current)
+
+    def split_line(line):
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip()
+        if line:
+            pieces.append(line)
+
+    def split_paragraph(paragraph):
+        pack(paragraph.split("\n"), "\n", split_line)
+
+    paragraphs = [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+    pack(paragraphs, "\n\n", split_paragraph)
+    return pieces
+
+
+def chunk_material(file_contents, max_tokens):
+    """
+    Split extracted file contents into token-budgeted chunks.
+
+    Args:
+        file_contents (dict): File name -> text
+        max_tokens (int): Approximate token budget for the material in one chunk
+
+    Returns:
+        list[dict]: {"file", "part", "parts", "text"} per chunk, in file order
+    """
+    max_chars = max(1, max_tokens) * CHARS_PER_TOKEN
+    chunks = []
+    for file_name, content in file_contents.items():
+        pieces = _split_to_budget(content, max_chars) or [content]
+        for index, piece in enumerate(pieces):
+            chunks.append({"file": file_name, "part": index + 1, "parts": len(pieces), "text": piece})
+    return chunks
+
+
+def build_prompt(chunk, strict=False):
+    """
+    Build the transcript prompt for one chunk.
+
+    Args:
+        chunk (dict): Chunk from chunk_material
+        strict (bool): Use the terse JSON-only wording used for retries
+    """
+    label = chunk["file"] if chunk["parts"] == 1 else f"{chunk['file']} (part {chunk['part']} of {chunk['parts']})"
+    material = f"--- FILE: {label} ---\n{chunk['text']}\n--- END OF FILE: {label} ---"
+    scope = "" if chunk["parts"] == 1 else (
+        "This is one excerpt of a longer file; only cover concepts explained in this excerpt.\n"
+    )
+
+    if not strict:
+        return f"""
+                Please analyze the following material and provide transcripts that explain
+                it in an easy-to-understand way. You should create as many videos as required to explain the important concepts in the material.
+                You are expected to usually create multiple video transcripts as there will be many concepts to explain.
+                Each video should focus on a specific concept or topic. The transcripts are for short form video content usually ranging around 30 seconds to a minute.
+                {scope}
+                Return ONLY a valid JSON object with the following structure - do not include any markdown formatting, explanations, or code blocks, follow the exact structure:
+                {RESPONSE_FORMAT.format()}
+                {MATERIAL_MARKER}
+{material}
+                """
+
+    return f"""
+                IMPORTANT: Your response MUST be a valid JSON object and NOTHING ELSE. No markdown, no explanations, no code blocks.
+
+                Please analyze this material and create transcripts explaining it in an easy-to-understand way.
+                Create multiple video transcripts focusing on specific concepts from the material.
+                {scope}
+                Your response must EXACTLY follow this JSON structure:
+                {RESPONSE_FORMAT.format()}
+                DO NOT include any explanations, comments, or text outside of this exact JSON structure.
+                DO NOT use markdown code blocks or any other formatting.
+
+                {MATERIAL_MARKER}
+{material}
+                """
+
+
+def parse_transcripts_response(response_text):
+    """
+    Parse a model response into its list of transcripts.
+
+    Returns:
+        list[dict]: Transcript entries that have a "Video name"
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+    """
+    json_content = response_text
+
+    # Try to extract if it's in a code block
+    if "```json" in response_text:
+        json_content = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        json_content = response_text.split("```")[1].strip()
+
+    # Remove any leading/trailing characters that might invalidate JSON
+    json_content = json_content.strip()
+    if json_content.startswith('`') and json_content.endswith('`'):
+        json_content = json_content[1:-1].strip()
+
+    results = json.loads(json_content)
+    return [t for t in results.get("transcripts", []) if isinstance(t, dict) and "Video name" in t]
+
+
+def _normalize(text):
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+class TranscriptStreamParser:
+    """
+    Incremental parser for a streamed transcripts response.
+
+    Text is fed as it arrives; every object nested inside the top-level
+    object (i.e. each entry of the "transcripts" array) is returned as soon
+    as its closing brace is seen. String contents and escapes are tracked so
+    braces inside transcripts don't confuse the depth count.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+
+    def feed(self, piece):
+        """
+        Consume the next piece of response text.
+
+        Returns:
+            list[dict]: Transcript entries completed by this piece
+        """
+        self.text += piece
+        completed = []
+        while self._pos < len(self.text):
+            char = self.text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._object_start = self._pos
+            elif char == "}":
+                if self._depth == 2 and self._object_start is not None:
+                    entry = self._parse_object(self.text[self._object_start:self._pos + 1])
+                    if entry is not None:
+                        completed.append(entry)
+                    self._object_start = None
+                self._depth = max(self._depth - 1, 0)
+            self._pos += 1
+        return completed
+
+    @staticmethod
+    def _parse_object(raw):
+        try:
+            entry = json.loads(raw)
+        except json.JSONDecodeError:
+            try:
+                # Models often copy the trailing comma from the example in the prompt
+                entry = json.loads(re.sub(r",\s*}$", "}", raw))
+            except json.JSONDecodeError:
+                return None
+        if isinstance(entry, dict) and "Video name" in entry and "transcript" in entry:
+            return entry
+        return None
+
+
+class TranscriptMerger:
+    """
+    Merge transcripts from several chunks one at a time.
+
+    Transcripts whose text matches one already kept are dropped. Distinct
+    transcripts that share a name get a numeric suffix instead of
+    overwriting each other.
+    """
+
+    def __init__(self):
+        self.merged = {}
+        self._seen_names = {}
+        self._seen_texts = set()
+        self._lock = threading.Lock()
+
+    def add(self, transcript):
+        """
+        Returns:
+            dict or None: The entry as kept (possibly renamed), or None for a duplicate
+        """
+        with self._lock:
+            text_key = _normalize(str(transcript.get("transcript", "")))
+            if text_key in self._seen_texts:
+                return None
+            self._seen_texts.add(text_key)
+
+            name = str(transcript["Video name"]).strip()
+            name_key = _normalize(name)
+            count = self._seen_names.get(name_key, 0) + 1
+            self._seen_names[name_key] = count
+            if count > 1:
+                name = f"{name} ({count})"
+            entry = dict(transcript, **{"Video name": name})
+            self.merged[name] = entry
+            return entry
+
+
+class ChunkResponseCache:
+    """Parsed transcripts per chunk, stored as JSON files named by content hash"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(chunk, model_name):
+        payload = json.dumps([PROMPT_VERSION, model_name, chunk["file"], chunk["part"], chunk["parts"], chunk["text"]])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.cache_dir, f"{key}.json"), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, transcripts):
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(transcripts, f)
+        os.replace(tmp_path, path)
+
+
+class TranscriptGenerator:
+    """
+    Generate transcripts for extracted material with one prompt per chunk.
+
+    Args:
+        model: Object with generate_content(prompt) -> response with .text
+        model_name (str): Identifies the model in cache keys
+        cache (ChunkResponseCache): Chunk response cache, or None to disable caching
+        max_chunk_tokens (int): Token budget for the material in one prompt
+        max_workers (int): Chunks requested concurrently
+        max_retries (int): Retries per chunk after the first attempt
+        retry_delay (float): Seconds to wait before retrying a chunk
+        stream (bool): Request streamed responses and parse transcripts as they arrive
+    """
+
+    def __init__(self, model, model_name, cache=None, max_chunk_tokens=24000, max_workers=4,
+                 max_retries=3, retry_delay=2.0, stream=True):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.stream = stream
+
+    def _request(self, prompt, on_transcript):
+        """
+        Send one prompt, streaming the response when the generator streams.
+
+        Returns:
+            tuple[str, list[dict]]: Full response text and the transcripts parsed while streaming
+        """
+        if not self.stream:
+            return self.model.generate_content(prompt).text, []
+
+        parser = TranscriptStreamParser()
+        streamed = []
+        for piece in self.model.generate_content(prompt, stream=True):
+            for transcript in parser.feed(piece.text):
+                streamed.append(transcript)
+                on_transcript(transcript)
+        return parser.text, streamed
+
+    def _generate_chunk(self, chunk, debug_dir=None, on_transcript=None):
+        """
+        Return the transcripts for one chunk, from the cache or the model.
+
+        Args:
+            on_transcript (callable): Called with each transcript as soon as it is available
+
+        Raises:
+            Exception: The last error once every attempt has failed
+        """
+        emitted = set()
+
+        def emit(transcript):
+            # A retried stream repeats transcripts already handed on; skip those
+            name_key = _normalize(str(transcript["Video name"]))
+            if on_transcript and name_key not in emitted:
+                emitted.add(name_key)
+                on_transcript(transcript)
+
+        key = ChunkResponseCache.key(chunk, self.model_name) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"Using cached transcripts for {chunk['file']} part {chunk['part']}/{chunk['parts']}")
+                for transcript in cached:
+                    emit(transcript)
+                return cached
+
+        label = f"{chunk['file']} part {chunk['part']}/{chunk['parts']}"
+        for attempt in range(self.max_retries + 1):  # +1 to include the initial attempt
+            if attempt > 0:
+                # prevent rate limiting
+                time.sleep(self.retry_delay)
+            response_text = ""
+            streamed = []
+            try:
+                print(f"Attempt {attempt+1}/{self.max_retries+1}: Sending {label} to Gemini API...")
+                response_text, streamed = self._request(build_prompt(chunk, strict=attempt > 0), emit)
+                try:
+                    transcripts = parse_transcripts_response(response_text)
+                except json.JSONDecodeError:
+                    # A complete stream whose entries all parsed is usable even if the
+                    # surrounding JSON is slightly malformed
+                    if not streamed:
+                        raise
+                    transcripts = streamed
+                for transcript in transcripts:
+                    emit(transcript)
+                if key:
+                    self.cache.put(key, transcripts)
+                return transcripts
+            except json.JSONDecodeError as e:
+                print(f"Attempt {attempt+1}/{self.max_retries+1}: JSON parse error for {label}: {str(e)}")
+                if debug_dir:
+                    # Save the problematic response for debugging
+                    safe_label = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{chunk['file']}_part{chunk['part']}")
+                    error_path = os.path.join(debug_dir, f"gemini_error_response_{safe_label}_attempt_{attempt+1}.txt")
+                    with open(error_path, 'w') as f:
+                        f.write(response_text)
+                if attempt >= self.max_retries:
+                    raise
+            except Exception as e:
+                # For other exceptions (network issues, API errors, etc.)
+                print(f"Attempt {attempt+1}/{self.max_retries+1}: Error calling Gemini API for {label}: {str(e)}")
+                if attempt >= self.max_retries:
+                    raise
+
+    def iter_generate(self, file_contents, debug_dir=None):
+        """
+        Yield merged transcripts as soon as each one is complete.
+
+        Chunks are requested concurrently and, when streaming, each
+        {"Video name", "transcript"} object is yielded the moment its closing
+        brace arrives, so downstream stages can start before the model has
+        finished. Duplicates are dropped and clashing names renamed as in
+        TranscriptMerger; chunks that still fail after retries are left out.
+
+        Args:
+            file_contents (dict): File name -> extracted text
+            debug_dir (str): Where unparseable responses are saved
+
+        Yields:
+            dict: {"Video name", "transcript"} entries in completion order
+
+        Raises:
+            RuntimeError: If no chunk produced any transcripts
+        """
+        chunks = chunk_material(file_contents, self.max_chunk_tokens)
+        if not chunks:
+            raise RuntimeError("No content to process")
+        print(f"Split {len(file_contents)} files into {len(chunks)} chunks "
+              f"(~{self.max_chunk_tokens} tokens each at most)")
+
+        merger = TranscriptMerger()
+        outbox = queue.Queue()
+
+        def on_transcript(transcript):
+            entry = merger.add(transcript)
+            if entry is not None:
+                outbox.put(entry)
+
+        def run_chunk(chunk):
+            try:
+                self._generate_chunk(chunk, debug_dir, on_transcript)
+            finally:
+                outbox.put(_CHUNK_DONE)
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks)))
+        try:
+            futures = [executor.submit(run_chunk, chunk) for chunk in chunks]
+            remaining = len(chunks)
+            while remaining:
+                entry = outbox.get()
+                if entry is _CHUNK_DONE:
+                    remaining -= 1
+                else:
+                    yield entry
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        errors = []
+        for chunk, future in zip(chunks, futures):
+            if future.exception() is not None:
+                errors.append(f"{chunk['file']} part {chunk['part']}: {str(future.exception())}")
+        if errors:
+            print(f"{len(errors)}/{len(chunks)} chunks failed: {errors}")
+        if not merger.merged:
+            raise RuntimeError(f"All {len(chunks)} chunks failed: {errors[0]}" if errors else "No transcripts generated")
+
+
+class StubTranscriptModel:
+    """
+    Offline stand-in for the Gemini model.
+
+    Answers every prompt with one transcript built from the start of the
+    chunk's material, in the response format the real model is asked for.
+    With stream=True the response is returned in small pieces, like the
+    Gemini streaming API.
+    """
+
+    def __init__(self, words_per_transcript=80):
+        self.words_per_transcript = words_per_transcript
+
+    def generate_content(self, prompt, stream=False):
+        material = prompt.split(MATERIAL_MARKER, 1)[-1].strip()
+        header, _, body = material.partition("\n")
+        name = header.strip("- ").replace("FILE: ", "", 1) or "Material"
+        body = body.rsplit("--- END OF FILE", 1)[0]
+        words = body.split()[:self.words_per_transcript]
+        transcript = " ".join(words) or f"This video covers {name}."
+        text = json.dumps({"transcripts": [{"Video name": name, "transcript": transcript}]})
+        if stream:
+            return [SimpleNamespace(text=text[i:i + 64]) for i in range(0, len(text), 64)]
+        return SimpleNamespace(text=text)
@@ -0,0 +1,645 @@
+"""
+StyleTTS2 extensions used by the StudyBytes backend.
+
+The packaged ``styletts2.tts.StyleTTS2`` synthesizes one utterance at a time
+with a batch size of 1. ``StyleTTS2Engine`` keeps its public API and adds a
+batched path. Stages that are exact under padding run over the padded
+batch: the masked text encoder and BERT, and the packed duration predictor.
+The diffusion sampler, the F0/energy predictor and the decoder normalize or
+attend over the whole sequence, so each utterance is padded to a length
+bucket derived from its own length only (at most ``length_tolerance`` longer)
+and utterances sharing a bucket run together; decoded audio is trimmed back
+to the real frames. Diffusion noise is derived from the seed and the
+utterance itself. An utterance therefore sounds the same whatever it is
+batched with, which the content-addressed audio cache relies on.
+``inference`` and ``long_inference_segment`` are overridden to share that
+path, including the index-based duration expansion. The predicted durations
+can also be returned as word timestamps for caption timing.
+``iter_batch_inference`` yields every segment as soon as it is decoded, so
+callers can append it to a ``wav_stream.WavWriter`` instead of holding whole
+narrations in memory.
+
+Checkpoint weights can be loaded memory-mapped: the training checkpoint is
+converted once into a weights-only file (no optimizer state, no ``module.``
+prefixes), which ``torch.load(mmap=True)`` maps instead of reading, and
+``load_state_dict(assign=True)`` makes the parameters use the mapped pages
+directly. Workers loading the same file then share it through the page cache
+instead of each holding a private copy of the weights.
+
+The "cpu-fast" profile is meant for CPU-only hosts: the LSTM and Linear
+layers of the text encoder, BERT and prosody predictor are quantized to int8
+with dynamic quantization, and inference runs under ``torch.inference_mode``.
+The diffusion sampler and the decoder (mostly convolutions) stay fp32. Use
+benchmark_tts.py to check speed and the distance to fp32 output.
+
+Phonemization results are memoized per sentence (and optionally per word)
+by a PhonemeCache, see phoneme_cache.py.
+
+Passing a ``style_bank`` (see style_bank.py) skips the diffusion sampler and
+takes each utterance's style from a small set sampled ahead of time.
+"""
+import os
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import scipy.io.wavfile
+import torch
+from torch import nn
+from styletts2 import tts
+
+from phoneme_cache import PhonemeCache
+from style_bank import STYLE_BANK_PROMPTS, StyleBank, pooled_embeddings
+from wav_stream import WavWriter
+from word_timings import align_words, phoneme_word_spans, text_words
+
+STYLE_DIM = 128  # Each half of the 256-dim style vector (acoustic | prosodic)
+SINGLE_TRIM = 50  # Samples dropped from the end of single-shot output (end-of-utterance pulse)
+SEGMENT_TRIM = 100  # Samples dropped from the end of each long-form segment
+MAX_TOKENS = 512  # PL-BERT position limit
+
+TTS_PROFILES = ("default", "cpu-fast")
+QUANTIZED_MODULES = ("text_encoder", "bert", "predictor")  # Modules whose LSTM/Linear layers cpu-fast quantizes
+
+
+def strip_module_prefix(state_dict):
+    """Drop the ``module.`` prefix DataParallel training adds to parameter names"""
+    return {(key[len("module."):] if key.startswith("module.") else key): value for key, value in state_dict.items()}
+
+
+def convert_checkpoint(model_path, weights_path):
+    """
+    Write the network weights of a training checkpoint as a memory-mappable file.
+
+    Args:
+        model_path (str): StyleTTS2 training checkpoint (``{"net": {...}, "optimizer": ...}``)
+        weights_path (str): Output path; written atomically
+
+    Returns:
+        str: weights_path
+    """
+    print(f"TTS: Converting {os.path.basename(model_path)} to memory-mappable weights...")
+    # Training checkpoints hold more than tensors; this is the upstream checkpoint that would be loaded anyway
+    checkpoint = torch.load(model_path, map_location="cpu", weights_only=False)
+    weights = {key: strip_module_prefix(state_dict) for key, state_dict in checkpoint["net"].items()}
+    os.makedirs(os.path.dirname(weights_path) or ".", exist_ok=True)
+    tmp_path = f"{weights_path}.{os.getpid()}.tmp"
+    torch.save(weights, tmp_path)
+    os.replace(tmp_path, weights_path)
+    return weights_path
+
+
+def quantize_for_cpu(module):
+    """
+    Quantize the LSTM and Linear layers of a module to int8, in place.
+
+    Weights are quantized once; activations are quantized on the fly per
+    batch, so no calibration data is needed.
+    """
+    module = torch.ao.quantization.quantize_dynamic(module, {nn.LSTM, nn.Linear}, dtype=torch.qint8, inplace=True)
+    for submodule in module.modules():
+        if isinstance(submodule, torch.ao.nn.quantized.dynamic.LSTM) and not hasattr(submodule, "flatten_parameters"):
+            # Upstream forward passes compact cuDNN weights first; quantized LSTMs have nothing to compact
+            submodule.flatten_parameters = lambda: None
+    return module
+
+
+def length_bucket(length, tolerance, limit=None):
+    """
+    Length an item is padded to, at most tolerance * length longer than the item.
+
+    The bucket only depends on the item's own length, so an item padded to its
+    bucket gives the same result whatever it is batched with. Boundaries are
+    multiples of a step that grows with the length's power-of-two range.
+
+    Args:
+        length (int): Unpadded length
+        tolerance (float): Largest padding as a fraction of the length (0 for no padding)
+        limit (int): Optional upper bound (e.g. BERT's position limit)
+    """
+    if tolerance <= 0 or length <= 1:
+        return length
+    step = max(1, int((1 << (length.bit_length() - 1)) * tolerance))
+    bucket = -(-length // step) * step
+    return max(length, min(bucket, limit)) if limit else bucket
+
+
+def pad_frames(features, length):
+    """Zero-pad (or cut) the last dimension of features to length"""
+    if features.shape[-1] >= length:
+        return features[..., :length]
+    return nn.functional.pad(features, (0, length - features.shape[-1]))
+
+
+def group_by_length(lengths):
+    """Indices of equal-length items, as (length, indices) pairs"""
+    groups = {}
+    for index, length in enumerate(lengths):
+        groups.setdefault(int(length), []).append(index)
+    return list(groups.items())
+
+
+def expand_by_durations(features, durations):
+    """
+    Repeat each token's feature column for its predicted number of frames.
+
+    Equivalent to multiplying by the hard monotonic alignment matrix
+    ``[tokens x frames]`` but built from an index instead, so neither the
+    matrix nor the matmul is materialized.
+
+    Args:
+        features (torch.Tensor): Token features of shape [B, C, T]
+        durations (torch.Tensor): Frames per token of shape [B, T] (0 for padding)
+
+    Returns:
+        torch.Tensor: Frame features of shape [B, C, max_frames], zero past each utterance's end
+    """
+    batch_size, channels, num_tokens = features.shape
+    durations = durations.long()
+    frames = durations.sum(dim=-1)
+    max_frames = int(frames.max())
+
+    # Token index (flattened over the batch) for every output frame
+    flat_tokens = torch.repeat_interleave(torch.arange(batch_size * num_tokens, device=features.device), durations.flatten())
+    batch_ids = flat_tokens // num_tokens
+    frame_starts = torch.cumsum(frames, dim=0) - frames
+    frame_ids = torch.arange(flat_tokens.numel(), device=features.device) - frame_starts[batch_ids]
+
+    # Frames past the end of an utterance read an appended all-zero column
+    index = torch.full((batch_size, max_frames), num_tokens, dtype=torch.long, device=features.device)
+    index[batch_ids, frame_ids] = flat_tokens % num_tokens
+    padded = torch.cat([features, features.new_zeros((batch_size, channels, 1))], dim=-1)
+    return torch.gather(padded, 2, index.unsqueeze(1).expand(-1, channels, -1))
+
+
+class StyleTTS2Engine(tts.StyleTTS2):
+    """
+    StyleTTS2 with batched multi-utterance inference.
+
+    Args:
+        weights_path (str): Memory-mappable weights file for the checkpoint, created
+            from it on first use; None loads the checkpoint the upstream way
+        profile (str): "default" (fp32) or "cpu-fast" (int8 dynamic quantization, CPU only)
+        num_threads (int): Intra-op threads for this process; set it when several
+            workers share the host so they don't oversubscribe the cores
+        phoneme_cache (PhonemeCache): Memo cache for the text front-end (an in-memory one by default)
+        length_tolerance (float): Padding allowed in the sampler, F0/energy predictor and decoder,
+            as a fraction of each utterance's length, so similar lengths share a forward pass;
+            0 only batches exactly equal lengths (see length_bucket)
+    """
+
+    def __init__(self, *args, weights_path=None, profile="default", num_threads=None, phoneme_cache=None,
+                 length_tolerance=0.0, **kwargs):
+        if profile not in TTS_PROFILES:
+            raise ValueError(f"Unknown TTS profile: {profile}")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        # Read by load_model, which the base constructor calls
+        self.weights_path = weights_path
+        self.profile = profile
+        super().__init__(*args, **kwargs)
+        self.phoneme_cache = phoneme_cache or PhonemeCache()
+        self.length_tolerance = length_tolerance
+        # Stateless symbol table; building it for every segment is wasted work
+        self.text_cleaner = tts.TextCleaner()
+        if profile == "cpu-fast":
+            self._apply_cpu_fast_profile()
+        # The HiFi-GAN decoder expects the aligned features shifted by one frame
+        self.shift_aligned_features = self.config["model_params"]["decoder"]["type"] == "hifigan"
+
+    def load_model(self, model_path=None, config_path=None):
+        """
+        Build the model like upstream StyleTTS2, loading the checkpoint memory-mapped when weights_path is set.
+
+        Upstream still builds the networks (config, ASR, F0 and PLBERT with their
+        download fallbacks) but is handed an empty checkpoint, so only the state
+        dict loading is replaced.
+        """
+        if not self.weights_path:
+            return super().load_model(model_path=model_path, config_path=config_path)
+
+        if not os.path.exists(self.weights_path):
+            if not model_path or not Path(model_path).exists():
+                print("TTS: Checkpoint not found, using the default model...")
+                model_path = tts.cached_path(tts.LIBRI_TTS_CHECKPOINT_URL)
+            convert_checkpoint(model_path, self.weights_path)
+
+        empty_checkpoint_path = f"{self.weights_path}.empty"
+        if not os.path.exists(empty_checkpoint_path):
+            tmp_path = f"{empty_checkpoint_path}.{os.getpid()}.tmp"
+            torch.save({"net": {}}, tmp_path)
+            os.replace(tmp_path, empty_checkpoint_path)
+        model = super().load_model(model_path=empty_checkpoint_path, config_path=config_path)
+
+        # Tensors stay backed by the file; pages are read on first use and shared between processes
+        weights = torch.load(self.weights_path, map_location="cpu", mmap=True, weights_only=True)
+        for key in model:
+            if key in weights:
+                result = model[key].load_state_dict(weights[key], strict=False, assign=True)
+                if result.missing_keys:
+                    print(f"TTS: {key} is missing {len(result.missing_keys)} weights from the checkpoint")
+        _ = [model[key].eval() for key in model]
+        _ = [model[key].to(self.device) for key in model]
+        return model
+
+    def _apply_cpu_fast_profile(self):
+        if self.device != "cpu":
+            # Dynamic quantization only has CPU kernels
+            print(f"TTS: cpu-fast profile needs the CPU, running fp32 on {self.device}")
+            self.profile = "default"
+            return
+        for key in QUANTIZED_MODULES:
+            self.model[key] = quantize_for_cpu(self.model[key])
+        print(f"TTS: cpu-fast profile, int8 {', '.join(QUANTIZED_MODULES)}, {torch.get_num_threads()} threads")
+
+    def _inference_context(self):
+        # inference_mode also skips autograd version tracking; no_grad keeps upstream behaviour by default
+        return torch.inference_mode() if self.profile == "cpu-fast" else torch.no_grad()
+
+    def default_style(self, target_voice_path=None):
+        """Reference style for a voice file, falling back to the packaged default voice"""
+        if not target_voice_path or not Path(target_voice_path).exists():
+            print("Cloning default target voice...")
+            target_voice_path = tts.cached_path(tts.DEFAULT_TARGET_VOICE_URL)
+        return self.compute_style(target_voice_path)
+
+    def tokenize(self, text, phonemize=True, return_word_spans=False):
+        """
+        Convert text to the token id list fed to the text encoder.
+
+        With return_word_spans, also return the [start, end) token range of
+        every spoken word (see word_timings.phoneme_word_spans).
+        """
+        text = text.strip().replace('"', '')
+        if phonemize:
+            phoneme_string = self.phoneme_cache.phonemize(text, self._phoneme_string)
+            # word_tokenize turns double quotes into `` and ''; map them back like upstream does
+            phoneme_string = phoneme_string.replace('``', '"').replace("''", '"')
+        else:
+            phoneme_string = text
+        tokens = self.text_cleaner(phoneme_string)
+        tokens.insert(0, 0)
+        if return_word_spans:
+            return tokens, phoneme_word_spans(phoneme_string, self.text_cleaner.word_index_dictionary)
+        return tokens
+
+    def _phoneme_string(self, text):
+        """Uncached front-end: gruut phonemes, re-tokenized so punctuation is split off"""
+        return ' '.join(tts.word_tokenize(self.phoneme_converter.phonemize(text)))
+
+    def split_segments(self, text):
+        """Split long text into the segments synthesized by long-form inference"""
+        segments = []
+        for text_segment in tts.segment_text(text):
+            # Address cut-off sentence issue due to text splitter
+            if text_segment[-1] != '.':
+                text_segment += ', '
+            segments.append(text_segment)
+        return segments
+
+    def _shift_frames(self, features):
+        if not self.shift_aligned_features:
+            return features
+        shifted = torch.zeros_like(features)
+        shifted[:, :, 0] = features[:, :, 0]
+        shifted[:, :, 1:] = features[:, :, 0:-1]
+        return shifted
+
+    def _sample_noise(self, token_lists, seed):
+        """
+        Diffusion noise per utterance.
+
+        With a seed, each utterance's noise is seeded from the seed and its own
+        tokens, so it doesn't depend on batch composition or order.
+        """
+        if seed is None:
+            return torch.randn((len(token_lists), 1, 256)).to(self.device)
+        noise = []
+        for tokens in token_lists:
+            digest = hashlib.sha256(f"{seed}:{','.join(map(str, tokens))}".encode("utf-8")).digest()
+            generator = torch.Generator().manual_seed(int.from_bytes(digest[:8], "big") >> 1)
+            noise.append(torch.randn((1, 256), generator=generator))
+        return torch.stack(noise).to(self.device)
+
+    def _sample_styles(self, bert_dur, buckets, ref_s, noise, embedding_scale, diffusion_steps):
+        """
+        Run the diffusion sampler per group of utterances padded to the same bucket.
+
+        The sampler attends over the embeddings without a mask, so each utterance
+        is padded to its own bucket (see length_bucket), never to the batch's length.
+        """
+        s_pred = bert_dur.new_zeros((len(buckets), 256))
+        for length, indices in group_by_length(buckets):
+            index = torch.tensor(indices, device=bert_dur.device)
+            s_pred[index] = self.sampler(noise=noise[index],
+                                         embedding=bert_dur[index, :length],
+                                         embedding_scale=embedding_scale,
+                                         features=ref_s[index],  # reference from the same speaker as the embedding
+                                         num_steps=diffusion_steps).squeeze(1)
+        return s_pred
+
+    def _pad_tokens(self, token_lists, width=None):
+        """Token ids padded to width (the longest list by default) [B, T], their lengths and the padding mask"""
+        lengths = [len(tokens) for tokens in token_lists]
+        width = max(width or 0, *lengths)
+        tokens = torch.zeros((len(token_lists), width), dtype=torch.long)
+        for i, row in enumerate(token_lists):
+            tokens[i, :len(row)] = torch.LongTensor(row)
+        input_lengths = torch.LongTensor(lengths).to(self.device)
+        text_mask = torch.arange(width, device=self.device).unsqueeze(0) >= input_lengths.unsqueeze(1)
+        return tokens.to(self.device), input_lengths, text_mask
+
+    def build_style_bank(self, ref_s, embedding_scale=1, diffusion_steps=5, seed=None, prompts=STYLE_BANK_PROMPTS):
+        """
+        Sample one style per bank prompt with the diffusion sampler.
+
+        Args:
+            ref_s (torch.Tensor): Reference style vector of shape [1, 256]
+            seed (int): Optional seed so the bank is reproducible
+
+        Returns:
+            StyleBank: Styles on the CPU, moved to the model's device when used
+        """
+        token_lists = [self.tokenize(prompt) for prompt in prompts]
+        tokens, _, text_mask = self._pad_tokens(token_lists)
+        with self._inference_context():
+            bert_dur = self.model.bert(tokens, attention_mask=(~text_mask).int())
+            # Exact lengths, so cached banks don't depend on length_tolerance
+            styles = self._sample_styles(bert_dur, [len(row) for row in token_lists], ref_s.expand(len(prompts), -1),
+                                         self._sample_noise(token_lists, seed), embedding_scale, diffusion_steps)
+            keys = pooled_embeddings(bert_dur, text_mask)
+        # Clone outside inference mode so the bank can be used under no_grad as well
+        return StyleBank(styles.cpu().clone(), keys.cpu().clone())
+
+    def _synthesize_batch(self, token_lists, ref_s, prev_s=None, alpha=0.3, beta=0.7, t=0.7,
+                          diffusion_steps=5, embedding_scale=1, trims=None, seed=None, return_durations=False,
+                          style_bank=None):
+        """
+        Run the full acoustic pipeline over a batch of token sequences.
+
+        Token-level stages run over the padded batch. The sampler, F0/energy
+        predictor and decoder run per group of utterances that share a length
+        bucket; each utterance is padded to its own bucket and trimmed after
+        decoding, so its output doesn't depend on the rest of the batch.
+
+        Args:
+            token_lists (list[list[int]]): Token ids per utterance
+            ref_s (torch.Tensor): Reference style vector of shape [1, 256]
+            prev_s (list): Optional previous-segment style per utterance (or None entries)
+            trims (list[int]): Samples to drop from the end of each output
+            return_durations (bool): Also return the output samples of every token
+            style_bank (StyleBank): Take styles from the bank instead of running the sampler
+
+        Returns:
+            list[tuple[np.ndarray, torch.Tensor]]: Waveform and blended style per utterance,
+            plus a list of samples per token when return_durations is set
+        """
+        batch_size = len(token_lists)
+        lengths = [len(tokens) for tokens in token_lists]
+        token_buckets = [length_bucket(length, self.length_tolerance, limit=MAX_TOKENS) for length in lengths]
+        trims = trims or [SINGLE_TRIM] * batch_size
+        # BERT outputs at pad positions only attend to the utterance itself, so the sampler can read them
+        tokens, input_lengths, text_mask = self._pad_tokens(token_lists, width=max(token_buckets))
+        max_len = tokens.shape[1]
+        ref_s = ref_s.expand(batch_size, -1)
+
+        with self._inference_context():
+            t_en = self.model.text_encoder(tokens, input_lengths, text_mask)
+            bert_dur = self.model.bert(tokens, attention_mask=(~text_mask).int())
+            d_en = self.model.bert_encoder(bert_dur).transpose(-1, -2)
+
+            if style_bank is not None:
+                s_pred = style_bank.select(bert_dur, text_mask)
+            else:
+                s_pred = self._sample_styles(bert_dur, token_buckets, ref_s, self._sample_noise(token_lists, seed),
+                                             embedding_scale, diffusion_steps)
+
+            if prev_s is not None:
+                # convex combination of previous and current style, per utterance
+                for i, prev in enumerate(prev_s):
+                    if prev is not None:
+                        s_pred[i] = t * prev.reshape(-1) + (1 - t) * s_pred[i]
+
+            s = s_pred[:, STYLE_DIM:]
+            ref = s_pred[:, :STYLE_DIM]
+
+            ref = alpha * ref + (1 - alpha) * ref_s[:, :STYLE_DIM]
+            s = beta * s + (1 - beta) * ref_s[:, STYLE_DIM:]
+
+            s_pred = torch.cat([ref, s], dim=-1)
+
+            d = self.model.predictor.text_encoder(d_en, s, input_lengths, text_mask)
+
+            # Pack so the bidirectional LSTM never reads padding positions
+            packed = nn.utils.rnn.pack_padded_sequence(d, input_lengths.cpu(), batch_first=True, enforce_sorted=False)
+            x, _ = self.model.predictor.lstm(packed)
+            x, _ = nn.utils.rnn.pad_packed_sequence(x, batch_first=True, total_length=max_len)
+            duration = self.model.predictor.duration_proj(x)
+
+            duration = torch.sigmoid(duration).sum(axis=-1)
+            pred_dur = torch.round(duration).clamp(min=1)
+            pred_dur = pred_dur.masked_fill(text_mask, 0)
+
+            frames = pred_dur.sum(dim=-1).long()
+
+            en = self._shift_frames(expand_by_durations(d.transpose(-1, -2), pred_dur))
+            asr = self._shift_frames(expand_by_durations(t_en, pred_dur))
+
+            # Instance norms and the unpacked shared LSTM see every frame, so each utterance is
+            # padded to its own frame bucket rather than to the longest utterance in the batch
+            frames = frames.tolist()
+            frame_buckets = [length_bucket(num_frames, self.length_tolerance) for num_frames in frames]
+            waveforms = [None] * batch_size
+            samples_per_frame = [0] * batch_size
+            for bucket, indices in group_by_length(frame_buckets):
+                index = torch.tensor(indices, device=self.device)
+                # encode prosody
+                F0_pred, N_pred = self.model.predictor.F0Ntrain(pad_frames(en[index], bucket), s[index])
+                out = self.model.decoder(pad_frames(asr[index], bucket), F0_pred, N_pred, ref[index])
+                out = out.reshape(len(indices), -1).cpu().numpy()
+                for row, i in enumerate(indices):
+                    samples_per_frame[i] = out.shape[-1] // bucket
+                    waveforms[i] = out[row, :frames[i] * samples_per_frame[i]]
+
+        results = []
+        for i in range(batch_size):
+            waveform = waveforms[i]
+            if return_durations:
+                # pred_dur is the token-to-frame alignment; every frame decodes to samples_per_frame samples
+                token_samples = (pred_dur[i, :lengths[i]].long() * samples_per_frame[i]).tolist()
+                results.append((waveform[..., :-trims[i]], s_pred[i], token_samples))
+            else:
+                results.append((waveform[..., :-trims[i]], s_pred[i]))
+        return results
+
+    def iter_batch_inference(self, texts, ref_s, alpha=0.3, beta=0.7, t=0.7, diffusion_steps=5,
+                             embedding_scale=1, max_batch_size=8, seed=None, phonemize=True,
+                             return_word_timings=False, style_bank=None):
+        """
+        Synthesize several texts with one reference style, yielding each segment as soon as it is decoded.
+
+        Short texts are synthesized in one shot like ``inference``. Long texts are
+        split with ``segment_text`` like ``long_inference``; their segments are
+        processed in rounds (first segment of every text, then the second, ...)
+        so each segment can still blend with the style of the one before it.
+        Segments of one text are therefore yielded in order, and appending them
+        gives the full narration without holding it in memory.
+
+        Args:
+            texts (list[str]): Texts to synthesize
+            ref_s (torch.Tensor): Reference style vector of shape [1, 256]
+            max_batch_size (int): Maximum number of utterances per forward pass
+            seed (int): Optional seed for reproducible diffusion noise
+            return_word_timings (bool): Also return word timestamps from the predicted
+                durations, relative to the start of the whole text
+            style_bank (StyleBank): Take styles from the bank instead of running the sampler
+
+        Yields:
+            tuple[int, np.ndarray, list]: Index of the text, the segment's 24kHz waveform,
+            and its words as {"word", "start", "end"} (None without return_word_timings)
+        """
+        segment_plans = []
+        for text in texts:
+            if len(text) <= tts.SINGLE_INFERENCE_MAX_LEN:
+                segment_plans.append([(text, SINGLE_TRIM)])
+            else:
+                segment_plans.append([(segment, SEGMENT_TRIM) for segment in self.split_segments(text)])
+
+        offsets = [0] * len(texts)
+        prev_styles = [None] * len(texts)
+        rounds = max((len(plan) for plan in segment_plans), default=0)
+
+        for round_index in range(rounds):
+            items = []
+            for text_index, plan in enumerate(segment_plans):
+                if round_index < len(plan):
+                    segment, trim = plan[round_index]
+                    if return_word_timings:
+                        tokens, spans = self.tokenize(segment, phonemize=phonemize, return_word_spans=True)
+                    else:
+                        tokens, spans = self.tokenize(segment, phonemize=phonemize), None
+                    items.append((text_index, tokens, trim, segment, spans))
+
+            # Group similar lengths together to keep padding small
+            items.sort(key=lambda item: len(item[1]))
+            for start in range(0, len(items), max_batch_size):
+                batch = items[start:start + max_batch_size]
+                results = self._synthesize_batch(
+                    [tokens for _, tokens, _, _, _ in batch],
+                    ref_s,
+                    prev_s=[prev_styles[text_index] for text_index, _, _, _, _ in batch],
+                    alpha=alpha,
+                    beta=beta,
+                    t=t,
+                    diffusion_steps=diffusion_steps,
+                    embedding_scale=embedding_scale,
+                    trims=[trim for _, _, trim, _, _ in batch],
+                    seed=seed,
+                    return_durations=return_word_timings,
+                    style_bank=style_bank
+                )
+                for (text_index, _, _, segment, spans), result in zip(batch, results):
+                    waveform, style = result[0], result[1]
+                    words = None
+                    if return_word_timings:
+                        words = align_words(text_words(segment), spans, result[2], offset_samples=offsets[text_index])
+                    offsets[text_index] += len(waveform)
+                    prev_styles[text_index] = style
+                    yield text_index, waveform, words
+
+    def batch_inference(self, texts, ref_s, return_word_timings=False, **kwargs):
+        """
+        Synthesize several texts and return whole waveforms, see ``iter_batch_inference``.
+
+        Returns:
+            list[np.ndarray]: 24kHz waveform per input text, in input order; with
+            return_word_timings, (waveform, [{"word", "start", "end"}]) pairs instead
+        """
+        outputs = [[] for _ in texts]
+        timings = [[] for _ in texts]
+        segments = self.iter_batch_inference(texts, ref_s, return_word_timings=return_word_timings, **kwargs)
+        for text_index, waveform, words in segments:
+            outputs[text_index].append(waveform)
+            if words:
+                timings[text_index].extend(words)
+        waveforms = [np.concatenate(segments) if segments else np.zeros(0, dtype=np.float32) for segments in outputs]
+        if return_word_timings:
+            return list(zip(waveforms, timings))
+        return waveforms
+
+    def inference(self, text: str, target_voice_path=None, output_wav_file=None, output_sample_rate=24000,
+                  alpha=0.3, beta=0.7, diffusion_steps=5, embedding_scale=1, ref_s=None, phonemize=True,
+                  style_bank=None):
+        """Single-utterance inference, routed through the batched pipeline with a batch of one"""
+        # BERT is limited to 512 tokens, which roughly corresponds to ~350 characters
+        if len(text) > tts.SINGLE_INFERENCE_MAX_LEN:
+            return self.long_inference(text, target_voice_path=target_voice_path, output_wav_file=output_wav_file,
+                                       output_sample_rate=output_sample_rate, alpha=alpha, beta=beta,
+                                       diffusion_steps=diffusion_steps, embedding_scale=embedding_scale,
+                                       ref_s=ref_s, phonemize=phonemize, style_bank=style_bank)
+
+        if ref_s is None:
+            ref_s = self.default_style(target_voice_path)
+
+        [(output, _)] = self._synthesize_batch(
+            [self.tokenize(text, phonemize=phonemize)],
+            ref_s,
+            alpha=alpha,
+            beta=beta,
+            diffusion_steps=diffusion_steps,
+            embedding_scale=embedding_scale,
+            trims=[SINGLE_TRIM],
+            style_bank=style_bank
+        )
+        if output_wav_file:
+            scipy.io.wavfile.write(output_wav_file, rate=output_sample_rate, data=output)
+        return output
+
+    def long_inference_segment(self, text, prev_s, ref_s, alpha=0.3, beta=0.7, t=0.7, diffusion_steps=5,
+                               embedding_scale=1, phonemize=True, style_bank=None):
+        """One segment of ``long_inference``, routed through the batched pipeline"""
+        [(output, s_pred)] = self._synthesize_batch(
+            [self.tokenize(text, phonemize=phonemize)],
+            ref_s,
+            prev_s=[prev_s],
+            alpha=alpha,
+            beta=beta,
+            t=t,
+            diffusion_steps=diffusion_steps,
+            embedding_scale=embedding_scale,
+            trims=[SEGMENT_TRIM],
+            style_bank=style_bank
+        )
+        return output, s_pred.unsqueeze(0)
+
+    def iter_long_inference(self, text: str, target_voice_path=None, alpha=0.3, beta=0.7, t=0.7,
+                            diffusion_steps=5, embedding_scale=1, ref_s=None, phonemize=True, style_bank=None):
+        """Yield each segment's audio as soon as it is decoded"""
+        if ref_s is None:
+            ref_s = self.default_style(target_voice_path)
+
+        prev_s = None
+        for text_segment in self.split_segments(text):
+            segment_output, prev_s = self.long_inference_segment(text_segment, prev_s, ref_s, alpha=alpha, beta=beta, t=t,
+                                                                 diffusion_steps=diffusion_steps,
+                                                                 embedding_scale=embedding_scale, phonemize=phonemize,
+                                                                 style_bank=style_bank)
+            yield segment_output
+
+    def long_inference(self, text: str, target_voice_path=None, output_wav_file=None, output_sample_rate=24000,
+                       alpha=0.3, beta=0.7, t=0.7, diffusion_steps=5, embedding_scale=1, ref_s=None, phonemize=True,
+                       style_bank=None):
+        """Synthesize long text segment by segment and return the joined audio"""
+        segments = self.iter_long_inference(
+            text, target_voice_path=target_voice_path, alpha=alpha, beta=beta, t=t, diffusion_steps=diffusion_steps,
+            embedding_scale=embedding_scale, ref_s=ref_s, phonemize=phonemize, style_bank=style_bank
+        )
+        if not output_wav_file:
+            return np.concatenate(list(segments))
+        outputs = []
+        # Each segment reaches the file as soon as it is decoded
+        with WavWriter(output_wav_file, sample_rate=output_sample_rate) as writer:
+            for segment_output in segments:
+                writer.write(segment_output)
+                outputs.append(segment_output)
+        return np.concatenate(outputs)
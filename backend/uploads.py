@@ -0,0 +1,237 @@
+"""
+Streaming, content-addressed ingestion of uploaded files.
+
+Uploads are copied to disk in fixed-size chunks, hashed with SHA-256 on the
+way, and stored once per content under blobs/<first two hex chars>/<digest>.
+A job's upload directory only receives a hard link to the blob, so uploading
+a file that is already stored costs no extra disk space and no copy. The
+event loop is never blocked: disk writes run in the thread pool and only one
+chunk is held in memory at a time.
+
+A blob's link count tells how many job workspaces still use it, so blobs
+that are down to the store's own link and haven't been uploaded again for a
+while are removed by collect_garbage. Request bodies are capped by
+UploadSizeLimit before the multipart parser spools them to disk.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import stat
+import time
+import unicodedata
+import uuid
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+MAX_FILENAME_LENGTH = 200
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds its size limit"""
+
+    def __init__(self, filename, limit):
+        super().__init__(f"{filename} exceeds the upload limit of {limit // (1024 * 1024)} MB")
+        self.filename = filename
+        self.limit = limit
+
+
+def sanitize_filename(filename):
+    """
+    Turn a client-supplied file name into a safe base name.
+
+    Directory components, control characters and anything outside a
+    conservative character set are removed, and leading dots are stripped so
+    the result can't be hidden or escape the upload directory.
+    """
+    name = unicodedata.normalize("NFKC", filename or "").replace("\\", "/").split("/")[-1]
+    name = re.sub(r"[^\w.\- ]+", "_", name).strip(" .")
+    stem, extension = os.path.splitext(name)
+    stem = stem[:MAX_FILENAME_LENGTH - len(extension[:16])]
+    name = f"{stem}{extension[:16]}"
+    return name if stem else f"upload{extension[:16]}"
+
+
+class BlobStore:
+    """
+    Uploaded file contents stored once per SHA-256 digest.
+
+    Args:
+        root (str): Directory holding the blobs
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    async def ingest(self, upload, max_bytes=None):
+        """
+        Stream an UploadFile into the store.
+
+        Args:
+            upload (UploadFile): File from the multipart request
+            max_bytes (int): Reject the upload once more than this many bytes arrive
+
+        Returns:
+            tuple[str, int, bool]: SHA-256 hex digest, size in bytes, and whether
+            the content was already stored
+
+        Raises:
+            UploadTooLarge: If the file is larger than max_bytes
+        """
+        # The root may have been removed by a cleanup since the store was created
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f"incoming_{uuid.uuid4().hex}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        out = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(upload.filename, max_bytes)
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+        except BaseException:
+            out.close()
+            os.remove(tmp_path)
+            raise
+        await run_in_threadpool(out.close)
+
+        hex_digest = digest.hexdigest()
+        blob_path = self.blob_path(hex_digest)
+        existed = os.path.exists(blob_path)
+        if existed:
+            # Same content already stored; the new copy is discarded
+            os.remove(tmp_path)
+            # Refresh the blob's age so garbage collection keeps recently uploaded content
+            os.utime(blob_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp_path, blob_path)
+        return hex_digest, size, existed
+
+    def link(self, digest, target_path):
+        """
+        Make a blob appear at target_path without copying it when possible.
+
+        Hard links are used so that deleting a job's workspace never removes
+        the blob; the file is copied if the filesystem doesn't support links.
+        Linked files share the blob's inode, so the target must never be
+        opened for writing.
+        """
+        blob_path = self.blob_path(digest)
+        try:
+            os.link(blob_path, target_path)
+        except OSError:
+            shutil.copyfile(blob_path, target_path)
+        return target_path
+
+    def collect_garbage(self, max_idle_seconds):
+        """
+        Remove blobs no job links to any more that haven't been uploaded for a while.
+
+        A blob whose link count is 1 is only referenced by the store itself.
+        Blobs are kept for max_idle_seconds after their last upload, so
+        re-uploading recent material is still deduplicated (and on filesystems
+        without hard links, where jobs get copies, age is the only criterion).
+        Abandoned incoming_*.tmp files are removed the same way.
+
+        Returns:
+            tuple[int, int]: Number of files removed and bytes freed
+        """
+        cutoff = time.time() - max_idle_seconds
+        removed = 0
+        freed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    info = os.stat(path)
+                    if info.st_nlink > 1 or info.st_mtime > cutoff:
+                        continue
+                    # Blobs stored by older versions are read-only, which Windows refuses to delete
+                    if not info.st_mode & stat.S_IWRITE:
+                        os.chmod(path, info.st_mode | stat.S_IWRITE)
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Error removing blob {path}: {e}")
+                    continue
+                removed += 1
+                freed += info.st_size
+        return removed, freed
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware that rejects request bodies larger than max_bytes with a 413.
+
+    FastAPI parses a multipart form completely before the endpoint runs, so a
+    limit checked while ingesting only applies after the whole body has been
+    received and spooled. This rejects a too-large Content-Length up front and
+    stops reading chunked bodies as soon as they cross the limit.
+
+    Args:
+        app: Wrapped ASGI application
+        max_bytes (int): Largest accepted request body
+    """
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _error(self):
+        return HTTPException(status_code=413,
+                             detail=f"Request exceeds the upload limit of {self.max_bytes // (1024 * 1024)} MB")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, so FastAPI turns it into the 413 response
+                    raise self._error()
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send):
+        error = self._error()
+        body = json.dumps({"detail": error.detail}).encode("utf-8")
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
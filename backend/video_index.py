@@ -0,0 +1,313 @@
+"""
+Persistent metadata index for rendered videos.
+
+Listing videos used to open every file with MoviePy (one ffmpeg reader per
+file) just to learn its duration, and handed out new random ids on every
+request. Metadata is now stored in SQLite next to the job state: rows are
+written when a render finishes, and are re-probed only when a file's size or
+modification time changes. Probing reads the MP4 container header directly
+(a few kilobytes), falling back to ffprobe for other containers. The poster
+and sprite sheet manifest and the HLS master playlist written by the renderer
+are stored with each row.
+
+Listing only re-reads a directory when its mtime changed, so an unchanged
+library costs one stat per directory plus a query. Files of jobs that are
+still rendering are never probed: they may be half written, and each
+finished video is recorded by its render anyway.
+"""
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+
+from ffmpeg_render import probe_media
+from hls import hls_master_path
+from previews import load_manifest
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    path TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    duration REAL NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    mtime REAL NOT NULL,
+    indexed_at REAL NOT NULL,
+    preview TEXT,
+    hls TEXT
+);
+"""
+
+# Columns added after the table was introduced, created on older databases at startup
+ADDED_COLUMNS = {"preview": "TEXT", "hls": "TEXT"}
+
+# Boxes that only contain other boxes, on the way from moov to tkhd
+_CONTAINER_BOXES = {b"moov", b"trak"}
+
+# Directories modified more recently than this are rescanned next time, since a second
+# change within the filesystem's mtime resolution would leave the mtime unchanged
+MTIME_GRANULARITY = 2.0
+
+
+def _iter_boxes(f, start, end):
+    """Yield (type, payload offset, payload size) for the ISO BMFF boxes in [start, end)"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+
+def probe_mp4_header(path):
+    """
+    Read duration and frame size from an MP4/MOV header without decoding.
+
+    Only the box headers and the mvhd/tkhd boxes are read; the media data is
+    skipped by seeking, so this costs the same for a 10 second clip and a
+    2 hour lecture.
+
+    Returns:
+        dict or None: {"duration", "width", "height"}, or None if the file
+        isn't an MP4 with a readable movie header
+    """
+    result = {"duration": None, "width": None, "height": None}
+    try:
+        with open(path, "rb") as f:
+            end = os.fstat(f.fileno()).st_size
+
+            def walk(start, stop):
+                for box_type, payload, size in _iter_boxes(f, start, stop):
+                    if box_type in _CONTAINER_BOXES:
+                        walk(payload, payload + size)
+                    elif box_type == b"mvhd":
+                        f.seek(payload)
+                        data = f.read(min(size, 32))
+                        if data[0] == 1:
+                            timescale, duration = struct.unpack(">IQ", data[20:32])
+                        else:
+                            timescale, duration = struct.unpack(">II", data[12:20])
+                        if timescale:
+                            result["duration"] = duration / timescale
+                    elif box_type == b"tkhd" and result["width"] is None:
+                        f.seek(payload)
+                        data = f.read(min(size, 96))
+                        # Width and height are 16.16 fixed point at the end of the box
+                        size_offset = 88 if data[0] == 1 else 76
+                        width, height = struct.unpack(">II", data[size_offset:size_offset + 8])
+                        if width and height:
+                            result["width"], result["height"] = width >> 16, height >> 16
+
+            walk(0, end)
+    except (OSError, struct.error, IndexError):
+        return None
+    return result if result["duration"] is not None else None
+
+
+def probe_video(path):
+    """Header-only probe, falling back to ffprobe for containers the MP4 parser can't read"""
+    info = probe_mp4_header(path)
+    if info is None:
+        info = probe_media(path)
+    return info
+
+
+def title_from_filename(filename):
+    """Extract title from filename (remove extension)"""
+    return os.path.splitext(filename)[0].replace("-", " ").replace("_", " ").title()
+
+
+class VideoIndex:
+    """
+    Video metadata keyed by path relative to the videos directory.
+
+    Args:
+        db_path (str): SQLite database (shared with the job store)
+        root_dir (str): Directory that video paths and URLs are relative to
+    """
+
+    def __init__(self, db_path, root_dir):
+        self.db_path = db_path
+        self.root_dir = root_dir
+        self._local = threading.local()
+        self._dirs = {}  # absolute directory -> (mtime, {relative path: (path, stat)}, subdirectories)
+        self._unreadable = {}  # relative path -> (mtime, size) of files that failed to probe
+        self._scan_lock = threading.Lock()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(videos)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE videos ADD COLUMN {column} {column_type}")
+
+    def _connection(self):
+        """One connection per thread; sqlite3 connections must not be shared between threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _relative_path(self, path):
+        return os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+
+    def record(self, path, stat=None):
+        """
+        Probe a video and store its metadata; called when a render finishes.
+
+        Returns:
+            dict: The stored row
+        """
+        stat = stat or os.stat(path)
+        relative_path = self._relative_path(path)
+        info = probe_video(path)
+        hls_master = hls_master_path(path)
+        row = {
+            "path": relative_path,
+            # Derived from the path so the id survives restarts and re-listing
+            "video_id": str(uuid.uuid5(uuid.NAMESPACE_URL, relative_path)),
+            "title": title_from_filename(os.path.basename(path)),
+            "duration": float(info["duration"] or 0.0),
+            "size": stat.st_size,
+            "width": info["width"],
+            "height": info["height"],
+            "mtime": stat.st_mtime,
+            "indexed_at": time.time(),
+            "preview": load_manifest(path),
+            "hls": self._relative_path(hls_master) if hls_master else None,
+        }
+        self._connection().execute(
+            "INSERT OR REPLACE INTO videos (path, video_id, title, duration, size, width, height, mtime, indexed_at, preview, hls) "
+            "VALUES (:path, :video_id, :title, :duration, :size, :width, :height, :mtime, :indexed_at, :preview, :hls)",
+            dict(row, preview=json.dumps(row["preview"]) if row["preview"] else None)
+        )
+        return row
+
+    def _scan(self, video_dir, in_progress_dirs):
+        """
+        Find the MP4 files below video_dir, reusing the listing of directories whose mtime is unchanged.
+
+        Returns:
+            dict: Relative path -> (path, stat) for every MP4 file
+        """
+        on_disk = {}
+        visited = set()
+        now = time.time()
+        pending = [os.path.abspath(video_dir)]
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime
+            except FileNotFoundError:
+                continue
+            visited.add(directory)
+            cached = self._dirs.get(directory)
+            if cached is not None and cached[0] == mtime:
+                _, files, subdirs = cached
+            else:
+                files, subdirs = {}, []
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.name.lower().endswith(".mp4"):
+                                try:
+                                    files[self._relative_path(entry.path)] = (entry.path, entry.stat())
+                                except FileNotFoundError:
+                                    continue
+                except FileNotFoundError:
+                    continue
+                # Files of running jobs are still growing, so their stats can't be reused
+                if now - mtime > MTIME_GRANULARITY and not _is_within(directory, in_progress_dirs):
+                    self._dirs[directory] = (mtime, files, subdirs)
+                else:
+                    self._dirs.pop(directory, None)
+            on_disk.update(files)
+            pending.extend(subdirs)
+
+        root = os.path.abspath(video_dir)
+        for directory in [d for d in self._dirs if d not in visited and _is_within(d, [root])]:
+            del self._dirs[directory]
+        return on_disk
+
+    def list(self, video_dir=None, offset=0, limit=None, in_progress_dirs=()):
+        """
+        List indexed videos below video_dir, refreshing stale or unknown entries.
+
+        Only directories whose mtime changed are read again; files whose size
+        or mtime changed (or that are new) are re-probed, and rows for deleted
+        files are dropped. Files below in_progress_dirs are only listed once
+        their render has recorded them.
+
+        Args:
+            video_dir (str): Directory to list (defaults to the whole root)
+            offset (int): Number of videos to skip
+            limit (int): Maximum number of videos to return (None for all)
+            in_progress_dirs (list[str]): Output directories of jobs that are still rendering
+
+        Returns:
+            tuple[int, list[dict]]: Total number of videos and the requested page, sorted by path
+        """
+        video_dir = video_dir or self.root_dir
+        prefix = self._relative_path(video_dir)
+        prefix = "" if prefix == "." else f"{prefix}/"
+        in_progress_dirs = [os.path.abspath(directory) for directory in in_progress_dirs]
+
+        with self._scan_lock:
+            on_disk = self._scan(video_dir, in_progress_dirs)
+
+        conn = self._connection()
+        rows = {
+            row["path"]: dict(row, preview=json.loads(row["preview"]) if row["preview"] else None)
+            for row in conn.execute(
+                "SELECT * FROM videos WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            )
+        }
+
+        for relative_path in rows.keys() - on_disk.keys():
+            conn.execute("DELETE FROM videos WHERE path = ?", (relative_path,))
+            del rows[relative_path]
+
+        for relative_path, (path, stat) in on_disk.items():
+            row = rows.get(relative_path)
+            if _is_within(os.path.abspath(path), in_progress_dirs):
+                # Possibly half written; the render records it when it finishes
+                continue
+            if row is not None and row["mtime"] == stat.st_mtime and row["size"] == stat.st_size:
+                continue
+            if self._unreadable.get(relative_path) == (stat.st_mtime, stat.st_size):
+                continue
+            try:
+                rows[relative_path] = self.record(path, stat)
+                self._unreadable.pop(relative_path, None)
+            except Exception as e:
+                print(f"Error probing {path}: {e}")
+                self._unreadable[relative_path] = (stat.st_mtime, stat.st_size)
+
+        ordered = [rows[key] for key in sorted(rows)]
+        page = ordered[offset:] if limit is None else ordered[offset:offset + limit]
+        return len(ordered), page
+
+
+def _is_within(path, directories):
+    """Whether path is one of the (absolute) directories or below one of them"""
+    return any(path == directory or path.startswith(directory + os.sep) for directory in directories)
@@ -0,0 +1,246 @@
+"""
+Video rendering for StudyBytes: subtitle timing and TikTok-style compositing.
+
+Kept separate from main.py so render worker processes can import it without
+loading the TTS model or starting the API.
+"""
+import random
+import re
+import uuid
+
+from moviepy import VideoFileClip, ImageClip, CompositeVideoClip, AudioFileClip
+from moviepy import concatenate_videoclips
+
+from ffmpeg_render import create_tiktok_style_video_ffmpeg, probe_media
+from hls import package_hls
+from previews import PreviewCollector
+from subtitle_cache import get_subtitle_cache
+from word_timings import load_word_timings
+
+def add_tiktok_emphasis(text):
+    """Add TikTok-style emphasis to certain words"""
+    emphasis_patterns = [
+        (r'\b(never|always|every|all|none)\b', r'NEVER'),
+        (r'\b(amazing|awesome|incredible|terrible|horrible)\b', r'AMAZING'),
+        (r'\b(best|worst|most|least)\b', r'BEST'),
+        (r'\b(literally|actually|seriously|absolutely)\b', r'LITERALLY'),
+        (r'\b(wait|omg|wow|what|why|how|who)\b', r'WAIT')
+    ]
+    
+    # Randomly capitalize about 20% of emphasis candidates
+    for pattern, replacement in emphasis_patterns:
+        if random.random() < 0.2:  # 20% chance to apply emphasis
+            matches = re.findall(pattern, text, re.IGNORECASE)
+            for match in matches:
+                text = re.sub(r'\b' + re.escape(match) + r'\b', match.upper(), text, flags=re.IGNORECASE)
+    
+    return text
+
+def convert_transcription_to_subtitles(transcription, video_duration, words_per_chunk=3):
+    """Convert transcription text into timed subtitles based on video duration"""
+    # Clean up transcription
+    cleaned_text = re.sub(r'\s+', ' ', transcription).strip()
+    words = cleaned_text.split()
+    
+    if not words:
+        return []
+    
+    total_words = len(words)
+    subtitles = []
+    
+    # Calculate estimated time per word based on video duration
+    # This assumes that speech is relatively evenly distributed
+    time_per_word = video_duration / total_words
+    
+    # Create subtitle chunks with better timing estimates
+    for i in range(0, total_words, words_per_chunk):
+        chunk_words = words[i:i + words_per_chunk]
+        chunk_text = " ".join(chunk_words)
+        
+        # Calculate timing based on word position
+        start_time = i * time_per_word
+        end_time = min((i + len(chunk_words)) * time_per_word, video_duration)
+        
+        # Add emphasis to make it more TikTok-like
+        chunk_text = add_tiktok_emphasis(chunk_text)
+        
+        subtitles.append([start_time, end_time, chunk_text])
+    
+    return subtitles
+
+def convert_word_timings_to_subtitles(words, video_duration, words_per_chunk=3):
+    """
+    Build subtitles from the word timestamps of the narration.
+
+    Each chunk appears when its first word is spoken and stays up until the
+    next chunk starts, so captions follow the actual speech (pauses after
+    sentences included) instead of an even spread over the audio.
+    """
+    if not words:
+        return []
+    
+    subtitles = []
+    for i in range(0, len(words), words_per_chunk):
+        chunk = words[i:i + words_per_chunk]
+        start_time = chunk[0]["start"]
+        if i + words_per_chunk < len(words):
+            end_time = words[i + words_per_chunk]["start"]
+        else:
+            end_time = chunk[-1]["end"]
+        end_time = min(max(end_time, start_time), video_duration)
+        
+        chunk_text = add_tiktok_emphasis(" ".join(word["word"] for word in chunk))
+        subtitles.append([start_time, end_time, chunk_text])
+    
+    return subtitles
+
+def make_subtitles(audio_path, transcript_text, audio_duration, words_per_chunk=3):
+    """Time subtitles from the narration's word timings, or spread them evenly if it has none"""
+    words = load_word_timings(audio_path)
+    if words:
+        return convert_word_timings_to_subtitles(words, audio_duration, words_per_chunk=words_per_chunk)
+    return convert_transcription_to_subtitles(transcript_text, audio_duration, words_per_chunk=words_per_chunk)
+
+def create_tiktok_style_video(video_path, audio_path, subtitles, output_path, threads=4, video_offset=0.0):
+    print(f"Loading video from: {video_path}")
+    print(f"Loading audio from: {audio_path}")
+    print(f"Output path: {output_path}")
+    
+    # Ensure the output path is safe for ffmpeg
+    if ":" in output_path:
+        safe_output_path = output_path.replace(":", "_")
+        print(f"Sanitizing output path: {output_path} -> {safe_output_path}")
+        output_path = safe_output_path
+    
+    # Load video and audio
+    source = VideoFileClip(video_path)
+    audio = AudioFileClip(audio_path)
+    
+    # Start at the requested offset; seeking is cheap on the keyframe-dense library copies
+    video = source.subclipped(video_offset) if video_offset else source
+    
+    # Make video loop if it's shorter than audio
+    if video.duration < audio.duration:
+        print(f"Video duration ({video.duration}s) is shorter than audio ({audio.duration}s). Creating looped video.")
+        # Calculate how many times we need to loop the full background after the first segment
+        repeat_count = int((audio.duration - video.duration) / source.duration) + 1
+        # Concatenate the clips
+        looped_video = concatenate_videoclips([video] + [source] * repeat_count)
+        # Now use the looped video
+        video = looped_video.subclipped(0, audio.duration)
+    else:
+        # If video is longer, just cut it to audio length
+        video = video.subclipped(0, audio.duration)
+     
+    # Set video audio to the provided audio file
+    video = video.with_audio(audio)
+    
+    # Create text clips with TikTok style
+    txt_clips = []
+    subtitle_cache = get_subtitle_cache()
+    
+    for sub in subtitles:
+        start_time, end_time, text = sub
+        
+        # Skip if the subtitles go beyond video duration
+        if start_time >= video.duration:
+            continue
+            
+        # Adjust end_time if it exceeds video duration
+        end_time = min(end_time, video.duration)
+        
+        # Reuse the rasterized caption if this chunk was rendered before
+        caption_image = subtitle_cache.get(
+            text,
+            font="arial",
+            font_size=70,
+            stroke_width=2,
+            width=int(video.w*0.9)
+        )
+        txt_clip = ImageClip(caption_image, transparent=True)
+        
+        txt_clip = txt_clip.with_position(('center', 'center'))
+        txt_clip = txt_clip.with_start(start_time).with_end(end_time)
+        txt_clips.append(txt_clip)
+    
+    # Combine everything
+    print("Creating final video with subtitles and audio...")
+    final_video = CompositeVideoClip([video] + txt_clips)
+    
+    # Keep the poster and sprite frames as they pass through the writer instead of decoding again
+    previews = PreviewCollector(final_video.duration, final_video.w, final_video.h)
+    final_video = final_video.transform(previews.frame_filter)
+    
+    # Write the output file
+    print(f"Rendering video to: {output_path}")
+    try:
+        # Use sanitized output path for writing
+        final_video.write_videofile(
+            output_path, 
+            fps=24, 
+            codec="libx264",
+            audio_codec="aac",
+            threads=threads,
+            ffmpeg_params=["-movflags", "+faststart"],  # moov atom first so playback starts before the download ends
+            temp_audiofile=f"temp_audio_{uuid.uuid4()}.m4a"  # Use unique temp filename to avoid conflicts
+        )
+    except Exception as e:
+        # If there's still an error, try with even more sanitization
+        print(f"Error writing video file: {str(e)}")
+        sanitized_path = re.sub(r'[^\w\-_\. /\\]', '_', output_path)
+        print(f"Attempting again with fully sanitized path: {sanitized_path}")
+        final_video.write_videofile(
+            sanitized_path, 
+            fps=24, 
+            codec="libx264",
+            audio_codec="aac",
+            threads=threads,
+            ffmpeg_params=["-movflags", "+faststart"],  # moov atom first so playback starts before the download ends
+            temp_audiofile=f"temp_audio_{uuid.uuid4()}.m4a"
+        )
+        previews_path = sanitized_path
+    else:
+        previews_path = output_path
+    previews.save(previews_path)
+    
+    print(f"Video successfully saved to: {output_path}")
+    final_video.close()
+    video.close()
+    source.close()
+    return output_path
+
+RENDER_BACKENDS = ("moviepy", "ffmpeg")
+
+OUTPUT_FORMATS = ("mp4", "hls")
+
+def render_video(video_path, audio_path, transcript_text, output_path, threads=4, backend="moviepy", video_offset=0.0,
+                 output_format="mp4"):
+    """
+    Render one narrated video end to end. Runs inside render worker processes.
+    
+    Args:
+        backend (str): "moviepy" composites frames in Python, "ffmpeg" burns ASS
+            subtitles in a single ffmpeg invocation
+        video_offset (float): Where in the background video to start, in seconds
+        output_format (str): "mp4" writes a faststart MP4; "hls" also packages it
+            as an HLS ladder of phone-sized renditions
+    
+    Returns:
+        str: Path of the written video
+    """
+    if backend == "ffmpeg":
+        audio_duration = probe_media(audio_path)["duration"]
+        subtitles = make_subtitles(audio_path, transcript_text, audio_duration, words_per_chunk=3)
+        output_path = create_tiktok_style_video_ffmpeg(video_path, audio_path, subtitles, output_path, threads=threads, video_offset=video_offset)
+    else:
+        audio = AudioFileClip(audio_path)
+        audio_duration = audio.duration
+        audio.close()
+        
+        subtitles = make_subtitles(audio_path, transcript_text, audio_duration, words_per_chunk=3)
+        
+        output_path = create_tiktok_style_video(video_path, audio_path, subtitles, output_path, threads=threads, video_offset=video_offset)
+    
+    if output_format == "hls":
+        package_hls(output_path, threads=threads)
+    return output_path
@@ -0,0 +1,151 @@
+"""
+Voice style registry for StyleTTS2.
+
+Computing a reference style vector (``ref_s``) decodes the voice sample,
+trims it, builds a mel spectrogram and runs two encoders. The result only
+depends on the voice file and the model weights, so it is computed once per
+(voice content, checkpoint) pair and reused from memory or disk afterwards.
+Style banks (see style_bank.py) are cached the same way, per voice and
+sampler preset.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import torch
+
+from hashing import file_sha256
+from style_bank import STYLE_BANK_VERSION, StyleBank
+
+
+def checkpoint_fingerprint(model_path):
+    """
+    Identify a model checkpoint without hashing the whole file.
+
+    Uses the absolute path, size and modification time, which changes whenever
+    the checkpoint is replaced. Falls back to "default" when the packaged
+    StyleTTS2 weights are used.
+    """
+    if not model_path or not os.path.exists(model_path):
+        return "default"
+    stat = os.stat(model_path)
+    key = f"{os.path.abspath(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class VoiceRegistry:
+    """
+    Caches StyleTTS2 reference style vectors keyed by voice file content and
+    model checkpoint, in memory and on disk.
+
+    Args:
+        get_tts (callable): Returns the StyleTTS2 engine; only called when a style
+            is needed, so cache keys are available before the model has loaded
+    """
+
+    def __init__(self, get_tts, cache_dir, checkpoint_id="default"):
+        self.get_tts = get_tts
+        self.cache_dir = cache_dir
+        self.checkpoint_id = checkpoint_id
+        self._styles = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def style_key(self, voice_path):
+        """Cache key for a voice file under the current checkpoint"""
+        stat = os.stat(voice_path)
+        file_id = (os.path.abspath(voice_path), stat.st_size, stat.st_mtime)
+        if file_id not in self._keys:
+            self._keys[file_id] = f"{file_sha256(voice_path)}_{self.checkpoint_id}"
+        return self._keys[file_id]
+
+    def get_style(self, voice_path):
+        """
+        Return the reference style vector for a voice sample.
+
+        Args:
+            voice_path (str): Path to the voice sample used for cloning
+
+        Returns:
+            torch.Tensor: Style vector of shape [1, 256] on the model's device
+        """
+        key = self.style_key(voice_path)
+
+        with self._lock:
+            if key in self._styles:
+                return self._styles[key]
+
+            tts_instance = self.get_tts()
+            device = tts_instance.device
+            cache_path = os.path.join(self.cache_dir, f"{key}.pt")
+            if os.path.exists(cache_path):
+                try:
+                    ref_s = torch.load(cache_path, map_location=device)
+                    print(f"TTS: Loaded cached voice style for {os.path.basename(voice_path)}")
+                    self._styles[key] = ref_s
+                    return ref_s
+                except Exception as e:
+                    print(f"TTS: Ignoring unreadable voice style cache {cache_path}: {e}")
+
+            print(f"TTS: Computing voice style for {os.path.basename(voice_path)}...")
+            ref_s = tts_instance.compute_style(voice_path)
+
+            # Write to a temporary file first so a crash never leaves a partial cache entry
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            torch.save(ref_s.detach().cpu(), tmp_path)
+            os.replace(tmp_path, cache_path)
+
+            self._styles[key] = ref_s
+            return ref_s
+
+    def get_style_bank(self, voice_path, embedding_scale, diffusion_steps, seed):
+        """
+        Return the style bank for a voice and sampler preset, sampling it on first use.
+
+        Args:
+            voice_path (str): Path to the voice sample used for cloning
+            embedding_scale, diffusion_steps: Sampler settings the bank is sampled with
+            seed (int): Seed for the sampler noise
+
+        Returns:
+            StyleBank: Cached bank
+        """
+        ref_s = self.get_style(voice_path)
+        tts_instance = self.get_tts()
+        preset = {
+            "embedding_scale": embedding_scale,
+            "diffusion_steps": diffusion_steps,
+            "seed": seed,
+            # Quantized profiles run a different BERT, so they sample different styles
+            "profile": getattr(tts_instance, "profile", "default"),
+            "version": STYLE_BANK_VERSION,
+        }
+        preset_id = hashlib.sha1(json.dumps(preset, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        key = f"{self.style_key(voice_path)}_bank_{preset_id}"
+
+        with self._lock:
+            if key in self._styles:
+                return self._styles[key]
+
+            cache_path = os.path.join(self.cache_dir, f"{key}.pt")
+            if os.path.exists(cache_path):
+                try:
+                    bank = StyleBank.from_state_dict(torch.load(cache_path, map_location="cpu", weights_only=True))
+                    print(f"TTS: Loaded cached style bank for {os.path.basename(voice_path)}")
+                    self._styles[key] = bank
+                    return bank
+                except Exception as e:
+                    print(f"TTS: Ignoring unreadable style bank cache {cache_path}: {e}")
+
+            print(f"TTS: Sampling style bank for {os.path.basename(voice_path)}...")
+            bank = tts_instance.build_style_bank(ref_s, embedding_scale=embedding_scale,
+                                                 diffusion_steps=diffusion_steps, seed=seed)
+
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            torch.save(bank.state_dict(), tmp_path)
+            os.replace(tmp_path, cache_path)
+
+            self._styles[key] = bank
+            return bank
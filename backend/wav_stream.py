@@ -0,0 +1,99 @@
+"""
+Incremental WAV writer for narration audio.
+
+StyleTTS2 decodes a long transcript segment by segment. Appending each
+segment to the output as soon as it is decoded means only one segment is
+held in memory at a time instead of the whole narration, and a reader (or a
+pipe to an encoder) sees audio before the narration is finished.
+
+The header is written up front with placeholder sizes. On close they are
+patched when the target is seekable; non-seekable targets such as pipes keep
+0xFFFFFFFF sizes, which ffmpeg reads as "until end of stream".
+"""
+import struct
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+UNKNOWN_SIZE = 0xFFFFFFFF
+
+# Sample format -> (format tag, numpy dtype)
+SAMPLE_FORMATS = {
+    "float32": (WAVE_FORMAT_IEEE_FLOAT, np.dtype("<f4")),
+    "pcm16": (WAVE_FORMAT_PCM, np.dtype("<i2")),
+}
+
+
+class WavWriter:
+    """
+    Mono WAV sink that audio can be appended to chunk by chunk.
+
+    Args:
+        target (str or file): Path to create, or a binary file object (e.g. a pipe)
+        sample_rate (int): Samples per second
+        sample_format (str): "float32" (same as scipy.io.wavfile.write for float32
+            arrays) or "pcm16" (floats in [-1, 1] are scaled and clipped)
+    """
+
+    def __init__(self, target, sample_rate=24000, sample_format="float32"):
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unknown sample format: {sample_format}")
+        self.sample_rate = sample_rate
+        self.format_tag, self.dtype = SAMPLE_FORMATS[sample_format]
+        self.frames = 0
+        self._owns_file = isinstance(target, str)
+        self._file = open(target, "wb") if self._owns_file else target
+        try:
+            self._seekable = self._file.seekable()
+        except AttributeError:
+            self._seekable = False
+        self._write_header(UNKNOWN_SIZE)
+
+    def _header(self, data_size):
+        block_align = self.dtype.itemsize
+        fmt = struct.pack("<HHIIHH", self.format_tag, 1, self.sample_rate, self.sample_rate * block_align,
+                          block_align, 8 * block_align)
+        chunks = []
+        if self.format_tag == WAVE_FORMAT_PCM:
+            chunks.append(b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+        else:
+            # Non-PCM formats carry a cbSize field and a fact chunk with the sample count
+            fmt += struct.pack("<H", 0)
+            chunks.append(b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+            frames = UNKNOWN_SIZE if data_size == UNKNOWN_SIZE else self.frames
+            chunks.append(b"fact" + struct.pack("<II", 4, frames))
+        chunks.append(b"data" + struct.pack("<I", data_size))
+        body = b"WAVE" + b"".join(chunks)
+        riff_size = UNKNOWN_SIZE if data_size == UNKNOWN_SIZE else len(body) + data_size
+        return b"RIFF" + struct.pack("<I", riff_size) + body
+
+    def _write_header(self, data_size):
+        self._file.write(self._header(data_size))
+
+    def write(self, samples):
+        """Append a chunk of mono samples"""
+        samples = np.asarray(samples).reshape(-1)
+        if self.format_tag == WAVE_FORMAT_PCM and samples.dtype.kind == "f":
+            samples = np.clip(samples, -1.0, 1.0) * 32767
+        self._file.write(samples.astype(self.dtype).tobytes())
+        self.frames += len(samples)
+
+    def close(self):
+        """Patch the sizes into the header (when seekable) and close files opened by the writer"""
+        if self._file is None:
+            return
+        if self._seekable:
+            self._file.seek(0)
+            self._write_header(self.frames * self.dtype.itemsize)
+            self._file.seek(0, 2)
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,136 @@
+"""
+Word-level timestamps derived from StyleTTS2's predicted durations.
+
+The duration predictor already assigns every phoneme token a number of
+frames, and the decoder turns every frame into a fixed number of samples. So
+the position of each word in the waveform is known exactly once the tokens
+are mapped back to words; no ASR or forced-alignment pass is needed.
+
+Timings are stored as a JSON sidecar next to the narration WAV
+(``<name>.words.json``) so render workers can time captions without loading
+the TTS model.
+"""
+import json
+import os
+import re
+import shutil
+
+SIDECAR_SUFFIX = ".words.json"
+
+
+def text_words(text):
+    """Words of a transcript as they should appear in captions (punctuation-only tokens dropped)"""
+    return [word for word in re.sub(r'\s+', ' ', text).strip().split(' ') if re.search(r'\w', word)]
+
+
+def phoneme_word_spans(phoneme_string, vocabulary, offset=1):
+    """
+    Token index ranges of the words in a phonemized string.
+
+    Tokens are one per character of the phoneme string (characters missing
+    from the vocabulary are dropped by the text cleaner and get no token), so
+    word boundaries are the space tokens. Groups without any letter are
+    punctuation and are skipped.
+
+    Args:
+        phoneme_string (str): Space-separated phonemized words, as fed to the text cleaner
+        vocabulary (dict): Character -> token id mapping of the text cleaner
+        offset (int): Tokens before the phoneme string (the leading pad token)
+
+    Returns:
+        list[tuple[int, int]]: [start, end) token indices per word
+    """
+    spans = []
+    index = offset
+    start = None
+    has_letter = False
+    for char in phoneme_string + " ":
+        if char == " ":
+            if start is not None and has_letter:
+                spans.append((start, index))
+            start, has_letter = None, False
+        elif char in vocabulary:
+            if start is None:
+                start = index
+            has_letter = has_letter or char.isalpha()
+        if char in vocabulary:
+            index += 1
+    return spans
+
+
+def align_words(words, spans, token_samples, offset_samples=0, sample_rate=24000):
+    """
+    Timestamp words from per-token sample counts.
+
+    Phonemization usually keeps one phoneme word per text word; when the
+    counts differ (numbers, abbreviations), words are spread monotonically
+    over the phoneme words so timings stay ordered and cover the same range.
+
+    Args:
+        words (list[str]): Text words, from text_words
+        spans (list[tuple[int, int]]): Token ranges from phoneme_word_spans
+        token_samples (list[int]): Output samples per token
+        offset_samples (int): Position of this utterance in the full narration
+
+    Returns:
+        list[dict]: {"word", "start", "end"} in seconds
+    """
+    if not words or not spans:
+        return []
+
+    boundaries = [0]
+    for samples in token_samples:
+        boundaries.append(boundaries[-1] + samples)
+    span_times = [((offset_samples + boundaries[start]) / sample_rate,
+                   (offset_samples + boundaries[min(end, len(token_samples))]) / sample_rate)
+                  for start, end in spans]
+
+    timings = []
+    num_words, num_spans = len(words), len(span_times)
+    for i, word in enumerate(words):
+        if num_spans >= num_words:
+            first, last = i * num_spans // num_words, (i + 1) * num_spans // num_words - 1
+            start, end = span_times[first][0], span_times[last][1]
+        else:
+            # Several words share one phoneme word; split its time evenly between them
+            span_index = i * num_spans // num_words
+            sharing = [j for j in range(num_words) if j * num_spans // num_words == span_index]
+            span_start, span_end = span_times[span_index]
+            step = (span_end - span_start) / len(sharing)
+            position = sharing.index(i)
+            start, end = span_start + position * step, span_start + (position + 1) * step
+        timings.append({"word": word, "start": round(start, 3), "end": round(end, 3)})
+    return timings
+
+
+def word_timings_path(audio_path):
+    """Sidecar path holding the word timings of a narration file"""
+    return f"{os.path.splitext(audio_path)[0]}{SIDECAR_SUFFIX}"
+
+
+def save_word_timings(audio_path, words):
+    with open(word_timings_path(audio_path), "w") as f:
+        json.dump(words, f)
+
+
+def load_word_timings(audio_path):
+    """Return the word timings saved for a narration, or None if there are none"""
+    try:
+        with open(word_timings_path(audio_path), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def copy_with_word_timings(source_path, target_path):
+    """Copy a narration file together with its word timings sidecar, if any"""
+    shutil.copyfile(source_path, target_path)
+    if os.path.exists(word_timings_path(source_path)):
+        shutil.copyfile(word_timings_path(source_path), word_timings_path(target_path))
+
+
+def move_with_word_timings(source_path, target_path):
+    """Rename a narration file together with its word timings sidecar, if any"""
+    os.rename(source_path, target_path)
+    if os.path.exists(word_timings_path(source_path)):
+        os.rename(word_timings_path(source_path), word_timings_path(target_path))
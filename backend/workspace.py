@@ -0,0 +1,46 @@
+"""
+Per-job workspaces.
+
+Each processing job gets its own upload, audio and output directories plus
+its own transcripts file, so overlapping jobs never read each other's
+uploads or pair their narrations with another job's transcripts.
+
+Uploads are hard links into the shared blob store, so nothing the job writes
+goes into the upload directory: transcripts and Gemini debug dumps live in a
+separate work directory, where a file opened for writing can never be a
+blob shared with other jobs.
+"""
+import os
+import shutil
+
+
+class JobWorkspace:
+    """
+    Directories owned by a single processing job.
+
+    Args:
+        jobs_root (str): Parent directory for job-private working files
+        output_root (str): Parent directory for rendered videos (served statically)
+        processing_id (str): The job's identifier
+    """
+
+    def __init__(self, jobs_root, output_root, processing_id):
+        self.processing_id = processing_id
+        self.root = os.path.join(jobs_root, processing_id)
+        self.upload_dir = os.path.join(self.root, "uploads")
+        self.audio_dir = os.path.join(self.root, "audio")
+        # Files the job writes itself; kept apart from the linked uploads
+        self.work_dir = os.path.join(self.root, "work")
+        # Outputs live under the static videos mount, at /videos/<processing_id>/
+        self.output_dir = os.path.join(output_root, processing_id)
+        self.transcripts_path = os.path.join(self.work_dir, "gemini_transcripts.json")
+
+    def create(self):
+        """Create the workspace directories and return self"""
+        for directory in (self.upload_dir, self.audio_dir, self.work_dir, self.output_dir):
+            os.makedirs(directory, exist_ok=True)
+        return self
+
+    def remove_intermediate(self):
+        """Delete working files (uploads, narration) but keep the rendered videos"""
+        shutil.rmtree(self.root, ignore_errors=True)
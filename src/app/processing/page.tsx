@@ -2,7 +2,8 @@
 
 import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
-import { checkProcessingStatus } from '@/lib/api';
+import { checkProcessingStatus, subscribeProcessingEvents } from '@/lib/api';
+import { ProcessingStatus } from '@/lib/types';
 
 export default function ProcessingPage() {
   const router = useRouter();
@@ -20,25 +21,41 @@ export default function ProcessingPage() {
     
     setProcessingId(id);
     
-    const intervalId = setInterval(async () => {
-      try {
-        const statusData = await checkProcessingStatus(id);
-        setProgress(statusData.progress);
-        setStatus(statusData.status);
-        
-        if (statusData.complete) {
-          clearInterval(intervalId);
-          sessionStorage.setItem('generatedVideos', JSON.stringify(statusData.videos || []));
-          router.push('/results');
-        }
-      } catch (err) {
-        console.error('Error checking processing status:', err);
-        setError('Failed to get processing updates. Please try again.');
+    let intervalId: ReturnType<typeof setInterval> | undefined;
+    
+    const handleStatus = (statusData: ProcessingStatus) => {
+      setProgress(statusData.progress);
+      setStatus(statusData.status);
+      
+      if (statusData.complete) {
+        clearInterval(intervalId);
+        sessionStorage.setItem('generatedVideos', JSON.stringify(statusData.videos || []));
+        router.push('/results');
       }
-    }, 2000);
+    };
+    
+    // Polling is only the fallback for when the event stream can't be used
+    const startPolling = () => {
+      intervalId = setInterval(async () => {
+        try {
+          handleStatus(await checkProcessingStatus(id));
+        } catch (err) {
+          console.error('Error checking processing status:', err);
+          setError('Failed to get processing updates. Please try again.');
+        }
+      }, 2000);
+    };
+    
+    const unsubscribe = subscribeProcessingEvents(id, handleStatus, (err) => {
+      console.error('Progress stream failed, falling back to polling:', err);
+      startPolling();
+    });
     
-    // Clean up interval on unmount
-    return () => clearInterval(intervalId);
+    // Clean up stream and interval on unmount
+    return () => {
+      unsubscribe();
+      clearInterval(intervalId);
+    };
   }, [router]);
 
   return (
@@ -1,16 +1,21 @@
 import { Video } from '@/lib/types';
 import Link from 'next/link';
-import { useRef, useState, useEffect } from 'react';
+import { useRef, useState, useEffect, CSSProperties } from 'react';
 
 interface VideoCardProps {
   video: Video;
   index: number;
 }
 
+const API_ORIGIN = 'http://localhost:8000';
+const SPRITE_FRAME_MS = 200;
+
 export default function VideoCard({ video, index }: VideoCardProps) {
   const videoRef = useRef<HTMLVideoElement>(null);
   const [isHovering, setIsHovering] = useState(false);
   const [thumbnailLoaded, setThumbnailLoaded] = useState(false);
+  const [spriteFrame, setSpriteFrame] = useState(0);
+  const sprite = video.sprite;
 
   // Format the duration to MM:SS
   const formatDuration = (seconds: number): string => {
@@ -26,10 +31,22 @@ export default function VideoCard({ video, index }: VideoCardProps) {
     }
   }, [isHovering]);
 
+  useEffect(() => {
+    // Step through the sprite sheet while hovering instead of streaming the video
+    if (!isHovering || !sprite) {
+      setSpriteFrame(0);
+      return;
+    }
+    const timer = setInterval(() => {
+      setSpriteFrame(frame => (frame + 1) % sprite.frames);
+    }, SPRITE_FRAME_MS);
+    return () => clearInterval(timer);
+  }, [isHovering, sprite]);
+
   const handleMouseEnter = () => {
     setIsHovering(true);
-    // Play video on hover, but muted
-    if (videoRef.current) {
+    // Without a generated preview, fall back to playing the video, muted
+    if (!video.thumbnail && videoRef.current) {
       videoRef.current.currentTime = 0;
       videoRef.current.muted = true;
       videoRef.current.play().catch(err => console.error('Failed to play video:', err));
@@ -40,6 +57,17 @@ export default function VideoCard({ video, index }: VideoCardProps) {
     setIsHovering(false);
   };
 
+  const spriteStyle = (frame: number): CSSProperties | undefined => {
+    if (!sprite) return undefined;
+    const column = frame % sprite.columns;
+    const row = Math.floor(frame / sprite.columns);
+    return {
+      backgroundImage: `url(${API_ORIGIN}${sprite.url})`,
+      backgroundSize: `${sprite.columns * 100}% ${sprite.rows * 100}%`,
+      backgroundPosition: `${sprite.columns > 1 ? (column / (sprite.columns - 1)) * 100 : 0}% ${sprite.rows > 1 ? (row / (sprite.rows - 1)) * 100 : 0}%`,
+    };
+  };
+
   return (
     <div className="bg-white dark:bg-gray-800 rounded-lg overflow-hidden shadow-lg hover:shadow-xl transition-all duration-300 transform hover:-translate-y-1">
       <Link href={`/video-player?index=${index}`}>
@@ -57,19 +85,38 @@ export default function VideoCard({ video, index }: VideoCardProps) {
             </div>
           )}
 
-          <video 
-            ref={videoRef}
-            src={`http://localhost:8000${video.url}`} 
-            className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-700"
-            preload="metadata"
-            muted
-            playsInline
-            onLoadedData={() => setThumbnailLoaded(true)}
-            onError={() => {
-              // If video fails to load, use a placeholder
-              console.error('Video failed to load:', video.url);
-            }}
-          />
+          {video.thumbnail ? (
+            <>
+              <img
+                src={`${API_ORIGIN}${video.thumbnail}`}
+                alt={video.title}
+                loading="lazy"
+                className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-700"
+                onLoad={() => setThumbnailLoaded(true)}
+                onError={() => console.error('Thumbnail failed to load:', video.thumbnail)}
+              />
+              {isHovering && sprite && (
+                <div
+                  className="absolute inset-0 bg-no-repeat scale-105"
+                  style={spriteStyle(spriteFrame)}
+                />
+              )}
+            </>
+          ) : (
+            <video 
+              ref={videoRef}
+              src={`${API_ORIGIN}${video.url}`} 
+              className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-700"
+              preload="metadata"
+              muted
+              playsInline
+              onLoadedData={() => setThumbnailLoaded(true)}
+              onError={() => {
+                // If video fails to load, use a placeholder
+                console.error('Video failed to load:', video.url);
+              }}
+            />
+          )}
           
           <div className="absolute inset-0 bg-gradient-to-t from-black/70 to-transparent opacity-0 group-hover:opacity-100 transition-opacity duration-300 flex items-center justify-center">
             <div className="p-3 bg-primary/90 rounded-full transform scale-0 group-hover:scale-100 transition-transform duration-300">
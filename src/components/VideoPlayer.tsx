@@ -17,8 +17,17 @@ export default function VideoPlayer({ videos, initialVideoIndex = 0 }: VideoPlay
   const [touchStart, setTouchStart] = useState<number | null>(null);
   const [swipeInProgress, setSwipeInProgress] = useState(false);
   const [swipeDirection, setSwipeDirection] = useState<string | null>(null);
+  const [nativeHls, setNativeHls] = useState(false);
 
   const currentVideo = videos[currentIndex];
+  // Play the adaptive HLS ladder where the browser supports it natively (Safari, iOS);
+  // the MP4 is always rendered alongside it and is used everywhere else
+  const videoSrc = nativeHls && currentVideo?.hlsUrl ? currentVideo.hlsUrl : currentVideo?.url;
+
+  useEffect(() => {
+    // canPlayType needs a real video element, so check on the client after mount
+    setNativeHls(document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== '');
+  }, []);
 
   useEffect(() => {
     // Reset video when index changes
@@ -171,7 +180,7 @@ export default function VideoPlayer({ videos, initialVideoIndex = 0 }: VideoPlay
       >
         <video
           ref={videoRef}
-          src={`http://localhost:8000${currentVideo.url}`}
+          src={`http://localhost:8000${videoSrc}`}
           className="h-full max-h-[90vh] max-w-[90vw] mx-auto cursor-pointer object-contain"
           onClick={togglePlay}
           onTimeUpdate={handleTimeUpdate}
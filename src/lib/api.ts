@@ -4,7 +4,9 @@ const API_URL = 'http://localhost:8000/api';
 
 export async function processFiles(
   assignmentFiles: File[] = [],
-  materialFiles: File[] = []
+  materialFiles: File[] = [],
+  renderBackend?: 'moviepy' | 'ffmpeg',
+  outputFormat?: 'mp4' | 'hls'
 ): Promise<{ processingId: string }> {
   const formData = new FormData();
   
@@ -13,6 +15,16 @@ export async function processFiles(
     formData.append('material_files', file);
   });
   
+  // Optionally choose how the backend renders this job's videos
+  if (renderBackend) {
+    formData.append('render_backend', renderBackend);
+  }
+  
+  // Optionally also package the videos as HLS for adaptive mobile playback
+  if (outputFormat) {
+    formData.append('output_format', outputFormat);
+  }
+  
   try {
     const response = await fetch(`${API_URL}/process-materials`, {
       method: 'POST',
@@ -46,6 +58,42 @@ export async function checkProcessingStatus(processingId: string): Promise<Proce
   }
 }
 
+/**
+ * Follow a processing task over Server-Sent Events.
+ *
+ * The server sends a compact snapshot first and then only changed fields;
+ * they are merged here so onUpdate always receives the full current status.
+ * Returns a function that closes the stream.
+ */
+export function subscribeProcessingEvents(
+  processingId: string,
+  onUpdate: (status: ProcessingStatus) => void,
+  onError?: (error: Event) => void
+): () => void {
+  const source = new EventSource(`${API_URL}/processing-events/${processingId}`);
+  let current = { processingId } as ProcessingStatus;
+
+  const merge = (event: MessageEvent) => {
+    current = { ...current, ...JSON.parse(event.data) };
+    onUpdate(current);
+    if (current.complete) {
+      source.close();
+    }
+  };
+
+  source.addEventListener('snapshot', merge as EventListener);
+  source.addEventListener('update', merge as EventListener);
+  source.onerror = (error) => {
+    // The stream is closed once the task completes; anything else is a real error
+    if (!current.complete) {
+      source.close();
+      onError?.(error);
+    }
+  };
+
+  return () => source.close();
+}
+
 export async function checkAPIHealth(): Promise<boolean> {
   try {
     const response = await fetch(`${API_URL}/health`);
@@ -1,10 +1,22 @@
+export interface VideoSprite {
+  url: string;
+  columns: number;
+  rows: number;
+  frames: number;
+  interval: number; // seconds of video between frames
+  tileWidth: number;
+  tileHeight: number;
+}
+
 export interface Video {
   id: string;
   title: string;
   url: string;
-  thumbnail: string;
+  thumbnail: string; // poster frame; empty for videos rendered before previews existed
   duration: number; // in seconds
   description?: string;
+  sprite?: VideoSprite | null; // hover-preview frames
+  hlsUrl?: string | null; // HLS master playlist when packaged for adaptive streaming
 }
 
 export interface ProcessingStatus {